@@ -3,20 +3,73 @@ apex_scoring
 
 Notebook-authored library (via nbdev) for ACU Blueprint Holistic GPA scoring.
 
-Exports modules generated from notebooks in `scripts/python/nbs/`.
+Exports modules generated from notebooks in `scripts/python/nbs/`. Exports are
+imported on first access, so `import apex_scoring.<module>` only loads what that
+module needs (keeps Lambda cold starts short).
 """
 
-from .bell_curve import BellCurveCalculator
-from .aggregators import SubcategoryAggregator
-from .company_scores import CompanyScoreCalculator
-from .validator import ScoreValidator
+import importlib
+from typing import TYPE_CHECKING
 
-__all__ = [
-    "BellCurveCalculator",
-    "SubcategoryAggregator", 
-    "CompanyScoreCalculator",
-    "ScoreValidator"
-]
+_EXPORTS = {
+    "BellCurveCalculator": ".bell_curve",
+    "SubcategoryAggregator": ".aggregators",
+    "CompanyScoreCalculator": ".company_scores",
+    "StudentCategoryHolisticCalculator": ".company_scores",
+    "ScoringConfig": ".scoring_config",
+    "ScoreValidator": ".validator",
+    "DaySnapshot": ".snapshot",
+    "IncrementalDay": ".incremental",
+    "RunJournal": ".journal",
+    "ChangeOnlyWriter": ".changes",
+    "CurveModel": ".curves",
+    "WhatIfScorer": ".curves",
+    "RankIndexBuilder": ".leaderboards",
+    "KLLSketch": ".sketches",
+    "SketchStore": ".sketches",
+    "RawScoreEngine": ".raw_scores",
+    "Backfill": ".backfill",
+    "ShardedDailyRun": ".sharding",
+    "ScoreArchive": ".archive",
+    "ShadowStorage": ".shadow",
+    "StorageBackend": ".storage",
+    "SupabaseStorage": ".storage",
+    "SQLiteStorage": ".storage",
+    "PopulationGenerator": ".synthetic",
+}
 
+__all__ = list(_EXPORTS)
 
 
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
+
+
+if TYPE_CHECKING:
+    from .bell_curve import BellCurveCalculator
+    from .aggregators import SubcategoryAggregator
+    from .company_scores import CompanyScoreCalculator, StudentCategoryHolisticCalculator
+    from .scoring_config import ScoringConfig
+    from .validator import ScoreValidator
+    from .snapshot import DaySnapshot
+    from .incremental import IncrementalDay
+    from .journal import RunJournal
+    from .changes import ChangeOnlyWriter
+    from .curves import CurveModel, WhatIfScorer
+    from .leaderboards import RankIndexBuilder
+    from .sketches import KLLSketch, SketchStore
+    from .raw_scores import RawScoreEngine
+    from .backfill import Backfill
+    from .sharding import ShardedDailyRun
+    from .archive import ScoreArchive
+    from .shadow import ShadowStorage
+    from .storage import StorageBackend, SupabaseStorage, SQLiteStorage
+    from .synthetic import PopulationGenerator
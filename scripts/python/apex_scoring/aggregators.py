@@ -2,114 +2,238 @@ from __future__ import annotations
 
 # Exported from nbdev notebooks (01-subcategory-aggregators.ipynb)
 import logging
-from typing import Optional, Dict, Any, List
+from typing import TYPE_CHECKING, Optional, Dict, Any, List
 from datetime import datetime
 
-from supabase import Client
+import numpy as np
 from apex_scoring.bell_curve import BellCurveCalculator
+from apex_scoring.concurrency import TaskPool
+from apex_scoring.curves import BELL_CURVE, CURVE_MODEL_KEY, CURVE_MODEL_TABLE, IDENTITY, CurveModel
+from apex_scoring.db import BulkWriter, DAY_KEY, DEFAULT_PAGE_SIZE, iter_pages, paged_select
+from apex_scoring.journal import RunJournal
+from apex_scoring.scoring_config import ScoringConfig
+from apex_scoring.snapshot import DaySnapshot
+from apex_scoring.storage import StorageBackend, as_storage
+
+if TYPE_CHECKING:
+    from supabase import Client
 
 logger = logging.getLogger(__name__)
 
+# Journal phase of per-subcategory normalization units (shard = subcategory id)
+NORMALIZE_UNIT = 'normalize'
+
 
 class SubcategoryAggregator:
-    def __init__(self, supabase_client: Client):
-        self.supabase = supabase_client
+    def __init__(
+        self,
+        storage: StorageBackend | Client,
+        write_chunk_size: int = BulkWriter.DEFAULT_CHUNK_SIZE,
+        pool: Optional[TaskPool] = None,
+        page_size: int = DEFAULT_PAGE_SIZE,
+    ):
+        self.storage = as_storage(storage)
+        self.page_size = page_size
+        # Subcategories are curved independently, so they are normalized concurrently
+        self.pool = pool or TaskPool()
         self.bell_curve = BellCurveCalculator()
-        # GPA subcategory ids excluded from curve
-        self.GPA_SUBCATEGORY_IDS = {
-            'f50830fe-b820-4223-89e2-e69241b459af',
-            '8d13f1b9-33e1-4a62-be45-488a6834112f',
-            'd1d972a4-2484-4b9a-a53c-0b63bb2e952c',
-        }
+        self.writer = BulkWriter(self.storage, chunk_size=write_chunk_size)
+        # GPA subcategories (excluded from the curve) come from the scoring config, read on first use
+        self._config: Optional[ScoringConfig] = None
+        self._keeps_curve_models: Optional[bool] = None
+
+    @property
+    def config(self) -> ScoringConfig:
+        if self._config is None:
+            self._config = ScoringConfig.load(self.storage, page_size=self.page_size)
+        return self._config
+
+    @property
+    def keeps_curve_models(self) -> bool:
+        """Whether curve models are written: only once the `subcategory_curve_models` migration is applied."""
+        if self._keeps_curve_models is None:
+            self._keeps_curve_models = self.storage.has_table(CURVE_MODEL_TABLE)
+            if not self._keeps_curve_models:
+                logger.warning(f"Table {CURVE_MODEL_TABLE} not found; curve models are not written")
+        return self._keeps_curve_models
 
     def get_subcategories(self) -> List[Dict[str, Any]]:
-        resp = self.supabase.table('subcategories').select('id,name').execute()
-        return resp.data or []
+        return paged_select(self.storage, 'subcategories', 'id,name', page_size=self.page_size)
 
     def get_students(self) -> List[Dict[str, Any]]:
-        resp = self.supabase.table('students').select('id').execute()
-        return resp.data or []
+        return paged_select(self.storage, 'students', 'id', page_size=self.page_size)
 
     def _get_latest_scores_for_subcategory(self, subcategory_id: str) -> List[Dict[str, Any]]:
-        latest_resp = (
-            self.supabase
-            .table('student_subcategory_scores')
-            .select('calculation_date')
-            .eq('subcategory_id', subcategory_id)
-            .order('calculation_date', desc=True)
-            .limit(1)
-            .execute()
+        latest = self.storage.select(
+            'student_subcategory_scores', 'calculation_date',
+            eq={'subcategory_id': subcategory_id}, order='calculation_date', desc=True, limit=1,
         )
-        if not latest_resp.data:
+        if not latest:
             return []
-        latest_date = latest_resp.data[0]['calculation_date']
-        rows_resp = (
-            self.supabase
-            .table('student_subcategory_scores')
-            .select('id, student_id, score, calculation_date')
-            .eq('subcategory_id', subcategory_id)
-            .eq('calculation_date', latest_date)
-            .execute()
+        return self._get_scores_for_subcategory(subcategory_id, latest[0]['calculation_date'])
+
+    def _get_scores_for_subcategory(self, subcategory_id: str, calculation_date: str) -> List[Dict[str, Any]]:
+        return paged_select(
+            self.storage,
+            'student_subcategory_scores',
+            'id, student_id, subcategory_id, score, academic_year_start, academic_year_end, calculation_date',
+            eq={'subcategory_id': subcategory_id, 'calculation_date': calculation_date},
+            key=DAY_KEY,
+            page_size=self.page_size,
         )
-        return rows_resp.data or []
+
+    def curve_model(
+        self, subcategory_id: str, calculation_date: str, raw_scores, stats: Optional[dict] = None,
+        config: Optional[ScoringConfig] = None,
+    ) -> CurveModel:
+        """The persisted curve model of a subcategory's raw scores for a day."""
+        method = IDENTITY if subcategory_id in (config or self.config).gpa_subcategory_ids else BELL_CURVE
+        return CurveModel.fit(subcategory_id, calculation_date, raw_scores, method, stats, self.bell_curve)
+
+    def _write_curve_model(self, model: CurveModel) -> int:
+        if not self.keeps_curve_models:
+            return 0
+        return self.writer.upsert(CURVE_MODEL_TABLE, [model.to_row()], on_conflict=CURVE_MODEL_KEY)
+
+    def _normalized_score_payload(self, row: Dict[str, Any], normalized_score: float) -> Dict[str, Any]:
+        # On Supabase a bulk update is an upsert on `id`, whose insert half needs the NOT NULL key columns.
+        return {
+            'id': row['id'],
+            'student_id': row['student_id'],
+            'subcategory_id': row['subcategory_id'],
+            'score': row['score'],
+            'academic_year_start': row.get('academic_year_start'),
+            'academic_year_end': row.get('academic_year_end'),
+            'calculation_date': row['calculation_date'],
+            'normalized_score': float(normalized_score),
+        }
 
     def _normalize_latest_subcategory_scores(self, subcategory_id: str) -> dict:
-        rows = self._get_latest_scores_for_subcategory(subcategory_id)
+        return self._normalize_rows(subcategory_id, self._get_latest_scores_for_subcategory(subcategory_id))
+
+    def normalize_subcategory_for_day(self, subcategory_id: str, calculation_date: str) -> dict:
+        """Curve one subcategory's scores for `calculation_date` and write its normalized scores."""
+        return self._normalize_rows(subcategory_id, self._get_scores_for_subcategory(subcategory_id, calculation_date))
+
+    def _normalize_rows(self, subcategory_id: str, rows: List[Dict[str, Any]]) -> dict:
         if not rows:
-            return {'normalized': False, 'reason': 'No rows to process', 'count': 0}
-
-        if subcategory_id in self.GPA_SUBCATEGORY_IDS:
-            updated_count = 0
-            for row in rows:
-                if row.get('score') is not None:
-                    self.supabase.table('student_subcategory_scores').update({
-                        'normalized_score': float(row['score'])
-                    }).eq('id', row['id']).execute()
-                    updated_count += 1
+            return {'normalized': False, 'reason': 'No rows to process', 'count': 0, 'rows_written': 0}
+
+        scored_rows = [r for r in rows if r.get('score') is not None]
+        calculation_date = str(rows[0]['calculation_date'])[:10]
+
+        if subcategory_id in self.config.gpa_subcategory_ids:
+            payloads = [self._normalized_score_payload(r, float(r['score'])) for r in scored_rows]
+            rows_written = self.writer.update('student_subcategory_scores', payloads)
+            rows_written += self._write_curve_model(
+                self.curve_model(subcategory_id, calculation_date, [float(r['score']) for r in scored_rows])
+            )
             return {
                 'normalized': False,
                 'reason': 'GPA subcategory - normalized_score set to raw score',
-                'count': updated_count,
+                'count': len(payloads),
+                'rows_written': rows_written,
             }
 
-        raw_scores = [float(r['score']) for r in rows if r.get('score') is not None]
-        if not raw_scores:
-            return {'normalized': False, 'reason': 'No scores to normalize', 'count': 0}
+        if not scored_rows:
+            return {'normalized': False, 'reason': 'No scores to normalize', 'count': 0, 'rows_written': 0}
 
-        normalized_scores, stats = self.bell_curve.apply_bell_curve_to_scores(raw_scores)
-        for row, norm in zip(rows, normalized_scores):
-            self.supabase.table('student_subcategory_scores').update({
-                'normalized_score': float(norm)
-            }).eq('id', row['id']).execute()
+        raw_scores = [float(r['score']) for r in scored_rows]
+        normalized_scores, stats = self.bell_curve.apply_bell_curve_to_array(raw_scores)
+        payloads = [self._normalized_score_payload(r, norm) for r, norm in zip(scored_rows, normalized_scores)]
+        rows_written = self.writer.update('student_subcategory_scores', payloads)
+        rows_written += self._write_curve_model(self.curve_model(subcategory_id, calculation_date, raw_scores, stats))
 
         return {
             'normalized': True,
             'count': len(normalized_scores),
+            'rows_written': rows_written,
             'raw_stats': stats.get('raw_stats'),
             'normalized_stats': stats.get('normalized_stats'),
         }
 
-    def normalize_all_subcategories_for_latest_day(self) -> dict:
-        latest_resp = (
-            self.supabase
-            .table('student_subcategory_scores')
-            .select('calculation_date')
-            .order('calculation_date', desc=True)
-            .limit(1)
-            .execute()
+    def normalize_all_subcategories_for_latest_day(self, journal: Optional[RunJournal] = None) -> dict:
+        """Curve every subcategory of the latest scored day.
+
+        With a `journal`, subcategories it records as normalized are skipped and each
+        newly normalized subcategory is recorded, so a failed run can resume.
+        """
+        latest = self.storage.select(
+            'student_subcategory_scores', 'calculation_date', order='calculation_date', desc=True, limit=1,
         )
-        if not latest_resp.data:
+        if not latest:
             return {}
-        latest_date = latest_resp.data[0]['calculation_date']
-        sub_resp = (
-            self.supabase
-            .table('student_subcategory_scores')
-            .select('subcategory_id')
-            .eq('calculation_date', latest_date)
-            .execute()
-        )
-        sub_ids = sorted({r['subcategory_id'] for r in (sub_resp.data or [])})
+        latest_date = latest[0]['calculation_date']
+        sub_ids = set()
+        for page in iter_pages(
+            self.storage, 'student_subcategory_scores', ('subcategory_id',), eq={'calculation_date': latest_date},
+            key=DAY_KEY, page_size=self.page_size, prefetch=True,
+        ):
+            sub_ids.update(page['subcategory_id'])
+        sub_ids = sorted(sub_ids)
         results = {}
-        for sid in sub_ids:
-            results[sid] = self._normalize_latest_subcategory_scores(sid)
-        return {'latest_date': latest_date, 'results': results}
+        if journal is not None:
+            for sid in sorted(journal.completed_shards(NORMALIZE_UNIT) & set(sub_ids)):
+                results[sid] = {**journal.get(NORMALIZE_UNIT, sid)['details'], 'rows_written': 0, 'resumed': True}
+            sub_ids = [sid for sid in sub_ids if sid not in results]
+
+        def normalize(sid: str) -> dict:
+            outcome = self._normalize_latest_subcategory_scores(sid)
+            if journal is not None:
+                journal.record(NORMALIZE_UNIT, sid, rows_written=outcome.get('rows_written', 0), details={
+                    k: v for k, v in outcome.items() if k in ('normalized', 'reason', 'count')
+                })
+            return outcome
+
+        outcomes = self.pool.map(normalize, sub_ids, name='normalize_subcategory')
+        results.update(zip(sub_ids, outcomes))
+        rows_written = sum(r.get('rows_written', 0) for r in results.values())
+        return {'latest_date': latest_date, 'results': results, 'rows_written': rows_written}
+
+    def normalize_snapshot(self, snapshot: DaySnapshot, only: Optional[set] = None) -> dict:
+        """Normalize every subcategory in a `DaySnapshot` in place; writes are left staged on the snapshot.
+
+        `only` restricts the pass to the given subcategory ids. A curve model is staged
+        for every subcategory of the day either way, since models depend only on raw scores.
+        """
+        subcategories = snapshot.score_ids['subcategory_id']
+        rows_by_subcategory = [
+            (sid, rows) for sid, rows in zip(subcategories.ids, subcategories.groups()) if sid
+        ]
+        scores = snapshot.scores['score']
+        scored = ~np.isnan(scores)
+        results = {}
+        stats_by_subcategory = {}
+        for sid, rows in rows_by_subcategory:
+            if only is not None and sid not in only:
+                continue
+            row_idx = rows[scored[rows]]
+            if row_idx.size == 0:
+                results[sid] = {'normalized': False, 'reason': 'No scores to normalize', 'count': 0}
+                continue
+            if sid in snapshot.config.gpa_subcategory_ids:
+                snapshot.set_normalized_scores(row_idx, scores[row_idx])
+                results[sid] = {
+                    'normalized': False,
+                    'reason': 'GPA subcategory - normalized_score set to raw score',
+                    'count': int(row_idx.size),
+                }
+                continue
+            normalized_scores, stats = self.bell_curve.apply_bell_curve_to_array(scores[row_idx])
+            snapshot.set_normalized_scores(row_idx, normalized_scores)
+            stats_by_subcategory[sid] = stats
+            results[sid] = {
+                'normalized': True,
+                'count': int(row_idx.size),
+                'raw_stats': stats.get('raw_stats'),
+                'normalized_stats': stats.get('normalized_stats'),
+            }
+        if self.keeps_curve_models:
+            models = [
+                self.curve_model(
+                    sid, snapshot.calculation_date, scores[rows], stats_by_subcategory.get(sid), snapshot.config,
+                )
+                for sid, rows in rows_by_subcategory
+            ]
+            snapshot.stage(CURVE_MODEL_TABLE, [m.to_row() for m in models if m.score_count], on_conflict=CURVE_MODEL_KEY)
+        return {'latest_date': snapshot.calculation_date, 'results': results}
@@ -0,0 +1,238 @@
+"""
+apex_scoring.archive
+
+Columnar archive of the daily score tables.
+
+Every scored day adds a full population snapshot to each of the six score
+tables. `ScoreArchive` exports older days to Parquet, one file per table and day,
+laid out as hive partitions:
+
+    <root>/<table>/year=<academic year>/date=<calculation_date>/part-0.parquet
+
+Each day is streamed out page by page. Optionally the day is then pruned from the
+hot table, once the file's row count matches the day's rows still in storage. With `keep_weekly`, the last
+scored day of each ISO week stays in the hot tables. Scores are year-to-date, so
+that day is the week's value, and dashboards keep a weekly trend without the daily
+rows. `read_archive` reads a table back through memory-mapped Arrow datasets,
+pruning partitions on the requested date range.
+
+Parquet needs pyarrow, which is optional; it is imported when an archive is
+written or read.
+"""
+
+import json
+import logging
+import os
+from datetime import date, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from apex_scoring.db import DEFAULT_PAGE_SIZE, NATURAL_KEYS, iter_row_pages
+from apex_scoring.raw_scores import academic_year_of
+from apex_scoring.storage import StorageBackend, as_storage
+
+logger = logging.getLogger(__name__)
+
+SCORE_TABLES = tuple(NATURAL_KEYS)
+
+# Arrow types of the score table columns; any other column is archived as a string
+FLOAT_COLUMNS = frozenset({
+    'score', 'normalized_score', 'raw_score', 'raw_points', 'holistic_gpa', 'total_possible_points',
+})
+INT_COLUMNS = frozenset({
+    'data_points_count', 'subcategory_count', 'student_count', 'academic_year_start', 'academic_year_end',
+})
+# Stored as JSON text, since the keys (category ids) differ between rows
+JSON_COLUMNS = frozenset({'category_breakdown'})
+
+PARTITION_FIELDS = ('year', 'date')
+
+
+def _pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+        import pyarrow.fs as fs
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError("The score archive requires pyarrow (pip install pyarrow)") from e
+    return pa, pq, ds, fs
+
+
+def day_path(root: str, table: str, calculation_date: str) -> str:
+    """Parquet file holding `table`'s rows for `calculation_date`."""
+    year = academic_year_of(date.fromisoformat(calculation_date))
+    return os.path.join(root, table, f'year={year}', f'date={calculation_date}', 'part-0.parquet')
+
+
+def week_closing_days(days: Iterable[str]) -> List[str]:
+    """The last of `days` in each ISO week."""
+    last: Dict[Any, str] = {}
+    for d in days:
+        week = date.fromisoformat(d).isocalendar()[:2]
+        last[week] = max(last.get(week, d), d)
+    return sorted(last.values())
+
+
+class ScoreArchive:
+    """
+    Exports score table days to Parquet under `root` and optionally prunes them from storage.
+
+    A day's file is written to a temporary name and renamed when complete, so an
+    interrupted export never leaves a partial file behind; exporting a day again
+    replaces its file.
+    """
+
+    def __init__(self, storage: StorageBackend, root: str, page_size: int = DEFAULT_PAGE_SIZE) -> None:
+        self.storage = as_storage(storage)
+        self.root = root
+        self.page_size = page_size
+
+    def scored_days(self, table: str, start: Optional[date] = None, end: Optional[date] = None) -> List[str]:
+        """Distinct `calculation_date`s of `table` in [`start`, `end`), one indexed lookup per day."""
+        days: List[str] = []
+        cursor = (start - timedelta(days=1)).isoformat() if start else None
+        while True:
+            rows = self.storage.select(
+                table, 'calculation_date', gt={'calculation_date': cursor} if cursor else None,
+                order='calculation_date', limit=1,
+            )
+            if not rows:
+                break
+            cursor = str(rows[0]['calculation_date'])[:10]
+            if end and cursor >= end.isoformat():
+                break
+            days.append(cursor)
+        return days
+
+    def export_day(self, table: str, calculation_date: str) -> int:
+        """Write `table`'s rows for `calculation_date` to Parquet. Returns the rows written (0: no file)."""
+        pa, pq, _, _ = _pyarrow()
+        path = day_path(self.root, table, calculation_date)
+        partial = path + '.partial'
+        writer = None
+        rows_written = 0
+        try:
+            for page in iter_row_pages(
+                self.storage, table, '*', eq={'calculation_date': calculation_date}, page_size=self.page_size, prefetch=True,
+            ):
+                if writer is None:
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    writer = pq.ParquetWriter(partial, self._schema(pa, page[0]))
+                writer.write_table(pa.Table.from_pylist([self._encode(r) for r in page], schema=writer.schema))
+                rows_written += len(page)
+        except BaseException:
+            if writer is not None:
+                writer.close()
+                os.remove(partial)
+            raise
+        if writer is None:
+            return 0
+        writer.close()
+        os.replace(partial, path)
+        return rows_written
+
+    @staticmethod
+    def _schema(pa, row: Dict[str, Any]):
+        def arrow_type(column: str):
+            if column in FLOAT_COLUMNS:
+                return pa.float64()
+            if column in INT_COLUMNS:
+                return pa.int64()
+            return pa.string()
+        return pa.schema([(column, arrow_type(column)) for column in row])
+
+    @staticmethod
+    def _encode(row: Dict[str, Any]) -> Dict[str, Any]:
+        row = dict(row)
+        for column, value in row.items():
+            if column in JSON_COLUMNS and value is not None and not isinstance(value, str):
+                row[column] = json.dumps(value)
+            elif column in FLOAT_COLUMNS and value is not None:
+                row[column] = float(value)
+            elif column not in INT_COLUMNS and value is not None and not isinstance(value, str):
+                row[column] = str(value)
+        return row
+
+    def archive(
+        self,
+        end: date,
+        start: Optional[date] = None,
+        tables: Sequence[str] = SCORE_TABLES,
+        prune: bool = False,
+        keep_weekly: bool = False,
+    ) -> Dict[str, Dict[str, int]]:
+        """Export every scored day in [`start`, `end`) of `tables`, then optionally prune it from storage.
+
+        A day is only pruned after its file is written and its row count matches
+        the day's rows in storage, counted again just before the delete. With `keep_weekly`, the last archived day of each ISO week
+        is kept in storage. Returns per-table counts.
+        """
+        _pyarrow()
+        summary: Dict[str, Dict[str, int]] = {}
+        for table in tables:
+            days = self.scored_days(table, start, end)
+            keep = set(week_closing_days(days)) if keep_weekly else set()
+            counts = {'days_archived': 0, 'rows_archived': 0, 'days_pruned': 0, 'weekly_days_kept': len(keep)}
+            for day in days:
+                rows = self.export_day(table, day)
+                counts['days_archived'] += 1
+                counts['rows_archived'] += rows
+                if prune and day not in keep:
+                    self._verify(table, day)
+                    self.storage.delete(table, {'calculation_date': day})
+                    counts['days_pruned'] += 1
+            logger.info(f"Archived {table}: {counts}")
+            summary[table] = counts
+        return summary
+
+    def stored_rows(self, table: str, calculation_date: str) -> int:
+        """Rows of `table` for `calculation_date` currently in storage."""
+        return sum(len(page) for page in iter_row_pages(
+            self.storage, table, 'id', eq={'calculation_date': calculation_date}, page_size=self.page_size,
+        ))
+
+    def _verify(self, table: str, calculation_date: str) -> None:
+        # Counted after the export, so rows written to the day meanwhile stop the prune
+        _, pq, _, _ = _pyarrow()
+        path = day_path(self.root, table, calculation_date)
+        archived = pq.read_metadata(path).num_rows if os.path.exists(path) else 0
+        stored = self.stored_rows(table, calculation_date)
+        if archived != stored:
+            raise RuntimeError(
+                f"Archive of {table} for {calculation_date} has {archived} rows, storage has {stored}; not pruning"
+            )
+
+
+def read_archive(
+    root: str,
+    table: str,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    columns: Optional[Sequence[str]] = None,
+    academic_year: Optional[int] = None,
+):
+    """Archived rows of `table` in [`start`, `end`) as a `pyarrow.Table`, read through memory maps.
+
+    Filters prune whole partitions, so only the requested days' files are opened.
+    Use `.to_pandas()` or `.column(name).to_numpy()` for analysis.
+    """
+    pa, _, ds, fs = _pyarrow()
+    dataset = ds.dataset(
+        os.path.join(root, table),
+        format='parquet',
+        filesystem=fs.LocalFileSystem(use_mmap=True),
+        partitioning=ds.partitioning(pa.schema([('year', pa.int32()), ('date', pa.string())]), flavor='hive'),
+    )
+    conditions = []
+    if start is not None:
+        conditions.append(ds.field('date') >= start.isoformat())
+    if end is not None:
+        conditions.append(ds.field('date') < end.isoformat())
+    if academic_year is not None:
+        conditions.append(ds.field('year') == academic_year)
+    expression = None
+    for condition in conditions:
+        expression = condition if expression is None else expression & condition
+    if columns is None:
+        columns = [name for name in dataset.schema.names if name not in PARTITION_FIELDS]
+    return dataset.to_table(columns=list(columns), filter=expression)
@@ -0,0 +1,234 @@
+"""
+apex_scoring.backfill
+
+Recompute a range of calculation days in parallel.
+
+Changing a subcategory/category weight or a bell-curve constant means every
+stored day has to be re-scored. `Backfill` runs each day of a date range on a
+process pool; a worker scores one day at a time through the snapshot path
+(load the day once, curve, roll up students and companies, flush with bulk
+upserts on the natural keys), optionally recomputing the raw scores from
+`event_submissions` first.
+
+Once the days are scored, the parent process builds rank indexes in date order,
+from the earliest day scored onwards (a day's rank changes refer to the day
+before it). A day is appended to a checkpoint file (one JSON object per line)
+only once its rank indexes are built, so an interrupted backfill can be rerun
+with the same arguments and only the remaining days are scored. Days are
+independent: a failed day is reported and left out of the checkpoint without
+stopping the others.
+"""
+
+import json
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from apex_scoring.aggregators import SubcategoryAggregator
+from apex_scoring.company_scores import CompanyScoreCalculator, StudentCategoryHolisticCalculator
+from apex_scoring.concurrency import TaskPool
+from apex_scoring.db import BulkWriter
+from apex_scoring.leaderboards import RankIndexBuilder
+from apex_scoring.raw_scores import RawScoreEngine, academic_year_of
+from apex_scoring.snapshot import DaySnapshot
+from apex_scoring.storage import StorageBackend
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROCESSES = max(1, min(8, os.cpu_count() or 1))
+
+# Opens a storage backend inside a worker process; must be picklable
+# (e.g. `functools.partial(SQLiteStorage, path)` or `functools.partial(SupabaseStorage.connect, url, key)`)
+StorageFactory = Callable[[], StorageBackend]
+
+
+def date_range(start: date, end: date) -> List[date]:
+    """Every day from `start` to `end`, both included."""
+    if end < start:
+        raise ValueError(f"Backfill end {end} is before start {start}")
+    return [start + timedelta(days=i) for i in range((end - start).days + 1)]
+
+
+class BackfillCheckpoint:
+    """Append-only record of finished days: one JSON object per line, keyed by `calculation_date`."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+
+    def finished_days(self) -> Set[str]:
+        if not os.path.exists(self.path):
+            return set()
+        days = set()
+        with open(self.path) as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    days.add(json.loads(line)['calculation_date'])
+                except (ValueError, KeyError):
+                    # A line cut short by a crash; that day is simply scored again
+                    logger.warning(f"Ignoring unreadable checkpoint line in {self.path}: {line[:80]}")
+        return days
+
+    def record(self, result: Dict[str, Any]) -> None:
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(result, default=str) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+
+# Storage opened once per worker process by `_init_worker`
+_worker_storage: Optional[StorageBackend] = None
+
+
+def _init_worker(open_storage: StorageFactory) -> None:
+    global _worker_storage
+    _worker_storage = open_storage()
+
+
+def _run_in_worker(task: Callable[..., Any], args: Tuple) -> Any:
+    """Call `task(storage, *args)` with the worker's storage (also used by `sharding`)."""
+    return task(_worker_storage, *args)
+
+
+def score_day(
+    storage: StorageBackend,
+    calculation_date: date,
+    write_chunk_size: int = BulkWriter.DEFAULT_CHUNK_SIZE,
+    calculate_raw_scores: bool = False,
+) -> Dict[str, Any]:
+    """Re-score one day through the snapshot path, replacing the day's stored derived rows."""
+    started = time.perf_counter()
+    day = calculation_date.isoformat()
+    result: Dict[str, Any] = {'calculation_date': day}
+    if calculate_raw_scores:
+        raw = RawScoreEngine(storage, write_chunk_size=write_chunk_size)
+        result['raw_rows_upserted'] = raw.compute_and_write(academic_year_of(calculation_date), calculation_date)['rows_upserted']
+
+    snapshot = DaySnapshot.load(storage, day)
+    if snapshot.score_count == 0:
+        logger.info(f"No subcategory scores stored for {day}; nothing to backfill")
+        result.update(score_rows=0, rows_written={}, seconds=round(time.perf_counter() - started, 3))
+        return result
+
+    # One process per day already uses the cores; curve the day's subcategories sequentially
+    SubcategoryAggregator(storage, write_chunk_size=write_chunk_size, pool=TaskPool(max_workers=1)).normalize_snapshot(snapshot)
+    StudentCategoryHolisticCalculator(storage, write_chunk_size=write_chunk_size).compute_student_scores_from_snapshot(
+        snapshot, merge_existing=True
+    )
+    CompanyScoreCalculator(storage, write_chunk_size=write_chunk_size).compute_company_scores_from_snapshot(
+        snapshot, merge_existing=True
+    )
+    result['score_rows'] = snapshot.score_count
+    result['rows_written'] = snapshot.flush(BulkWriter(storage, chunk_size=write_chunk_size))
+    result['seconds'] = round(time.perf_counter() - started, 3)
+    return result
+
+
+class Backfill:
+    """
+    Re-scores every day from `start` to `end` on `processes` worker processes.
+
+    Workers are started with the `spawn` method and each opens its own storage
+    through `open_storage`, so no connection is shared between processes.
+    """
+
+    def __init__(
+        self,
+        open_storage: StorageFactory,
+        checkpoint_path: str,
+        processes: int = DEFAULT_PROCESSES,
+        write_chunk_size: int = BulkWriter.DEFAULT_CHUNK_SIZE,
+        calculate_raw_scores: bool = False,
+    ) -> None:
+        if processes <= 0:
+            raise ValueError("processes must be positive")
+        self.open_storage = open_storage
+        self.checkpoint = BackfillCheckpoint(checkpoint_path)
+        self.processes = processes
+        self.write_chunk_size = write_chunk_size
+        self.calculate_raw_scores = calculate_raw_scores
+
+    def run(self, start: date, end: date) -> Dict[str, Any]:
+        """Score the days of `start`..`end` not already in the checkpoint.
+
+        Returns the per-day results of this run, the days skipped as already
+        finished and the days that failed (with their errors).
+        """
+        days = date_range(start, end)
+        finished = self.checkpoint.finished_days()
+        pending = [d for d in days if d.isoformat() not in finished]
+        logger.info(
+            f"Backfill {start}..{end}: {len(days)} days, {len(days) - len(pending)} already checkpointed, "
+            f"{len(pending)} to score on {min(self.processes, max(len(pending), 1))} processes"
+        )
+        started = time.perf_counter()
+        completed: List[Dict[str, Any]] = []
+        failed: Dict[str, str] = {}
+
+        def finish(result: Dict[str, Any]) -> None:
+            completed.append(result)
+            logger.info(f"Backfilled {result['calculation_date']} in {result['seconds']:.2f}s "
+                        f"({len(completed)}/{len(pending)})")
+
+        if self.processes == 1 or len(pending) <= 1:
+            storage = self.open_storage()
+            for d in pending:
+                try:
+                    finish(score_day(storage, d, self.write_chunk_size, self.calculate_raw_scores))
+                except Exception as e:
+                    logger.error(f"Backfill of {d} failed: {e}")
+                    failed[d.isoformat()] = str(e)
+        elif pending:
+            with ProcessPoolExecutor(
+                max_workers=min(self.processes, len(pending)),
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(self.open_storage,),
+            ) as executor:
+                futures = {
+                    executor.submit(_run_in_worker, score_day, (d, self.write_chunk_size, self.calculate_raw_scores)): d
+                    for d in pending
+                }
+                for future in as_completed(futures):
+                    d = futures[future]
+                    try:
+                        finish(future.result())
+                    except Exception as e:
+                        logger.error(f"Backfill of {d} failed: {e}")
+                        failed[d.isoformat()] = str(e)
+
+        # Rank changes refer to the previous day, so every day from the earliest one scored is re-ranked in
+        # date order, checkpointed days included; a scored day is checkpointed once its ranks are built
+        if completed:
+            scored = {r['calculation_date']: r for r in completed}
+            ranks = RankIndexBuilder(self.open_storage(), write_chunk_size=self.write_chunk_size)
+            for day in (d.isoformat() for d in days if d.isoformat() >= min(scored)):
+                if day in failed:
+                    continue
+                try:
+                    rank_rows = ranks.build(day)['rows_written']
+                except Exception as e:
+                    logger.error(f"Rank indexes of {day} failed: {e}")
+                    failed[day] = str(e)
+                    scored.pop(day, None)
+                    continue
+                if day in scored:
+                    scored[day]['rank_rows_written'] = rank_rows
+                    scored[day]['finished_at'] = datetime.now(timezone.utc).isoformat()
+                    self.checkpoint.record(scored[day])
+            completed = list(scored.values())
+
+        return {
+            'start': start.isoformat(),
+            'end': end.isoformat(),
+            'days_scored': sorted(completed, key=lambda r: r['calculation_date']),
+            'days_skipped': sorted(d.isoformat() for d in days if d.isoformat() in finished),
+            'days_failed': failed,
+            'total_execution_time': round(time.perf_counter() - started, 3),
+        }
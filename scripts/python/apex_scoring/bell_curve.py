@@ -6,12 +6,91 @@ using a left-weighted normal distribution.
 """
 
 import numpy as np
-from scipy import stats
-from typing import List, Tuple, Optional
+from typing import List, Protocol, Sequence, Tuple, Optional, Union
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Wichura's AS 241 (PPND16) rational approximations, coefficients in ascending powers.
+# Central region |p - 0.5| <= 0.425
+_PPF_CENTRAL_NUM = (
+    3.387132872796366608, 133.14166789178437745, 1971.5909503065514427, 13731.693765509461125,
+    45921.953931549871457, 67265.770927008700853, 33430.575583588128105, 2509.0809287301226727,
+)
+_PPF_CENTRAL_DEN = (
+    1.0, 42.313330701600911252, 687.1870074920579083, 5394.1960214247511077,
+    21213.794301586595867, 39307.89580009271061, 28729.085735721942674, 5226.495278852545925,
+)
+# Tails with r = sqrt(-log(min(p, 1 - p))) <= 5
+_PPF_NEAR_NUM = (
+    1.42343711074968357734, 4.6303378461565452959, 5.7694972214606914055, 3.64784832476320460504,
+    1.27045825245236838258, 0.24178072517745061177, 0.0227238449892691845833, 7.7454501427834140764e-4,
+)
+_PPF_NEAR_DEN = (
+    1.0, 2.05319162663775882187, 1.6763848301838038494, 0.68976733498510000455,
+    0.14810397642748007459, 0.0151986665636164571966, 5.475938084995344946e-4, 1.05075007164441684324e-9,
+)
+# Far tails, r > 5 (p below about 1e-11)
+_PPF_FAR_NUM = (
+    6.6579046435011037772, 5.4637849111641143699, 1.7848265399172913358, 0.29656057182850489123,
+    0.026532189526576123093, 0.0012426609473880784386, 2.71155556874348757815e-5, 2.01033439929228813265e-7,
+)
+_PPF_FAR_DEN = (
+    1.0, 0.59983220655588793769, 0.13692988092273580531, 0.0148753612908506148525,
+    7.868691311456132591e-4, 1.8463183175100546818e-5, 1.4215117583164458887e-7, 2.04426310338993978564e-15,
+)
+
+
+class ReferencePopulation(Protocol):
+    """A population to rank scores against (e.g. `apex_scoring.sketches.KLLSketch`)."""
+
+    def percentile_ranks(self, values: np.ndarray) -> np.ndarray:
+        """Share of the population strictly below each of `values`."""
+        ...
+
+
+def _poly(coefficients: Tuple[float, ...], x: np.ndarray) -> np.ndarray:
+    result = np.zeros_like(x)
+    for c in reversed(coefficients):
+        result = result * x + c
+    return result
+
+
+def norm_ppf(p: Union[float, Sequence[float], np.ndarray]) -> np.ndarray:
+    """Inverse of the standard normal CDF (AS 241), replacing `scipy.stats.norm.ppf`.
+
+    Relative error is about 1e-16 over (0, 1); 0 and 1 map to -inf and +inf.
+    """
+    p = np.asarray(p, dtype=float)
+    q = p - 0.5
+    with np.errstate(divide='ignore', invalid='ignore'):
+        r_central = 0.180625 - q * q
+        central = q * _poly(_PPF_CENTRAL_NUM, r_central) / _poly(_PPF_CENTRAL_DEN, r_central)
+        r = np.sqrt(-np.log(np.minimum(p, 1.0 - p)))
+        tail = np.where(
+            r <= 5.0,
+            _poly(_PPF_NEAR_NUM, r - 1.6) / _poly(_PPF_NEAR_DEN, r - 1.6),
+            _poly(_PPF_FAR_NUM, r - 5.0) / _poly(_PPF_FAR_DEN, r - 5.0),
+        )
+    tail = np.where(q < 0, -tail, tail)
+    result = np.where(np.abs(q) <= 0.425, central, tail)
+    result = np.where(p == 0.0, -np.inf, np.where(p == 1.0, np.inf, result))
+    return np.where((p < 0) | (p > 1) | np.isnan(p), np.nan, result)
+
+
+def _round_half_like_python(values: np.ndarray, decimals: int) -> np.ndarray:
+    """`np.round`, except that values within a hair of a half round exactly as the scalar `round` does.
+
+    `np.round` scales by 10**decimals before rounding, so a value just below a half
+    can be carried up to it (and the reverse); `round` works on the exact decimal value.
+    """
+    values = np.asarray(values, dtype=float)
+    rounded = np.array(np.round(values, decimals))
+    scaled = values * 10.0 ** decimals
+    near_half = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    rounded[near_half] = [round(v, decimals) for v in values[near_half].tolist()]
+    return rounded
+
 
 class BellCurveCalculator:
     """
@@ -41,18 +120,48 @@ class BellCurveCalculator:
         percentile_rank = max(self.MIN_PERCENTILE, min(self.MAX_PERCENTILE, percentile_rank))
         return percentile_rank
 
+    def calculate_percentile_ranks(
+        self, raw_scores: Union[Sequence[float], np.ndarray], reference: Optional[ReferencePopulation] = None,
+    ) -> np.ndarray:
+        """Batch form of `calculate_percentile_rank` for every score in `raw_scores`.
+
+        Sorts once and counts strictly-lower scores with `searchsorted`, so a
+        population of n scores costs O(n log n) instead of O(n^2). With a
+        `reference` (e.g. a `KLLSketch` of pooled cohorts), scores are ranked
+        against it instead of against each other.
+        """
+        scores = np.asarray(raw_scores, dtype=float)
+        if scores.size == 0:
+            return np.empty(0, dtype=float)
+        if reference is not None:
+            return np.clip(reference.percentile_ranks(scores), self.MIN_PERCENTILE, self.MAX_PERCENTILE)
+        sorted_scores = np.sort(scores, kind='mergesort')
+        scores_below = np.searchsorted(sorted_scores, scores, side='left')
+        percentile_ranks = scores_below / scores.size
+        return np.clip(percentile_ranks, self.MIN_PERCENTILE, self.MAX_PERCENTILE)
+
     def transform_percentile_to_gpa(self, percentile_rank: float) -> float:
         if percentile_rank is None or percentile_rank <= 0 or percentile_rank >= 1:
             return 0.0
-        z_score = stats.norm.ppf(percentile_rank)
+        z_score = float(norm_ppf(percentile_rank))
         if z_score > 0:
             z_score = z_score * self.LEFT_SKEW_FACTOR
         gpa_score = self.TARGET_MEAN + (self.STD_DEVIATION * z_score)
         gpa_score = max(self.MIN_GPA, min(self.MAX_GPA, gpa_score))
         return round(gpa_score, 2)
 
-    def calculate_distribution_stats(self, raw_scores: List[float]) -> dict:
-        if not raw_scores:
+    def transform_percentiles_to_gpa(self, percentile_ranks: Union[Sequence[float], np.ndarray]) -> np.ndarray:
+        """Batch form of `transform_percentile_to_gpa` using a single `norm_ppf` call."""
+        p = np.asarray(percentile_ranks, dtype=float)
+        valid = (p > 0) & (p < 1)
+        z_scores = norm_ppf(np.where(valid, p, 0.5))
+        z_scores = np.where(z_scores > 0, z_scores * self.LEFT_SKEW_FACTOR, z_scores)
+        gpa_scores = self.TARGET_MEAN + (self.STD_DEVIATION * z_scores)
+        gpa_scores = np.clip(gpa_scores, self.MIN_GPA, self.MAX_GPA)
+        return np.where(valid, _round_half_like_python(gpa_scores, 2), 0.0)
+
+    def calculate_distribution_stats(self, raw_scores: Union[List[float], np.ndarray]) -> dict:
+        if len(raw_scores) == 0:
             return {
                 'count': 0,
                 'mean': 0.0,
@@ -77,18 +186,23 @@ class BellCurveCalculator:
             }
         }
 
-    def apply_bell_curve_to_scores(
+    def apply_bell_curve_to_array(
         self,
-        raw_scores: List[float]
-    ) -> Tuple[List[float], dict]:
-        if not raw_scores:
-            return [], {'raw_stats': {}, 'normalized_stats': {}}
-        raw_stats = self.calculate_distribution_stats(raw_scores)
-        normalized_scores = []
-        for raw_score in raw_scores:
-            percentile = self.calculate_percentile_rank(raw_score, raw_scores)
-            gpa_score = self.transform_percentile_to_gpa(percentile)
-            normalized_scores.append(gpa_score)
+        raw_scores: Union[Sequence[float], np.ndarray],
+        reference: Optional[ReferencePopulation] = None,
+    ) -> Tuple[np.ndarray, dict]:
+        """Vectorized bell curve: percentile ranks and GPA transform over the whole population at once.
+
+        Produces exactly the values the scalar `calculate_percentile_rank` /
+        `transform_percentile_to_gpa` pair would, as an ndarray aligned with `raw_scores`.
+        With a `reference`, scores are curved against that population instead (see
+        `calculate_percentile_ranks`).
+        """
+        scores = np.asarray(raw_scores, dtype=float)
+        if scores.size == 0:
+            return np.empty(0, dtype=float), {'raw_stats': {}, 'normalized_stats': {}}
+        raw_stats = self.calculate_distribution_stats(scores)
+        normalized_scores = self.transform_percentiles_to_gpa(self.calculate_percentile_ranks(scores, reference))
         normalized_stats = self.calculate_distribution_stats(normalized_scores)
         logger.info("Bell curve transformation completed:")
         logger.info(f"  Raw scores - Mean: {raw_stats['mean']:.2f}, Std: {raw_stats['std_dev']:.2f}")
@@ -99,6 +213,15 @@ class BellCurveCalculator:
             'normalized_stats': normalized_stats
         }
 
+    def apply_bell_curve_to_scores(
+        self,
+        raw_scores: List[float]
+    ) -> Tuple[List[float], dict]:
+        if not raw_scores:
+            return [], {'raw_stats': {}, 'normalized_stats': {}}
+        normalized_scores, stats_ = self.apply_bell_curve_to_array(raw_scores)
+        return normalized_scores.tolist(), stats_
+
     def validate_distribution(self, normalized_scores: List[float]) -> dict:
         if not normalized_scores:
             return {'valid': False, 'reason': 'No scores to validate'}
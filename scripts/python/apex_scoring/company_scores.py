@@ -1,34 +1,792 @@
 """
 apex_scoring.company_scores
 
-Facade for company score calculations.
+Student category/holistic and company score calculations.
 
-Initially re-exports existing `CompanyScoreCalculator` to keep runtime stable.
-Later, nbdev notebooks can export directly to this module.
+Exported from nbdev notebook `02-company-scores.ipynb`.
 """
 
-try:
-    from company_score_calculator import CompanyScoreCalculator as _ImplCompanyScoreCalculator  # type: ignore
-except Exception:  # pragma: no cover
-    _ImplCompanyScoreCalculator = None  # type: ignore
+from __future__ import annotations
 
+import logging
+import os
+from typing import TYPE_CHECKING, List, Dict, Optional, Sequence, Tuple, Any
 
-class CompanyScoreCalculator:  # noqa: D401
-    """Facade that delegates to the existing implementation."""
+import numpy as np
 
-    def __init__(self, supabase_client):
-        if _ImplCompanyScoreCalculator is None:
-            raise ImportError("company_score_calculator module not available")
-        self._impl = _ImplCompanyScoreCalculator(supabase_client)
+from apex_scoring.db import BulkWriter, DAY_KEY, DEFAULT_PAGE_SIZE, NATURAL_KEYS, paged_select, read_columns
+from apex_scoring.interning import IdTable, score_id_tables
+from apex_scoring.scoring_config import ScoringConfig
+from apex_scoring.snapshot import Columns, DaySnapshot
+from apex_scoring.storage import StorageBackend, as_storage
 
-    async def calculate_all_company_scores(self, academic_year: int, calculation_date=None):
-        return await self._impl.calculate_all_company_scores(academic_year, calculation_date)
+if TYPE_CHECKING:
+    from supabase import Client
 
-    async def get_company_rankings(self, academic_year: int, calculation_date=None):
-        return await self._impl.get_company_rankings(academic_year, calculation_date)
+logger = logging.getLogger(__name__)
 
-    async def validate_company_scores(self, academic_year: int, calculation_date=None):
-        return await self._impl.validate_company_scores(academic_year, calculation_date)
+# Fallback basic logging if not configured by caller
+if not logger.handlers:
+    LOG_LEVEL = (os.getenv('LOG_LEVEL') or 'INFO').upper()
+    logging.basicConfig(level=getattr(logging, LOG_LEVEL, logging.INFO),
+                        format='%(asctime)s [%(levelname)s] %(name)s: %(message)s')
 
 
+# Student score columns read for the company rollups
+STUDENT_SCORE_COLUMNS = (
+    'student_id', 'subcategory_id', 'score', 'normalized_score', 'data_points_count',
+    'academic_year_start', 'academic_year_end', 'updated_at',
+)
+COMPANY_SUBCATEGORY_COLUMNS = (
+    'company_id', 'subcategory_id', 'raw_points', 'normalized_score', 'score', 'student_count',
+    'data_points_count', 'academic_year_start', 'academic_year_end', 'calculation_date',
+)
+# Per (company, subcategory) sums and counts that combine across student shards
+COMPANY_PARTIAL_COLUMNS = (
+    'company_id', 'subcategory_id', 'raw_sum', 'raw_n', 'norm_sum', 'norm_n', 'student_count',
+    'data_points_count', 'academic_year_start', 'academic_year_end',
+)
+COMPANY_CATEGORY_COLUMNS = (
+    'company_id', 'category_id', 'raw_score', 'normalized_score', 'subcategory_count',
+    'academic_year_start', 'academic_year_end', 'calculation_date',
+)
+COMPANY_HOLISTIC_COLUMNS = (
+    'company_id', 'holistic_gpa', 'academic_year_start', 'academic_year_end', 'calculation_date', 'category_breakdown',
+)
 
+
+def _to_optional(value: float) -> Optional[float]:
+    return None if np.isnan(value) else float(value)
+
+
+def _optional_list(values: np.ndarray) -> List[Optional[float]]:
+    """Python floats of a float array, NaN as None."""
+    converted = values.astype(object)
+    converted[np.isnan(values)] = None
+    return converted.tolist()
+
+
+def _as_float(values: np.ndarray) -> np.ndarray:
+    """Float64 copy of a score column, None mapped to NaN."""
+    if values.dtype.kind == 'f':
+        return values
+    return np.array([np.nan if v is None else float(v) for v in values], dtype=float)
+
+
+def _grouped_sum(group_codes: np.ndarray, values: np.ndarray, n_groups: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Per-group sum ignoring NaN values, and the number of values summed."""
+    present = ~np.isnan(values)
+    counts = np.bincount(group_codes, weights=present, minlength=n_groups).astype(np.int64)
+    sums = np.bincount(group_codes, weights=np.where(present, values, 0.0), minlength=n_groups)
+    return sums, counts
+
+
+def _grouped_mean(group_codes: np.ndarray, values: np.ndarray, n_groups: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Per-group mean ignoring NaN values (NaN for empty groups), and the number of values averaged."""
+    sums, counts = _grouped_sum(group_codes, values, n_groups)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(counts > 0, sums / np.maximum(counts, 1), np.nan), counts
+
+
+def _latest_per_key(codes: np.ndarray, updated_at: np.ndarray) -> np.ndarray:
+    """Positions of one row per distinct code: the latest `updated_at`, the first such row on ties."""
+    n = len(codes)
+    stamps = np.unique(np.array([u or '' for u in updated_at], dtype=str), return_inverse=True)[1]
+    order = np.lexsort((-np.arange(n), stamps, codes))
+    sorted_codes = codes[order]
+    last = np.append(sorted_codes[1:] != sorted_codes[:-1], True)
+    return np.sort(order[last])
+
+
+def _empty_columns(columns: Sequence[str]) -> Columns:
+    return {c: np.empty(0, dtype=object) for c in columns}
+
+
+def _column_payloads(columns: Columns) -> List[Dict[str, Any]]:
+    """Row dicts from rollup columns: NaN becomes None and NumPy scalars become Python values."""
+    names = list(columns)
+    converted = []
+    for name in names:
+        values = columns[name]
+        if values.dtype.kind == 'f':
+            converted.append([_to_optional(v) for v in values])
+        elif values.dtype.kind in 'iu':
+            converted.append(values.tolist())
+        else:
+            converted.append(list(values))
+    return [dict(zip(names, row)) for row in zip(*converted)]
+
+
+class StudentCategoryHolisticCalculator:
+    """
+    Computes per-student category scores and holistic GPA for a given calculation_date.
+
+    - Category score = weighted average of that student's subcategory scores in the category.
+      We write both raw (score) and normalized_score averages.
+    - Holistic GPA = weighted average of the student's category normalized scores.
+    - Upserts into `student_category_scores` and `student_holistic_gpa`.
+
+    `compute_student_scores_for_day_bulk` is the set-based mode: it reads the whole day
+    once, computes both levels as matrix products with the compiled `ScoringConfig`
+    and writes them with bulk upserts.
+    """
+
+    def __init__(
+        self,
+        storage: StorageBackend | Client,
+        write_chunk_size: int = BulkWriter.DEFAULT_CHUNK_SIZE,
+        page_size: int = DEFAULT_PAGE_SIZE,
+    ):
+        self.storage = as_storage(storage)
+        self.writer = BulkWriter(self.storage, chunk_size=write_chunk_size)
+        self.page_size = page_size
+
+    # ---------- Context helpers ----------
+    def _get_latest_day_context(self) -> Optional[Dict[str, Any]]:
+        latest = self.storage.select(
+            'student_subcategory_scores', 'calculation_date, academic_year_start, academic_year_end',
+            order='calculation_date', desc=True, limit=1,
+        )
+        if not latest:
+            return None
+        row = latest[0]
+        return {
+            'calculation_date': row['calculation_date'],
+            'academic_year_start': row.get('academic_year_start'),
+            'academic_year_end': row.get('academic_year_end'),
+        }
+
+    def _load_config(self) -> ScoringConfig:
+        return ScoringConfig.load(self.storage, page_size=self.page_size)
+
+    def _load_subcategory_map(self) -> Tuple[Dict[str, str], Dict[str, float]]:
+        """Return mapping: subcategory_id -> category_id, and subcategory_id -> weight (default 1.0)."""
+        config = self._load_config()
+        return config.cat_by_sub, config.weight_by_sub
+
+    def _load_category_weights(self) -> Dict[str, float]:
+        return self._load_config().category_weights
+
+    def _weighted_avg(self, items: List[Tuple[float, float]]) -> Optional[float]:
+        if not items:
+            return None
+        num = sum(v * w for v, w in items)
+        den = sum(w for _, w in items)
+        if den <= 0:
+            return None
+        return float(num / den)
+
+    # ---------- Student category calculations ----------
+    def compute_student_category_scores_for_day(self, calculation_date: str) -> Dict[str, int]:
+        """Compute and upsert category scores for all students for `calculation_date`."""
+        logger.info(f"Computing student category scores for {calculation_date}")
+        cat_by_sub, weight_by_sub = self._load_subcategory_map()
+
+        # Load all students
+        students = paged_select(self.storage, 'students', 'id', page_size=self.page_size)
+        total_rows = 0
+
+        for s in students:
+            student_id = s['id']
+            # Pull subcategory rows for student on this date
+            sub_rows = paged_select(
+                self.storage,
+                'student_subcategory_scores',
+                'subcategory_id, score, normalized_score, academic_year_start, academic_year_end',
+                eq={'student_id': student_id, 'calculation_date': calculation_date},
+                key=DAY_KEY,
+                page_size=self.page_size,
+            )
+            if not sub_rows:
+                continue
+
+            # Group into categories
+            by_category: Dict[str, Dict[str, List[Tuple[float, float]]]] = {}
+            # structure: {category_id: {'raw': [(value, w)], 'norm': [(value, w)], 'count': int}}
+            for r in sub_rows:
+                sid = r['subcategory_id']
+                cid = cat_by_sub.get(sid)
+                if not cid:
+                    continue
+                w = weight_by_sub.get(sid, 1.0)
+                raw_v = r.get('score')
+                norm_v = r.get('normalized_score')
+                if cid not in by_category:
+                    by_category[cid] = {'raw': [], 'norm': [], 'count': 0}
+                if raw_v is not None:
+                    try:
+                        by_category[cid]['raw'].append((float(raw_v), w))
+                    except Exception:
+                        pass
+                if norm_v is not None:
+                    try:
+                        by_category[cid]['norm'].append((float(norm_v), w))
+                    except Exception:
+                        pass
+                by_category[cid]['count'] += 1
+
+            # Upsert per category
+            for cid, parts in by_category.items():
+                raw_avg = self._weighted_avg(parts['raw'])
+                norm_avg = self._weighted_avg(parts['norm'])
+                sub_count = parts['count']
+                if raw_avg is None and norm_avg is None:
+                    continue
+
+                payload = {
+                    'student_id': student_id,
+                    'category_id': cid,
+                    'raw_score': raw_avg,
+                    'normalized_score': norm_avg,
+                    'subcategory_count': sub_count,
+                    'academic_year_start': sub_rows[0].get('academic_year_start'),
+                    'academic_year_end': sub_rows[0].get('academic_year_end'),
+                    'calculation_date': calculation_date,
+                }
+                # Idempotent write
+                self.storage.upsert(
+                    'student_category_scores', [payload], on_conflict=NATURAL_KEYS['student_category_scores']
+                )
+                total_rows += 1
+        return {'student_category_rows_upserted': total_rows}
+
+    # ---------- Student holistic calculations ----------
+    def compute_student_holistic_gpa_for_day(self, calculation_date: str) -> Dict[str, int]:
+        """Compute and upsert holistic GPA for all students for `calculation_date`."""
+        logger.info(f"Computing holistic GPA for {calculation_date}")
+        cat_weights = self._load_category_weights()
+
+        students = paged_select(self.storage, 'students', 'id', page_size=self.page_size)
+        total_rows = 0
+
+        for s in students:
+            student_id = s['id']
+            rows = paged_select(
+                self.storage,
+                'student_category_scores',
+                'category_id, normalized_score, academic_year_start, academic_year_end',
+                eq={'student_id': student_id, 'calculation_date': calculation_date},
+                key=DAY_KEY,
+                page_size=self.page_size,
+            )
+            if not rows:
+                continue
+
+            items: List[Tuple[float, float]] = []
+            breakdown: Dict[str, float] = {}
+            ay_start, ay_end = rows[0].get('academic_year_start'), rows[0].get('academic_year_end')
+            for r in rows:
+                score = r.get('normalized_score')
+                cid = r.get('category_id')
+                if score is None or not cid:
+                    continue
+                w = cat_weights.get(cid, 1.0)
+                try:
+                    v = float(score)
+                except Exception:
+                    continue
+                items.append((v, w))
+                breakdown[cid] = v
+
+            holistic = self._weighted_avg(items)
+            if holistic is None:
+                continue
+
+            payload = {
+                'student_id': student_id,
+                'holistic_gpa': holistic,
+                'academic_year_start': ay_start,
+                'academic_year_end': ay_end,
+                'calculation_date': calculation_date,
+                'category_breakdown': breakdown,
+            }
+            self.storage.upsert(
+                'student_holistic_gpa', [payload], on_conflict=NATURAL_KEYS['student_holistic_gpa']
+            )
+            total_rows += 1
+
+        return {'student_holistic_rows_upserted': total_rows}
+
+    # ---------- Set-based calculations ----------
+    def compute_student_scores_for_day_bulk(self, calculation_date: str) -> Dict[str, int]:
+        """Compute category scores and holistic GPAs for every student on `calculation_date` in one pass.
+
+        Same results as `compute_student_category_scores_for_day` followed by
+        `compute_student_holistic_gpa_for_day`, but costs a handful of queries instead of
+        two per student.
+        """
+        logger.info(f"Computing student category scores and holistic GPA (set-based) for {calculation_date}")
+        config = self._load_config()
+        known_students = {s['id'] for s in paged_select(self.storage, 'students', 'id', page_size=self.page_size)}
+        columns = ('student_id', 'subcategory_id', 'score', 'normalized_score', 'academic_year_start', 'academic_year_end')
+        scores = read_columns(
+            self.storage,
+            'student_subcategory_scores',
+            columns,
+            eq={'calculation_date': calculation_date},
+            key=DAY_KEY,
+            page_size=self.page_size,
+        )
+        category_payloads, holistic_payloads = self._student_score_payloads(
+            scores, known_students, config, calculation_date
+        )
+        return {
+            'student_category_rows_upserted': self.writer.upsert(
+                'student_category_scores', category_payloads, on_conflict=NATURAL_KEYS['student_category_scores']
+            ),
+            'student_holistic_rows_upserted': self.writer.upsert(
+                'student_holistic_gpa', holistic_payloads, on_conflict=NATURAL_KEYS['student_holistic_gpa']
+            ),
+        }
+
+    def compute_student_scores_from_snapshot(
+        self, snapshot: DaySnapshot, only: Optional[set] = None, merge_existing: bool = False
+    ) -> Dict[str, int]:
+        """Set-based computation over a `DaySnapshot`; rows are staged on the snapshot instead of written.
+
+        `only` restricts the computation to the given student ids. With `merge_existing`
+        the staged rows are upserted on their natural key, replacing rows already
+        written for the day.
+        """
+        logger.info(f"Computing student category scores and holistic GPA from snapshot for {snapshot.calculation_date}")
+        known_students = set(snapshot.students['id'])
+        if only is not None:
+            known_students &= only
+        category_payloads, holistic_payloads = self._student_score_payloads(
+            snapshot.scores, known_students, snapshot.config, snapshot.calculation_date, ids=snapshot.score_ids,
+        )
+        for table, payloads in (('student_category_scores', category_payloads), ('student_holistic_gpa', holistic_payloads)):
+            snapshot.stage(table, payloads, on_conflict=NATURAL_KEYS[table] if merge_existing else None)
+        snapshot.results['student_category_scores'] = category_payloads
+        snapshot.results['student_holistic_gpa'] = holistic_payloads
+        return {
+            'student_category_rows_upserted': len(category_payloads),
+            'student_holistic_rows_upserted': len(holistic_payloads),
+        }
+
+    def _student_score_payloads(
+        self,
+        scores: Columns,
+        known_students: set,
+        config: ScoringConfig,
+        calculation_date: str,
+        ids: Optional[Dict[str, IdTable]] = None,
+    ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """Build category and holistic payloads from the day's score columns with `config`'s matrix products.
+
+        `ids` are the score columns' `IdTable`s when the caller already has them (a snapshot does).
+        """
+        ids = ids or score_id_tables(scores)
+        students, subcategories = ids['student_id'], ids['subcategory_id']
+        in_population = students.rows_in(known_students)
+        if not in_population.any():
+            return [], []
+
+        sub_codes = config.subcategory_codes(subcategories.ids)[subcategories.codes]
+        mask = in_population & (sub_codes >= 0)
+        mask[mask] &= config.subcategory_category[sub_codes[mask]] >= 0
+        if not mask.any():
+            return [], []
+
+        # Dense students x subcategories arrays; category averages are masked matrix products
+        present, student_codes = np.unique(students.codes[mask], return_inverse=True)
+        student_keys = students.decode(present)
+        sub_codes = sub_codes[mask]
+        n_students = len(student_keys)
+        held = np.zeros((n_students, config.subcategory_ids.size), dtype=bool)
+        held[student_codes, sub_codes] = True
+        raw_avg = config.category_scores(
+            config.score_matrix(student_codes, sub_codes, n_students, _as_float(scores['score'][mask]))
+        )
+        norm_avg = config.category_scores(
+            config.score_matrix(student_codes, sub_codes, n_students, _as_float(scores['normalized_score'][mask]))
+        )
+        sub_counts = config.subcategory_counts(held)
+        keep = (sub_counts > 0) & ~(np.isnan(raw_avg) & np.isnan(norm_avg))
+
+        # Academic year comes from each student's first row of the day, as in the per-student path
+        _, first_row_of = np.unique(students.codes, return_index=True)
+        first_rows = first_row_of[present]
+        ay_starts = scores['academic_year_start'][first_rows].tolist()
+        ay_ends = scores['academic_year_end'][first_rows].tolist()
+        student_list = student_keys.tolist()
+        category_list = config.category_ids.tolist()
+
+        s_codes, c_codes = np.nonzero(keep)
+        category_payloads: List[Dict[str, Any]] = [
+            {
+                'student_id': student_list[s],
+                'category_id': category_list[c],
+                'raw_score': raw,
+                'normalized_score': norm,
+                'subcategory_count': count,
+                'academic_year_start': ay_starts[s],
+                'academic_year_end': ay_ends[s],
+                'calculation_date': calculation_date,
+            }
+            for s, c, raw, norm, count in zip(
+                s_codes.tolist(), c_codes.tolist(), _optional_list(raw_avg[s_codes, c_codes]),
+                _optional_list(norm_avg[s_codes, c_codes]), sub_counts[s_codes, c_codes].tolist(),
+            )
+        ]
+
+        # Holistic GPA = weighted average of the student's category normalized scores
+        category_norm = np.where(keep, norm_avg, np.nan)
+        holistic = config.holistic_gpas(category_norm)
+        scored = np.flatnonzero(~np.isnan(holistic))
+        holistic_payloads: List[Dict[str, Any]] = [
+            {
+                'student_id': student_list[s],
+                'holistic_gpa': gpa,
+                'academic_year_start': ay_starts[s],
+                'academic_year_end': ay_ends[s],
+                'calculation_date': calculation_date,
+                'category_breakdown': {category_list[c]: v for c, v in enumerate(row) if v == v},
+            }
+            for s, gpa, row in zip(scored.tolist(), holistic[scored].tolist(), category_norm[scored].tolist())
+        ]
+        return category_payloads, holistic_payloads
+
+    # ---------- Orchestration ----------
+    def run_for_latest_day(self) -> Dict[str, Dict[str, int]]:
+        ctx = self._get_latest_day_context()
+        if not ctx:
+            logger.warning('No subcategory scores found; nothing to compute.')
+            return {}
+        calc_date = ctx['calculation_date']
+        cat = self.compute_student_category_scores_for_day(calc_date)
+        hol = self.compute_student_holistic_gpa_for_day(calc_date)
+        return {'category': cat, 'holistic': hol}
+
+
+class CompanyScoreCalculator:
+    """
+    Aggregates student scores into company scores for a given day.
+
+    - Company subcategory scores: average of student subcategory scores for students in the company
+    - Company category scores: average of company subcategory scores in that category
+    - Company holistic GPA: average of company category GPAs
+
+    Every level is one grouped NumPy reduction over all companies at once.
+    `compute_company_scores_for_day` reads the day's student rows once, rolls them
+    up through all three levels and writes each table with bulk upserts.
+    """
+
+    def __init__(
+        self,
+        storage: StorageBackend | Client,
+        write_chunk_size: int = BulkWriter.DEFAULT_CHUNK_SIZE,
+        page_size: int = DEFAULT_PAGE_SIZE,
+    ):
+        self.storage = as_storage(storage)
+        self.writer = BulkWriter(self.storage, chunk_size=write_chunk_size)
+        self.page_size = page_size
+
+    def _get_latest_day(self) -> Optional[str]:
+        latest = self.storage.select(
+            'student_subcategory_scores', 'calculation_date', order='calculation_date', desc=True, limit=1,
+        )
+        if not latest:
+            return None
+        return latest[0]['calculation_date']
+
+
+    def _load_subcategory_map(self) -> Dict[str, str]:
+        return ScoringConfig.load(self.storage, page_size=self.page_size).cat_by_sub
+
+    def _company_by_student(self) -> Dict[str, str]:
+        return self._company_by_student_from_rows(
+            paged_select(self.storage, 'students', 'id, company_id', page_size=self.page_size)
+        )
+
+    @staticmethod
+    def _company_by_student_from_rows(rows) -> Dict[str, str]:
+        return {r['id']: r['company_id'] for r in rows if r.get('id') and r.get('company_id')}
+
+    def _read_day(self, table: str, columns: Tuple[str, ...], calculation_date: str) -> Columns:
+        return read_columns(
+            self.storage, table, columns, eq={'calculation_date': calculation_date}, key=DAY_KEY, page_size=self.page_size,
+        )
+
+    # ---------- Grouped rollups ----------
+    @staticmethod
+    def company_subcategory_partials(
+        scores: Columns,
+        company_by_student: Dict[str, str],
+        only: Optional[set] = None,
+        ids: Optional[Dict[str, IdTable]] = None,
+    ) -> Columns:
+        """Per (company, subcategory) sums and counts of the students' raw and normalized scores.
+
+        Partials computed over disjoint sets of students combine with
+        `_company_subcategory_from_partials`, which takes the means. `ids` are the
+        score columns' `IdTable`s when the caller already has them.
+        """
+        ids = ids or score_id_tables(scores)
+        students, subcategories = ids['student_id'], ids['subcategory_id']
+        # Companies are looked up once per distinct student, not once per row
+        companies = IdTable([company_by_student.get(sid) or '' for sid in students.ids])
+        row_companies = companies.codes[students.codes]
+        mask = (companies.ids != '')[row_companies] & (subcategories.ids != '')[subcategories.codes]
+        if only is not None:
+            mask &= companies.members(only)[row_companies]
+        idx = np.flatnonzero(mask)
+        if idx.size == 0:
+            return _empty_columns(COMPANY_PARTIAL_COLUMNS)
+
+        # One row per (student, subcategory): the most recently updated
+        n_subcategories = len(subcategories)
+        sub_codes = subcategories.codes[idx].astype(np.int64)
+        pair_codes = students.codes[idx].astype(np.int64) * n_subcategories + sub_codes
+        kept = _latest_per_key(pair_codes, scores['updated_at'][idx])
+        idx, sub_codes = idx[kept], sub_codes[kept]
+
+        company_codes = row_companies[idx].astype(np.int64)
+        group_keys, first, group_codes = np.unique(
+            company_codes * n_subcategories + sub_codes, return_index=True, return_inverse=True
+        )
+        n_groups = len(group_keys)
+        raw_sum, raw_n = _grouped_sum(group_codes, _as_float(scores['score'][idx]), n_groups)
+        norm_sum, norm_n = _grouped_sum(group_codes, _as_float(scores['normalized_score'][idx]), n_groups)
+        data_points = np.array([int(v or 0) for v in scores['data_points_count'][idx]], dtype=np.int64)
+        first_rows = idx[first]
+        return {
+            'company_id': companies.decode(group_keys // n_subcategories),
+            'subcategory_id': subcategories.decode(group_keys % n_subcategories),
+            'raw_sum': raw_sum,
+            'raw_n': raw_n,
+            'norm_sum': norm_sum,
+            'norm_n': norm_n,
+            'student_count': np.bincount(group_codes, minlength=n_groups),
+            'data_points_count': np.bincount(group_codes, weights=data_points, minlength=n_groups).astype(np.int64),
+            'academic_year_start': scores['academic_year_start'][first_rows],
+            'academic_year_end': scores['academic_year_end'][first_rows],
+        }
+
+    @staticmethod
+    def _company_subcategory_from_partials(partials: Sequence[Columns], calculation_date: str) -> Columns:
+        """Company subcategory rows from one or more `company_subcategory_partials` results."""
+        merged = {c: np.concatenate([p[c] for p in partials]) for c in COMPANY_PARTIAL_COLUMNS} if partials else {}
+        if not merged or merged['company_id'].size == 0:
+            return _empty_columns(COMPANY_SUBCATEGORY_COLUMNS)
+        company_keys, company_codes = np.unique(merged['company_id'].astype(str), return_inverse=True)
+        sub_keys, sub_codes = np.unique(merged['subcategory_id'].astype(str), return_inverse=True)
+        # Academic year comes from the group's first partial row
+        group_keys, first, group_codes = np.unique(
+            company_codes * len(sub_keys) + sub_codes, return_index=True, return_inverse=True
+        )
+        n_groups = len(group_keys)
+
+        def total(column: str) -> np.ndarray:
+            return np.bincount(group_codes, weights=merged[column], minlength=n_groups)
+
+        raw_n, norm_n = total('raw_n'), total('norm_n')
+        with np.errstate(invalid='ignore', divide='ignore'):
+            raw = np.where(raw_n > 0, total('raw_sum') / np.maximum(raw_n, 1), np.nan)
+            norm = np.where(norm_n > 0, total('norm_sum') / np.maximum(norm_n, 1), np.nan)
+        keep = (raw_n > 0) | (norm_n > 0)
+        first_rows = first[keep]
+        return {
+            'company_id': company_keys[group_keys // len(sub_keys)][keep].astype(object),
+            'subcategory_id': sub_keys[group_keys % len(sub_keys)][keep].astype(object),
+            'raw_points': raw[keep],
+            'normalized_score': norm[keep],
+            'score': norm[keep],  # convenience, mirrors normalized_score
+            'student_count': total('student_count')[keep].astype(np.int64),
+            'data_points_count': total('data_points_count')[keep].astype(np.int64),
+            'academic_year_start': merged['academic_year_start'][first_rows],
+            'academic_year_end': merged['academic_year_end'][first_rows],
+            'calculation_date': np.full(int(keep.sum()), calculation_date, dtype=object),
+        }
+
+    @classmethod
+    def _company_subcategory_rollup(
+        cls,
+        scores: Columns,
+        company_by_student: Dict[str, str],
+        calculation_date: str,
+        only: Optional[set] = None,
+        ids: Optional[Dict[str, IdTable]] = None,
+    ) -> Columns:
+        """Per (company, subcategory): mean raw and normalized score, students and data points."""
+        return cls._company_subcategory_from_partials(
+            [cls.company_subcategory_partials(scores, company_by_student, only=only, ids=ids)], calculation_date
+        )
+
+    @staticmethod
+    def _company_category_rollup(subs: Columns, sub_to_cat: Dict[str, str], calculation_date: str) -> Columns:
+        """Per (company, category): mean of the company's subcategory raw and normalized scores."""
+        idx = np.flatnonzero(np.array([bool(c) and bool(s) for c, s in zip(subs['company_id'], subs['subcategory_id'])], dtype=bool))
+        if idx.size == 0:
+            return _empty_columns(COMPANY_CATEGORY_COLUMNS)
+        company_keys, company_codes = np.unique(subs['company_id'][idx].astype(str), return_inverse=True)
+        _, sub_codes = np.unique(subs['subcategory_id'][idx].astype(str), return_inverse=True)
+        kept = _latest_per_key(company_codes * (sub_codes.max() + 1) + sub_codes, subs.get('updated_at', np.full(len(subs['company_id']), None))[idx])
+        idx, company_codes = idx[kept], company_codes[kept]
+        # Academic year comes from each company's first row, as in the per-company path
+        first_by_company = idx[np.unique(company_codes, return_index=True)[1]]
+
+        categories = np.array([sub_to_cat.get(s) or '' for s in subs['subcategory_id'][idx]], dtype=object)
+        has_category = categories != ''
+        if not has_category.any():
+            return _empty_columns(COMPANY_CATEGORY_COLUMNS)
+        idx, company_codes = idx[has_category], company_codes[has_category]
+        category_keys, category_codes = np.unique(categories[has_category].astype(str), return_inverse=True)
+        group_keys, group_codes = np.unique(company_codes * len(category_keys) + category_codes, return_inverse=True)
+        n_groups = len(group_keys)
+        raw, raw_n = _grouped_mean(group_codes, _as_float(subs['raw_points'][idx]), n_groups)
+        norm, norm_n = _grouped_mean(group_codes, _as_float(subs['normalized_score'][idx]), n_groups)
+        keep = (raw_n > 0) | (norm_n > 0)
+        group_companies = (group_keys // len(category_keys))[keep]
+        first_rows = first_by_company[group_companies]
+        return {
+            'company_id': company_keys[group_companies].astype(object),
+            'category_id': category_keys[(group_keys % len(category_keys))[keep]].astype(object),
+            'raw_score': raw[keep],
+            'normalized_score': norm[keep],
+            'subcategory_count': np.where(raw_n > 0, raw_n, norm_n)[keep],
+            'academic_year_start': subs['academic_year_start'][first_rows],
+            'academic_year_end': subs['academic_year_end'][first_rows],
+            'calculation_date': np.full(int(keep.sum()), calculation_date, dtype=object),
+        }
+
+    @staticmethod
+    def _company_holistic_rollup(cats: Columns, calculation_date: str) -> Columns:
+        """Per company: mean of its category normalized scores, with the per-category breakdown."""
+        idx = np.flatnonzero(np.array([bool(c) and bool(k) for c, k in zip(cats['company_id'], cats['category_id'])], dtype=bool))
+        if idx.size == 0:
+            return _empty_columns(COMPANY_HOLISTIC_COLUMNS)
+        company_keys, company_codes = np.unique(cats['company_id'][idx].astype(str), return_inverse=True)
+        _, category_codes = np.unique(cats['category_id'][idx].astype(str), return_inverse=True)
+        kept = _latest_per_key(company_codes * (category_codes.max() + 1) + category_codes, cats.get('updated_at', np.full(len(cats['company_id']), None))[idx])
+        idx, company_codes = idx[kept], company_codes[kept]
+        first_by_company = idx[np.unique(company_codes, return_index=True)[1]]
+
+        norm = _as_float(cats['normalized_score'][idx])
+        holistic, counts = _grouped_mean(company_codes, norm, len(company_keys))
+        breakdown: List[Dict[str, float]] = [{} for _ in company_keys]
+        for code, category_id, value in zip(company_codes, cats['category_id'][idx], norm):
+            if not np.isnan(value):
+                breakdown[code][category_id] = float(value)
+        keep = counts > 0
+        breakdown_column = np.empty(int(keep.sum()), dtype=object)
+        breakdown_column[:] = [breakdown[c] for c in np.flatnonzero(keep)]
+        return {
+            'company_id': company_keys[keep].astype(object),
+            'holistic_gpa': holistic[keep],
+            'academic_year_start': cats['academic_year_start'][first_by_company][keep],
+            'academic_year_end': cats['academic_year_end'][first_by_company][keep],
+            'calculation_date': np.full(int(keep.sum()), calculation_date, dtype=object),
+            'category_breakdown': breakdown_column,
+        }
+
+    def company_payloads_from_partials(
+        self, partials: Sequence[Columns], sub_to_cat: Dict[str, str], calculation_date: str
+    ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """Subcategory, category and holistic company payloads from `company_subcategory_partials` results."""
+        subs = self._company_subcategory_from_partials(partials, calculation_date)
+        cats = self._company_category_rollup(subs, sub_to_cat, calculation_date)
+        hols = self._company_holistic_rollup(cats, calculation_date)
+        return _column_payloads(subs), _column_payloads(cats), _column_payloads(hols)
+
+    def _company_rollups(
+        self,
+        scores: Columns,
+        company_by_student: Dict[str, str],
+        sub_to_cat: Dict[str, str],
+        calculation_date: str,
+        only: Optional[set] = None,
+        ids: Optional[Dict[str, IdTable]] = None,
+    ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """Subcategory, category and holistic company payloads from the day's student score columns."""
+        subs = self._company_subcategory_rollup(scores, company_by_student, calculation_date, only=only, ids=ids)
+        cats = self._company_category_rollup(subs, sub_to_cat, calculation_date)
+        hols = self._company_holistic_rollup(cats, calculation_date)
+        return _column_payloads(subs), _column_payloads(cats), _column_payloads(hols)
+
+    # ---------- Per-day computations ----------
+    def compute_company_scores_for_day(self, calculation_date: str) -> Dict[str, int]:
+        """Company subcategory, category and holistic scores for `calculation_date` in one pass.
+
+        Reads the day's student subcategory rows once and writes each company table
+        with chunked bulk upserts.
+        """
+        logger.info(f"Computing company scores (single pass) for {calculation_date}")
+        scores = self._read_day('student_subcategory_scores', STUDENT_SCORE_COLUMNS, calculation_date)
+        sub_payloads, cat_payloads, hol_payloads = self._company_rollups(
+            scores, self._company_by_student(), self._load_subcategory_map(), calculation_date,
+        )
+        return {
+            'company_subcategory_rows_upserted': self._upsert('company_subcategory_scores', sub_payloads),
+            'company_category_rows_upserted': self._upsert('company_category_scores', cat_payloads),
+            'company_holistic_rows_upserted': self._upsert('company_holistic_gpa', hol_payloads),
+        }
+
+    def _upsert(self, table: str, payloads: List[Dict[str, Any]]) -> int:
+        """Upsert on the table's natural key, so rerunning a day replaces its rows."""
+        return self.writer.upsert(table, payloads, on_conflict=NATURAL_KEYS[table])
+
+    def compute_company_subcategory_scores_for_day(self, calculation_date: str) -> Dict[str, int]:
+        logger.info(f"Computing company subcategory scores for {calculation_date}")
+        scores = self._read_day('student_subcategory_scores', STUDENT_SCORE_COLUMNS, calculation_date)
+        subs = self._company_subcategory_rollup(scores, self._company_by_student(), calculation_date)
+        rows = self._upsert('company_subcategory_scores', _column_payloads(subs))
+        return {'company_subcategory_rows_upserted': rows}
+
+    def compute_company_category_scores_for_day(self, calculation_date: str) -> Dict[str, int]:
+        logger.info(f"Computing company category scores for {calculation_date}")
+        subs = self._read_day('company_subcategory_scores', COMPANY_SUBCATEGORY_COLUMNS + ('updated_at',), calculation_date)
+        cats = self._company_category_rollup(subs, self._load_subcategory_map(), calculation_date)
+        rows = self._upsert('company_category_scores', _column_payloads(cats))
+        return {'company_category_rows_upserted': rows}
+
+    def compute_company_holistic_gpa_for_day(self, calculation_date: str) -> Dict[str, int]:
+        logger.info(f"Computing company holistic GPA for {calculation_date}")
+        cats = self._read_day('company_category_scores', COMPANY_CATEGORY_COLUMNS + ('updated_at',), calculation_date)
+        hols = self._company_holistic_rollup(cats, calculation_date)
+        rows = self._upsert('company_holistic_gpa', _column_payloads(hols))
+        return {'company_holistic_rows_upserted': rows}
+
+    def compute_company_scores_from_snapshot(
+        self, snapshot: DaySnapshot, only: Optional[set] = None, merge_existing: bool = False
+    ) -> Dict[str, int]:
+        """Company subcategory, category and holistic scores from a `DaySnapshot`, staged on the snapshot.
+
+        Uses the snapshot's (already normalized) score rows instead of re-reading
+        `student_subcategory_scores`, and feeds each level's rows straight into the next.
+        `only` and `merge_existing` work as in
+        `StudentCategoryHolisticCalculator.compute_student_scores_from_snapshot`, keyed by company id.
+        """
+        calculation_date = snapshot.calculation_date
+        logger.info(f"Computing company scores from snapshot for {calculation_date}")
+        sub_payloads, cat_payloads, hol_payloads = self._company_rollups(
+            snapshot.scores,
+            self._company_by_student_from_rows(snapshot.records('students')),
+            snapshot.config.cat_by_sub,
+            calculation_date,
+            only=only,
+            ids=snapshot.score_ids,
+        )
+        for table, payloads in (
+            ('company_subcategory_scores', sub_payloads),
+            ('company_category_scores', cat_payloads),
+            ('company_holistic_gpa', hol_payloads),
+        ):
+            snapshot.stage(table, payloads, on_conflict=NATURAL_KEYS[table] if merge_existing else None)
+        return {
+            'company_subcategory_rows_upserted': len(sub_payloads),
+            'company_category_rows_upserted': len(cat_payloads),
+            'company_holistic_rows_upserted': len(hol_payloads),
+        }
+
+    def run_for_latest_day(self) -> Dict[str, Dict[str, int]]:
+        calc_date = self._get_latest_day()
+        if not calc_date:
+            logger.warning('No latest calculation_date found; company aggregation skipped.')
+            return {}
+        result = self.compute_company_scores_for_day(calc_date)
+        return {
+            'subcategory': {'company_subcategory_rows_upserted': result['company_subcategory_rows_upserted']},
+            'category': {'company_category_rows_upserted': result['company_category_rows_upserted']},
+            'holistic': {'company_holistic_rows_upserted': result['company_holistic_rows_upserted']},
+        }
@@ -0,0 +1,98 @@
+"""
+apex_scoring.concurrency
+
+Bounded parallel execution for independent pieces of a phase.
+
+Storage calls are blocking (PostgREST over HTTP, or SQLite), so `TaskPool` runs
+them on a thread pool with at most `max_workers` in flight. `call_with_retries`
+retries a call with exponential backoff; the call must be safe to repeat (reads,
+or upserts/updates keyed on the row). Retries belong to one layer only: writes
+retry per chunk in `BulkWriter`, so `TaskPool` runs each task once unless given
+`max_retries`.
+"""
+
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, List, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+R = TypeVar('R')
+
+DEFAULT_MAX_WORKERS = 4
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_RETRY_BACKOFF_SECONDS = 0.5
+# Pool tasks write through `BulkWriter`, which already retries each chunk
+DEFAULT_TASK_RETRIES = 0
+
+
+def call_with_retries(
+    fn: Callable[[], R],
+    description: str,
+    max_retries: int = DEFAULT_MAX_RETRIES,
+    retry_backoff_seconds: float = DEFAULT_RETRY_BACKOFF_SECONDS,
+) -> R:
+    """Call `fn`, retrying up to `max_retries` times with exponential backoff."""
+    attempt = 0
+    while True:
+        try:
+            return fn()
+        except Exception as e:
+            if attempt >= max_retries:
+                logger.error(f"{description} failed after {attempt + 1} attempts: {e}")
+                raise
+            delay = retry_backoff_seconds * (2 ** attempt)
+            attempt += 1
+            logger.warning(
+                f"{description} failed (attempt {attempt}/{max_retries + 1}): {e}; retrying in {delay:.2f}s"
+            )
+            time.sleep(delay)
+
+
+class TaskPool:
+    """
+    Runs independent tasks on at most `max_workers` threads.
+
+    Each task is called once, or retried up to `max_retries` times when its calls
+    do not retry themselves. With `max_workers=1` tasks run inline, one after another.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        max_retries: int = DEFAULT_TASK_RETRIES,
+        retry_backoff_seconds: float = DEFAULT_RETRY_BACKOFF_SECONDS,
+    ) -> None:
+        if max_workers <= 0:
+            raise ValueError("max_workers must be positive")
+        self.max_workers = max_workers
+        self.max_retries = max(0, max_retries)
+        self.retry_backoff_seconds = retry_backoff_seconds
+
+    def map(self, fn: Callable[[T], R], items: Iterable[T], name: Optional[str] = None) -> List[R]:
+        """`[fn(item) for item in items]`, run concurrently; results keep the order of `items`.
+
+        If a task fails (after any retries), the remaining tasks are cancelled
+        and the error is raised.
+        """
+        items = list(items)
+        name = name or getattr(fn, '__name__', 'task')
+
+        def run(item: T) -> R:
+            return call_with_retries(
+                lambda: fn(item), f"{name}({item})", self.max_retries, self.retry_backoff_seconds
+            )
+
+        if self.max_workers == 1 or len(items) <= 1:
+            return [run(item) for item in items]
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(items)), thread_name_prefix=name) as executor:
+            futures = [executor.submit(run, item) for item in items]
+            try:
+                return [f.result() for f in futures]
+            except BaseException:
+                for f in futures:
+                    f.cancel()
+                raise
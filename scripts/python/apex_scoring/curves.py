@@ -0,0 +1,293 @@
+"""
+apex_scoring.curves
+
+Persisted curve models and what-if scoring.
+
+A subcategory's normalized scores for a day depend only on the day's raw scores
+in that subcategory: a raw score's GPA is the bell curve transform of the share of
+scores strictly below it. `CurveModel` keeps that population as its distinct raw
+scores (ascending) with how many students hold each, plus the distribution stats
+the normalization pass computes. The pipeline stores one model per
+(subcategory_id, calculation_date) in `subcategory_curve_models`.
+
+`WhatIfScorer` reads a day's models and the subcategory and category weights
+once, then projects a student's scores for hypothetical raw values without
+further queries: each raw value is ranked by bisection against its model (with
+the student's own current score taken out of the population) and the results go
+through the same category and holistic weighted averages as the pipeline. With
+the student's stored raw scores it reproduces the stored normalized, category
+and holistic scores exactly.
+"""
+
+import logging
+import threading
+from typing import Any, Dict, Mapping, Optional, Sequence, Union
+
+import numpy as np
+
+from apex_scoring.bell_curve import BellCurveCalculator
+from apex_scoring.company_scores import StudentCategoryHolisticCalculator
+from apex_scoring.db import DAY_KEY, DEFAULT_PAGE_SIZE, paged_select
+from apex_scoring.scoring_config import ScoringConfig
+from apex_scoring.storage import StorageBackend, as_storage
+
+logger = logging.getLogger(__name__)
+
+CURVE_MODEL_TABLE = 'subcategory_curve_models'
+CURVE_MODEL_KEY = 'subcategory_id,calculation_date'
+
+# How a subcategory's raw scores map to normalized scores
+BELL_CURVE = 'bell_curve'
+IDENTITY = 'identity'  # GPA subcategories: normalized score = raw score
+
+
+class CurveModel:
+    """The raw score population of one subcategory on one day, and its normalization."""
+
+    def __init__(
+        self,
+        subcategory_id: str,
+        calculation_date: str,
+        scores: Union[Sequence[float], np.ndarray],
+        counts: Union[Sequence[int], np.ndarray],
+        method: str = BELL_CURVE,
+        stats: Optional[Dict[str, Any]] = None,
+        bell_curve: Optional[BellCurveCalculator] = None,
+    ) -> None:
+        self.subcategory_id = subcategory_id
+        self.calculation_date = str(calculation_date)[:10]
+        self.scores = np.asarray(scores, dtype=float)
+        self.counts = np.asarray(counts, dtype=np.int64)
+        self.method = method
+        self.stats = stats or {}
+        self.bell_curve = bell_curve or BellCurveCalculator()
+        # _below[i]: scores strictly below self.scores[i]; _below[-1]: population size
+        self._below = np.concatenate(([0], np.cumsum(self.counts)))
+        self._normalized: Optional[np.ndarray] = None
+
+    @classmethod
+    def fit(
+        cls,
+        subcategory_id: str,
+        calculation_date: str,
+        raw_scores: Union[Sequence[float], np.ndarray],
+        method: str = BELL_CURVE,
+        stats: Optional[Dict[str, Any]] = None,
+        bell_curve: Optional[BellCurveCalculator] = None,
+    ) -> 'CurveModel':
+        """Model of a day's raw scores (NaN ignored).
+
+        `stats` are the raw and normalized distribution stats when the caller has
+        already computed them (e.g. from `apply_bell_curve_to_array`).
+        """
+        bell_curve = bell_curve or BellCurveCalculator()
+        raw = np.asarray(raw_scores, dtype=float)
+        raw = raw[~np.isnan(raw)]
+        if stats is None:
+            normalized = raw if method == IDENTITY else bell_curve.transform_percentiles_to_gpa(
+                bell_curve.calculate_percentile_ranks(raw)
+            )
+            stats = {
+                'raw_stats': bell_curve.calculate_distribution_stats(raw),
+                'normalized_stats': bell_curve.calculate_distribution_stats(normalized),
+            }
+        scores, counts = np.unique(raw, return_counts=True)
+        return cls(subcategory_id, calculation_date, scores, counts, method, stats, bell_curve)
+
+    @classmethod
+    def from_row(cls, row: Dict[str, Any], bell_curve: Optional[BellCurveCalculator] = None) -> 'CurveModel':
+        return cls(
+            row['subcategory_id'], row['calculation_date'], row.get('scores') or [], row.get('counts') or [],
+            row.get('method') or BELL_CURVE, row.get('stats'), bell_curve,
+        )
+
+    def to_row(self) -> Dict[str, Any]:
+        return {
+            'subcategory_id': self.subcategory_id,
+            'calculation_date': self.calculation_date,
+            'method': self.method,
+            'score_count': self.score_count,
+            'scores': self.scores.tolist(),
+            'counts': self.counts.tolist(),
+            'stats': self.stats,
+        }
+
+    @property
+    def score_count(self) -> int:
+        return int(self._below[-1])
+
+    def percentile_rank(self, raw_score: float, replacing: Optional[float] = None) -> float:
+        """Percentile rank of `raw_score`, as `calculate_percentile_ranks` gives it over the population.
+
+        `replacing` is the student's current score in the population, which the new
+        score takes the place of; without it the student joins the population.
+        """
+        below = int(self._below[np.searchsorted(self.scores, raw_score, side='left')])
+        total = self.score_count
+        if replacing is None:
+            total += 1
+        elif replacing < raw_score:
+            below = max(below - 1, 0)
+        rank = np.clip(below / total, self.bell_curve.MIN_PERCENTILE, self.bell_curve.MAX_PERCENTILE)
+        return float(rank)
+
+    @property
+    def normalized_scores(self) -> np.ndarray:
+        """Normalized score of each of `scores`, as the pipeline gave it to the students holding it."""
+        if self._normalized is None:
+            if self.method == IDENTITY:
+                self._normalized = self.scores.copy()
+            else:
+                ranks = self._below[:-1] / max(self.score_count, 1)
+                self._normalized = self.bell_curve.transform_percentiles_to_gpa(
+                    np.clip(ranks, self.bell_curve.MIN_PERCENTILE, self.bell_curve.MAX_PERCENTILE)
+                )
+        return self._normalized
+
+    def stored_normalized(self, raw_score: float) -> Optional[float]:
+        """The normalized score held with `raw_score` on the day, or None when nobody has that score."""
+        i = int(np.searchsorted(self.scores, raw_score, side='left'))
+        if i < self.scores.size and self.scores[i] == raw_score:
+            return float(self.normalized_scores[i])
+        return None
+
+    def normalize(self, raw_score: Optional[float], replacing: Optional[float] = None) -> Optional[float]:
+        """Normalized score the pipeline would give `raw_score` (None: no score)."""
+        if raw_score is None or np.isnan(raw_score):
+            return None
+        if self.method == IDENTITY:
+            return float(raw_score)
+        rank = self.percentile_rank(float(raw_score), replacing)
+        return float(self.bell_curve.transform_percentiles_to_gpa([rank])[0])
+
+
+def _present(value: Optional[float]) -> bool:
+    return value is not None and not np.isnan(value)
+
+
+class WhatIfScorer:
+    """
+    Projected scores of one student on `calculation_date` for hypothetical raw scores.
+
+    The day's curve models and the subcategory and category weights are read on
+    first use (`load`); projections after that do not touch the database.
+    `calculation_date` defaults to the latest day with curve models.
+    """
+
+    def __init__(
+        self,
+        storage: StorageBackend,
+        calculation_date: Optional[str] = None,
+        page_size: int = DEFAULT_PAGE_SIZE,
+    ) -> None:
+        self.storage = as_storage(storage)
+        self.calculation_date = calculation_date
+        self.page_size = page_size
+        self.bell_curve = BellCurveCalculator()
+        self._calculator = StudentCategoryHolisticCalculator(self.storage, page_size=page_size)
+        self.models: Dict[str, CurveModel] = {}
+        self._config: Optional[ScoringConfig] = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def load(self) -> 'WhatIfScorer':
+        """Read the day's curve models and the scoring config, once."""
+        with self._lock:
+            if self._loaded:
+                return self
+            if self.calculation_date is None:
+                latest = self.storage.select(CURVE_MODEL_TABLE, 'calculation_date', order='calculation_date', desc=True, limit=1)
+                if not latest:
+                    raise ValueError(f"No curve models stored in {CURVE_MODEL_TABLE}")
+                self.calculation_date = str(latest[0]['calculation_date'])[:10]
+            rows = paged_select(
+                self.storage, CURVE_MODEL_TABLE, 'id, subcategory_id, calculation_date, method, scores, counts, stats',
+                eq={'calculation_date': self.calculation_date}, key=DAY_KEY, page_size=self.page_size,
+            )
+            self.models = {r['subcategory_id']: CurveModel.from_row(r, self.bell_curve) for r in rows}
+            self._config = self._calculator._load_config()
+            self._loaded = True
+            logger.info(f"Loaded {len(self.models)} curve models for {self.calculation_date}")
+            return self
+
+    def model(self, subcategory_id: str) -> CurveModel:
+        self.load()
+        try:
+            return self.models[subcategory_id]
+        except KeyError:
+            raise KeyError(f"No curve model for subcategory {subcategory_id} on {self.calculation_date}") from None
+
+    def current_raw_scores(self, student_id: str) -> Dict[str, float]:
+        """The student's stored raw scores for the day, by subcategory (one query)."""
+        self.load()
+        rows = paged_select(
+            self.storage, 'student_subcategory_scores', 'id, subcategory_id, score',
+            eq={'student_id': student_id, 'calculation_date': self.calculation_date}, page_size=self.page_size,
+        )
+        return {r['subcategory_id']: float(r['score']) for r in rows if r.get('score') is not None}
+
+    def project(
+        self,
+        raw_scores: Mapping[str, Optional[float]],
+        changes: Optional[Mapping[str, Optional[float]]] = None,
+        student_id: str = '',
+    ) -> Dict[str, Any]:
+        """Scores of a student whose current raw scores are `raw_scores`, after applying `changes`.
+
+        Both map subcategory_id to a raw score; a None in `changes` removes the
+        student's score in that subcategory. Returns the normalized score per
+        subcategory, the category rows and the holistic GPA the pipeline would compute.
+        """
+        self.load()
+        projected = {sid: v for sid, v in raw_scores.items() if _present(v)}
+        for sid, value in (changes or {}).items():
+            if _present(value):
+                projected[sid] = float(value)
+            else:
+                projected.pop(sid, None)
+
+        # A score the student already holds keeps its stored normalized score; the other
+        # scores are ranked against their models and share a single GPA transform
+        normalized: Dict[str, Optional[float]] = {}
+        ranks: Dict[str, float] = {}
+        for sid, raw in projected.items():
+            model = self.model(sid)
+            current = raw_scores.get(sid) if _present(raw_scores.get(sid)) else None
+            stored = model.stored_normalized(raw) if current == raw else None
+            if stored is not None or model.method == IDENTITY:
+                normalized[sid] = stored if stored is not None else raw
+            else:
+                ranks[sid] = model.percentile_rank(raw, current)
+        if ranks:
+            normalized.update(zip(ranks, map(float, self.bell_curve.transform_percentiles_to_gpa(list(ranks.values())))))
+        subcategory_scores = {
+            sid: {'score': raw, 'normalized_score': normalized[sid]} for sid, raw in projected.items()
+        }
+
+        sids = list(subcategory_scores)
+        columns = {
+            'student_id': np.array([student_id] * len(sids), dtype=object),
+            'subcategory_id': np.array(sids, dtype=object),
+            'score': np.array([subcategory_scores[s]['score'] for s in sids], dtype=float),
+            'normalized_score': np.array([subcategory_scores[s]['normalized_score'] for s in sids], dtype=float),
+            'academic_year_start': np.full(len(sids), None, dtype=object),
+            'academic_year_end': np.full(len(sids), None, dtype=object),
+        }
+        category_rows, holistic_rows = self._calculator._student_score_payloads(
+            columns, {student_id}, self._config, self.calculation_date,
+        )
+        holistic = holistic_rows[0] if holistic_rows else {}
+        return {
+            'calculation_date': self.calculation_date,
+            'subcategory_scores': subcategory_scores,
+            'category_scores': {
+                r['category_id']: {k: r[k] for k in ('raw_score', 'normalized_score', 'subcategory_count')}
+                for r in category_rows
+            },
+            'holistic_gpa': holistic.get('holistic_gpa'),
+            'category_breakdown': holistic.get('category_breakdown', {}),
+        }
+
+    def project_student(self, student_id: str, changes: Mapping[str, Optional[float]]) -> Dict[str, Any]:
+        """`project` from the student's stored raw scores (reads them, one query)."""
+        return self.project(self.current_raw_scores(student_id), changes, student_id=student_id)
@@ -0,0 +1,264 @@
+"""
+apex_scoring.db
+
+Database helpers shared by the scoring calculators.
+
+`BulkWriter` batches row writes into chunked upserts so a phase makes
+one request per chunk instead of one request per row. `iter_pages` streams a
+filtered table with keyset pagination, one page of column arrays at a time, so
+results are not cut off at the PostgREST max-rows limit and memory stays flat;
+`paged_select` collects the same pages into one list of rows.
+"""
+
+import logging
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+from apex_scoring.concurrency import call_with_retries
+from apex_scoring.storage import StorageBackend, as_storage
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_PAGE_SIZE = 1000
+
+# Keyset for score tables: matches their (calculation_date, id) index
+DAY_KEY = ('calculation_date', 'id')
+
+Columns = Dict[str, np.ndarray]
+
+# Score columns pivoted to float64 (None -> NaN) by `rows_to_columns`
+FLOAT_COLUMNS = frozenset({'score', 'normalized_score'})
+
+# Columns with few distinct values; `rows_to_columns` keeps one object per distinct value
+INTERNED_COLUMNS = frozenset({
+    'student_id', 'subcategory_id', 'category_id', 'company_id', 'calculation_date',
+    'academic_year_start', 'academic_year_end', 'updated_at',
+})
+
+# Unique key of each score table, for upserts that replace a day's existing rows
+NATURAL_KEYS = {
+    'student_subcategory_scores': 'student_id,subcategory_id,calculation_date',
+    'student_category_scores': 'student_id,category_id,calculation_date',
+    'student_holistic_gpa': 'student_id,calculation_date',
+    'company_subcategory_scores': 'company_id,subcategory_id,calculation_date',
+    'company_category_scores': 'company_id,category_id,calculation_date',
+    'company_holistic_gpa': 'company_id,calculation_date',
+}
+
+
+def _to_float(value: Any) -> float:
+    if value is None:
+        return np.nan
+    try:
+        return float(value)
+    except Exception:
+        return np.nan
+
+
+def rows_to_columns(rows: Sequence[Dict[str, Any]], columns: Sequence[str]) -> Columns:
+    """Pivot a list of row dicts into one array per column (float64 with NaN for score columns).
+
+    Values of `INTERNED_COLUMNS` are shared instead of kept once per row: strings
+    are interned (so pages share them too), other values are shared within the page.
+    """
+    result: Columns = {}
+    for column in columns:
+        values = [r.get(column) for r in rows]
+        if column in FLOAT_COLUMNS:
+            result[column] = np.array([_to_float(v) for v in values], dtype=float)
+        else:
+            if column in INTERNED_COLUMNS:
+                shared: Dict[Any, Any] = {}
+                values = [sys.intern(v) if type(v) is str else shared.setdefault(v, v) for v in values]
+            arr = np.empty(len(values), dtype=object)
+            arr[:] = values
+            result[column] = arr
+    return result
+
+
+def iter_row_pages(
+    storage: StorageBackend,
+    table: str,
+    columns: str,
+    eq: Optional[Dict[str, Any]] = None,
+    in_: Optional[Dict[str, Sequence[Any]]] = None,
+    gt: Optional[Dict[str, Any]] = None,
+    key: Sequence[str] = ('id',),
+    page_size: int = DEFAULT_PAGE_SIZE,
+    prefetch: bool = False,
+) -> Iterator[List[Dict[str, Any]]]:
+    """Yield every row of `table` matching the filters, one page of row dicts at a time.
+
+    Pages are read with keyset pagination on `key` (which must be unique per row):
+    each request asks for the rows ordered after the last row of the previous page,
+    so every page costs the same however deep the scan. `key` columns missing from
+    `columns` are read for paging but left out of the yielded rows. With `prefetch`
+    the next page is requested on a background thread while the caller works on
+    the current one.
+
+    `page_size` must not exceed the server's max-rows setting (1000 by default),
+    since a short page is taken to mean the last page.
+    """
+    if page_size <= 0:
+        raise ValueError("page_size must be positive")
+    key = list(key)
+    extra: List[str] = []
+    if columns.strip() != '*':
+        selected = [c.strip() for c in columns.split(',') if c.strip()]
+        extra = [k for k in key if k not in selected]
+        columns = ', '.join(selected + extra)
+
+    def fetch(after: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return storage.select(table, columns, eq=eq, in_=in_, gt=gt, after=after, order=key, limit=page_size)
+
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f'prefetch-{table}') if prefetch else None
+    try:
+        page = fetch(None)
+        while page:
+            full = len(page) == page_size
+            after = {k: page[-1][k] for k in key}
+            upcoming = executor.submit(fetch, after) if executor and full else None
+            if extra:
+                page = [{c: v for c, v in r.items() if c not in extra} for r in page]
+            yield page
+            if not full:
+                return
+            page = upcoming.result() if upcoming else fetch(after)
+    finally:
+        if executor:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+def iter_pages(
+    storage: StorageBackend,
+    table: str,
+    columns: Sequence[str],
+    eq: Optional[Dict[str, Any]] = None,
+    in_: Optional[Dict[str, Sequence[Any]]] = None,
+    gt: Optional[Dict[str, Any]] = None,
+    key: Sequence[str] = ('id',),
+    page_size: int = DEFAULT_PAGE_SIZE,
+    prefetch: bool = False,
+) -> Iterator[Columns]:
+    """`iter_row_pages`, with each page pivoted into `columns` arrays (see `rows_to_columns`).
+
+    Only one page is held at a time, so memory stays flat however large the table.
+    """
+    for rows in iter_row_pages(
+        storage, table, ', '.join(columns), eq=eq, in_=in_, gt=gt, key=key, page_size=page_size, prefetch=prefetch,
+    ):
+        yield rows_to_columns(rows, columns)
+
+
+def read_columns(
+    storage: StorageBackend,
+    table: str,
+    columns: Sequence[str],
+    eq: Optional[Dict[str, Any]] = None,
+    key: Sequence[str] = ('id',),
+    page_size: int = DEFAULT_PAGE_SIZE,
+    prefetch: bool = True,
+) -> Columns:
+    """Every matching row of `table` as one array per column, built page by page from `iter_pages`."""
+    pages = list(iter_pages(storage, table, columns, eq=eq, key=key, page_size=page_size, prefetch=prefetch))
+    if not pages:
+        return rows_to_columns([], columns)
+    return {c: np.concatenate([p[c] for p in pages]) for c in columns}
+
+
+def paged_select(
+    storage: StorageBackend,
+    table: str,
+    columns: str,
+    eq: Optional[Dict[str, Any]] = None,
+    key: Sequence[str] = ('id',),
+    page_size: int = DEFAULT_PAGE_SIZE,
+    gt: Optional[Dict[str, Any]] = None,
+    in_: Optional[Dict[str, Sequence[Any]]] = None,
+    prefetch: bool = False,
+) -> List[Dict[str, Any]]:
+    """Select every row of `table` matching the `eq`/`in_`/`gt` filters, paging with `iter_row_pages`."""
+    rows: List[Dict[str, Any]] = []
+    for page in iter_row_pages(
+        storage, table, columns, eq=eq, in_=in_, gt=gt, key=key, page_size=page_size, prefetch=prefetch,
+    ):
+        rows.extend(page)
+    return rows
+
+
+class BulkWriter:
+    """
+    Writes rows to a table in fixed-size chunks, one upsert or bulk update per chunk.
+
+    Each chunk is retried with exponential backoff before the error is raised.
+    """
+
+    DEFAULT_CHUNK_SIZE = 500
+    # Ids per delete request: PostgREST takes the `in.(...)` filter in the URL, so it must stay short
+    DELETE_CHUNK_SIZE = 100
+    DEFAULT_MAX_RETRIES = 3
+    DEFAULT_RETRY_BACKOFF_SECONDS = 0.5
+
+    def __init__(
+        self,
+        storage: StorageBackend,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        retry_backoff_seconds: float = DEFAULT_RETRY_BACKOFF_SECONDS,
+    ) -> None:
+        if chunk_size <= 0:
+            raise ValueError("chunk_size must be positive")
+        self.storage = as_storage(storage)
+        self.chunk_size = chunk_size
+        self.max_retries = max(0, max_retries)
+        self.retry_backoff_seconds = retry_backoff_seconds
+
+    def upsert(
+        self,
+        table: str,
+        rows: Sequence[Dict[str, Any]],
+        on_conflict: Optional[str] = None,
+    ) -> int:
+        """Upsert `rows` into `table` chunk by chunk. Returns the number of rows written."""
+        return self._write_chunked(
+            'upsert', table, rows, lambda chunk: self.storage.upsert(table, chunk, on_conflict=on_conflict)
+        )
+
+    def update(self, table: str, rows: Sequence[Dict[str, Any]], key: str = 'id') -> int:
+        """Update existing rows matched on `key`, chunk by chunk. Returns the number of rows written."""
+        return self._write_chunked(
+            'update', table, rows, lambda chunk: self.storage.bulk_update(table, chunk, key=key)
+        )
+
+    def delete_ids(self, table: str, ids: Sequence[Any], eq: Optional[Dict[str, Any]] = None) -> int:
+        """Delete the rows of `table` whose `id` is in `ids` (and that match `eq`), one request per chunk."""
+        ids = list(ids)
+        size = min(self.chunk_size, self.DELETE_CHUNK_SIZE)
+        for start in range(0, len(ids), size):
+            chunk = ids[start:start + size]
+            self._with_retries('delete', table, chunk, lambda c: self.storage.delete(table, eq, in_={'id': c}))
+        if ids:
+            logger.info(f"Bulk delete of {len(ids)} rows from {table} (chunk_size={size})")
+        return len(ids)
+
+    def _write_chunked(self, operation: str, table: str, rows: Sequence[Dict[str, Any]], write_chunk) -> int:
+        rows_written = 0
+        for start in range(0, len(rows), self.chunk_size):
+            chunk = list(rows[start:start + self.chunk_size])
+            self._with_retries(operation, table, chunk, write_chunk)
+            rows_written += len(chunk)
+        if rows:
+            logger.info(f"Bulk {operation} of {rows_written} rows into {table} (chunk_size={self.chunk_size})")
+        return rows_written
+
+    def _with_retries(self, operation: str, table: str, chunk: List[Dict[str, Any]], write_chunk) -> None:
+        call_with_retries(
+            lambda: write_chunk(chunk),
+            f"Bulk {operation} of {len(chunk)} rows into {table}",
+            self.max_retries,
+            self.retry_backoff_seconds,
+        )
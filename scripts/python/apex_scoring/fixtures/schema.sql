@@ -0,0 +1,252 @@
+-- Local SQLite stand-in for the Supabase tables used by the scoring pipeline.
+-- Column names and unique keys follow the production schema; types are the
+-- nearest SQLite affinities (UUIDs and dates as TEXT, JSONB as JSON text).
+
+CREATE TABLE IF NOT EXISTS companies (
+  id TEXT PRIMARY KEY,
+  name TEXT NOT NULL,
+  description TEXT,
+  is_active BOOLEAN DEFAULT 1,
+  created_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS users (
+  id TEXT PRIMARY KEY,
+  first_name TEXT,
+  last_name TEXT,
+  email TEXT,
+  populi_id TEXT,
+  created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+  updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS students (
+  id TEXT PRIMARY KEY,
+  company_id TEXT REFERENCES companies(id),
+  academic_role TEXT,
+  company_role TEXT,
+  academic_year_start INTEGER,
+  academic_year_end INTEGER,
+  student_id INTEGER,
+  created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+  updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS categories (
+  id TEXT PRIMARY KEY,
+  name TEXT NOT NULL,
+  display_name TEXT,
+  weight NUMERIC DEFAULT 1.0,
+  created_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS subcategories (
+  id TEXT PRIMARY KEY,
+  category_id TEXT NOT NULL REFERENCES categories(id),
+  name TEXT NOT NULL,
+  display_name TEXT,
+  data_source TEXT,
+  weight NUMERIC DEFAULT 1.0,
+  created_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Versioned scoring settings; the highest version applies (apex_scoring.scoring_config)
+CREATE TABLE IF NOT EXISTS scoring_configs (
+  id TEXT PRIMARY KEY,
+  version INTEGER NOT NULL UNIQUE,
+  excluded_subcategory_ids JSON,
+  gpa_subcategory_ids JSON,
+  notes TEXT,
+  created_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS event_submissions (
+  id TEXT PRIMARY KEY,
+  event_id TEXT,
+  student_id TEXT NOT NULL REFERENCES students(id),
+  submitted_by TEXT,
+  submission_data JSON,
+  submitted_at TEXT,
+  subcategory_id TEXT REFERENCES subcategories(id),
+  needs_approval BOOLEAN DEFAULT 0,
+  approval_status TEXT DEFAULT 'pending',
+  approved_by TEXT,
+  approved_at TEXT,
+  points_granted NUMERIC,
+  approval_notes TEXT,
+  updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS event_submissions_student_idx ON event_submissions (student_id, subcategory_id);
+CREATE INDEX IF NOT EXISTS event_submissions_updated_idx ON event_submissions (updated_at);
+CREATE INDEX IF NOT EXISTS event_submissions_approved_idx ON event_submissions (approved_at);
+
+CREATE TABLE IF NOT EXISTS student_subcategory_scores (
+  id TEXT PRIMARY KEY,
+  student_id TEXT NOT NULL REFERENCES students(id),
+  subcategory_id TEXT NOT NULL REFERENCES subcategories(id),
+  score NUMERIC,
+  normalized_score NUMERIC,
+  data_points_count INTEGER,
+  total_possible_points NUMERIC,
+  academic_year_start INTEGER,
+  academic_year_end INTEGER,
+  calculation_date TEXT NOT NULL,
+  created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+  updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
+  UNIQUE (student_id, subcategory_id, calculation_date)
+);
+CREATE INDEX IF NOT EXISTS student_subcategory_scores_day_idx ON student_subcategory_scores (calculation_date, id);
+
+CREATE TABLE IF NOT EXISTS student_category_scores (
+  id TEXT PRIMARY KEY,
+  student_id TEXT NOT NULL REFERENCES students(id),
+  category_id TEXT NOT NULL REFERENCES categories(id),
+  raw_score NUMERIC,
+  normalized_score NUMERIC,
+  subcategory_count INTEGER,
+  academic_year_start INTEGER,
+  academic_year_end INTEGER,
+  calculation_date TEXT NOT NULL,
+  created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+  updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
+  UNIQUE (student_id, category_id, calculation_date)
+);
+CREATE INDEX IF NOT EXISTS student_category_scores_day_idx ON student_category_scores (calculation_date, id);
+
+CREATE TABLE IF NOT EXISTS student_holistic_gpa (
+  id TEXT PRIMARY KEY,
+  student_id TEXT NOT NULL REFERENCES students(id),
+  holistic_gpa NUMERIC,
+  category_breakdown JSON,
+  academic_year_start INTEGER,
+  academic_year_end INTEGER,
+  calculation_date TEXT NOT NULL,
+  created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+  updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
+  UNIQUE (student_id, calculation_date)
+);
+CREATE INDEX IF NOT EXISTS student_holistic_gpa_day_idx ON student_holistic_gpa (calculation_date, id);
+
+CREATE TABLE IF NOT EXISTS company_subcategory_scores (
+  id TEXT PRIMARY KEY,
+  company_id TEXT NOT NULL REFERENCES companies(id),
+  subcategory_id TEXT NOT NULL REFERENCES subcategories(id),
+  raw_points NUMERIC,
+  normalized_score NUMERIC,
+  score NUMERIC,
+  student_count INTEGER,
+  data_points_count INTEGER,
+  academic_year_start INTEGER,
+  academic_year_end INTEGER,
+  calculation_date TEXT NOT NULL,
+  created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+  updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
+  UNIQUE (company_id, subcategory_id, calculation_date)
+);
+
+CREATE TABLE IF NOT EXISTS company_category_scores (
+  id TEXT PRIMARY KEY,
+  company_id TEXT NOT NULL REFERENCES companies(id),
+  category_id TEXT NOT NULL REFERENCES categories(id),
+  raw_score NUMERIC,
+  normalized_score NUMERIC,
+  subcategory_count INTEGER,
+  academic_year_start INTEGER,
+  academic_year_end INTEGER,
+  calculation_date TEXT NOT NULL,
+  created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+  updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
+  UNIQUE (company_id, category_id, calculation_date)
+);
+
+CREATE TABLE IF NOT EXISTS company_holistic_gpa (
+  id TEXT PRIMARY KEY,
+  company_id TEXT NOT NULL REFERENCES companies(id),
+  holistic_gpa NUMERIC,
+  category_breakdown JSON,
+  academic_year_start INTEGER,
+  academic_year_end INTEGER,
+  calculation_date TEXT NOT NULL,
+  created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+  updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
+  UNIQUE (company_id, calculation_date)
+);
+
+-- Completed units of work of each daily run (apex_scoring.journal)
+CREATE TABLE IF NOT EXISTS score_run_journal (
+  id TEXT PRIMARY KEY,
+  calculation_date TEXT NOT NULL,
+  phase TEXT NOT NULL,
+  shard TEXT NOT NULL DEFAULT '',
+  rows_written INTEGER,
+  details JSON,
+  completed_at TEXT,
+  UNIQUE (calculation_date, phase, shard)
+);
+
+-- Raw score population of each subcategory per day, for what-if scoring (apex_scoring.curves)
+CREATE TABLE IF NOT EXISTS subcategory_curve_models (
+  id TEXT PRIMARY KEY,
+  subcategory_id TEXT NOT NULL REFERENCES subcategories(id),
+  calculation_date TEXT NOT NULL,
+  method TEXT NOT NULL DEFAULT 'bell_curve',
+  score_count INTEGER,
+  scores JSON,
+  counts JSON,
+  stats JSON,
+  created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+  updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
+  UNIQUE (subcategory_id, calculation_date)
+);
+CREATE INDEX IF NOT EXISTS subcategory_curve_models_day_idx ON subcategory_curve_models (calculation_date, id);
+
+-- Precomputed standings of each day (apex_scoring.leaderboards)
+CREATE TABLE IF NOT EXISTS student_rank_index (
+  id TEXT PRIMARY KEY,
+  student_id TEXT NOT NULL REFERENCES students(id),
+  company_id TEXT REFERENCES companies(id),
+  calculation_date TEXT NOT NULL,
+  holistic_gpa NUMERIC,
+  overall_rank INTEGER,
+  overall_percentile NUMERIC,
+  overall_rank_change INTEGER,
+  student_count INTEGER,
+  company_rank INTEGER,
+  company_percentile NUMERIC,
+  company_rank_change INTEGER,
+  company_student_count INTEGER,
+  created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+  updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
+  UNIQUE (student_id, calculation_date)
+);
+CREATE INDEX IF NOT EXISTS student_rank_index_day_idx ON student_rank_index (calculation_date, id);
+CREATE INDEX IF NOT EXISTS student_rank_index_rank_idx ON student_rank_index (calculation_date, overall_rank);
+
+CREATE TABLE IF NOT EXISTS company_rank_index (
+  id TEXT PRIMARY KEY,
+  company_id TEXT NOT NULL REFERENCES companies(id),
+  calculation_date TEXT NOT NULL,
+  holistic_gpa NUMERIC,
+  rank INTEGER,
+  percentile NUMERIC,
+  rank_change INTEGER,
+  company_count INTEGER,
+  created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+  updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
+  UNIQUE (company_id, calculation_date)
+);
+CREATE INDEX IF NOT EXISTS company_rank_index_rank_idx ON company_rank_index (calculation_date, rank);
+
+-- Mergeable raw score sketch of each (subcategory, academic year) cohort (apex_scoring.sketches)
+CREATE TABLE IF NOT EXISTS subcategory_score_sketches (
+  id TEXT PRIMARY KEY,
+  subcategory_id TEXT NOT NULL REFERENCES subcategories(id),
+  academic_year_start INTEGER NOT NULL,
+  calculation_date TEXT NOT NULL,
+  k INTEGER,
+  n INTEGER,
+  sketch JSON,
+  created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+  updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
+  UNIQUE (subcategory_id, academic_year_start)
+);
@@ -0,0 +1,311 @@
+"""
+apex_scoring.incremental
+
+Incremental recomputation of one calculation day.
+
+A full run re-curves every subcategory and rewrites every derived row. An
+incremental run starts from the last scored day (the baseline) and only redoes
+what a change can reach:
+
+- `find_changed_submissions` collects the `event_submissions` updated or approved
+  after a watermark, i.e. the students and subcategories touched since the last run.
+- On a new day, `carry_forward_scores` first copies the baseline's subcategory
+  scores, raw and normalized, so the day holds the whole population before the
+  changed students' raw scores are recomputed over them.
+- `IncrementalDay` compares the day's score rows with the baseline's. Subcategories
+  whose raw distribution changed, or that had a changed submission, are re-curved;
+  the others keep the baseline's normalized scores.
+- Students whose scores differ from the baseline, and their companies, are
+  recomputed. Every other category, holistic and company row is carried forward
+  from the baseline (when the baseline is the same day, it is simply left alone).
+
+Derived rows are upserted on their natural keys, so a day can be refreshed any
+number of times. When the baseline is the same day there is no earlier copy of the
+raw scores to compare against, so only changed submissions mark work. Company
+membership changes are not tracked either; a periodic full run remains the
+reference result.
+"""
+
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Set
+
+import numpy as np
+
+from apex_scoring.db import BulkWriter, DAY_KEY, DEFAULT_PAGE_SIZE, NATURAL_KEYS, paged_select, read_columns
+from apex_scoring.snapshot import Columns, DaySnapshot, same_values
+from apex_scoring.storage import StorageBackend
+
+logger = logging.getLogger(__name__)
+
+# The derived watermark is moved back by this much, so submissions changed while
+# the baseline run was still in progress are picked up again
+WATERMARK_OVERLAP = timedelta(minutes=30)
+
+SUBMISSION_CHANGE_COLUMNS = 'id, student_id, subcategory_id, updated_at, approved_at'
+BASELINE_SCORE_COLUMNS = ('student_id', 'subcategory_id', 'score', 'normalized_score', 'data_points_count')
+
+# `student_subcategory_scores` columns copied to a new day by `carry_forward_scores`
+CARRIED_SCORE_COLUMNS = (*BASELINE_SCORE_COLUMNS, 'academic_year_start', 'academic_year_end')
+
+# Columns copied when a derived row is carried forward; ids and timestamps are regenerated
+CARRY_FORWARD_COLUMNS = {
+    'student_category_scores': (
+        'student_id', 'category_id', 'raw_score', 'normalized_score', 'subcategory_count',
+        'academic_year_start', 'academic_year_end',
+    ),
+    'student_holistic_gpa': (
+        'student_id', 'holistic_gpa', 'category_breakdown', 'academic_year_start', 'academic_year_end',
+    ),
+    'company_subcategory_scores': (
+        'company_id', 'subcategory_id', 'raw_points', 'normalized_score', 'score', 'student_count',
+        'data_points_count', 'academic_year_start', 'academic_year_end',
+    ),
+    'company_category_scores': (
+        'company_id', 'category_id', 'raw_score', 'normalized_score', 'subcategory_count',
+        'academic_year_start', 'academic_year_end',
+    ),
+    'company_holistic_gpa': (
+        'company_id', 'holistic_gpa', 'category_breakdown', 'academic_year_start', 'academic_year_end',
+    ),
+}
+
+
+def parse_watermark(value: str) -> datetime:
+    """Parse an ISO timestamp as stored by Supabase or SQLite; naive values are taken as UTC."""
+    parsed = datetime.fromisoformat(str(value).strip().replace('Z', '+00:00'))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
+
+
+def format_watermark(value: datetime) -> str:
+    return value.astimezone(timezone.utc).isoformat()
+
+
+def find_baseline_day(storage: StorageBackend, calculation_date: str) -> Optional[str]:
+    """Latest day with holistic GPAs, provided it is not after `calculation_date`."""
+    latest = storage.select('student_holistic_gpa', 'calculation_date', order='calculation_date', desc=True, limit=1)
+    if not latest or str(latest[0]['calculation_date']) > calculation_date:
+        return None
+    return str(latest[0]['calculation_date'])
+
+
+def default_watermark(storage: StorageBackend, baseline_date: str, overlap: timedelta = WATERMARK_OVERLAP) -> Optional[str]:
+    """When the baseline day was last written (its newest holistic row), less `overlap`."""
+    latest = storage.select(
+        'student_holistic_gpa', 'updated_at', eq={'calculation_date': baseline_date},
+        order='updated_at', desc=True, limit=1,
+    )
+    if not latest or not latest[0].get('updated_at'):
+        return None
+    return format_watermark(parse_watermark(latest[0]['updated_at']) - overlap)
+
+
+def carry_forward_scores(
+    storage: StorageBackend,
+    writer: BulkWriter,
+    baseline_date: str,
+    calculation_date: str,
+    page_size: int = DEFAULT_PAGE_SIZE,
+) -> int:
+    """Copy the baseline day's subcategory scores, raw and normalized, to `calculation_date`.
+
+    The rows are upserted on their natural key, so the step can be repeated (and
+    needs no `copy_score_day` function on the server). Returns rows copied.
+    """
+    table = 'student_subcategory_scores'
+    rows = paged_select(
+        storage, table, ', '.join(CARRIED_SCORE_COLUMNS),
+        eq={'calculation_date': baseline_date}, key=DAY_KEY, page_size=page_size,
+    )
+    copied = writer.upsert(
+        table, [dict(r, calculation_date=calculation_date) for r in rows], on_conflict=NATURAL_KEYS[table]
+    )
+    logger.info(f"Carried {copied} subcategory scores forward from {baseline_date} to {calculation_date}")
+    return copied
+
+
+class ChangeSet:
+    """Students and subcategories with `event_submissions` changed after `since`."""
+
+    def __init__(self, since: str, submissions: List[Dict[str, Any]]) -> None:
+        self.since = since
+        self.submission_count = len(submissions)
+        self.student_ids: Set[str] = {r['student_id'] for r in submissions if r.get('student_id')}
+        self.subcategory_ids: Set[str] = {r['subcategory_id'] for r in submissions if r.get('subcategory_id')}
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            'since': self.since,
+            'changed_submissions': self.submission_count,
+            'changed_students': len(self.student_ids),
+            'changed_subcategories': len(self.subcategory_ids),
+        }
+
+
+def find_changed_submissions(storage: StorageBackend, since: str, page_size: int = DEFAULT_PAGE_SIZE) -> ChangeSet:
+    """Submissions whose `updated_at` or `approved_at` is after `since`."""
+    since = format_watermark(parse_watermark(since))
+    by_id: Dict[str, Dict[str, Any]] = {}
+    for column in ('updated_at', 'approved_at'):
+        for r in paged_select(storage, 'event_submissions', SUBMISSION_CHANGE_COLUMNS, gt={column: since}, page_size=page_size):
+            by_id[r['id']] = r
+    changes = ChangeSet(since, list(by_id.values()))
+    logger.info(
+        f"{changes.submission_count} submissions changed since {since}: "
+        f"{len(changes.student_ids)} students, {len(changes.subcategory_ids)} subcategories"
+    )
+    return changes
+
+
+class IncrementalDay:
+    """
+    A `DaySnapshot` paired with its baseline day, restricted to what changed.
+
+    Call `apply_normalization`, `recompute_students` and `recompute_companies` in
+    that order; each stages its writes on the snapshot for `DaySnapshot.flush`.
+    """
+
+    def __init__(
+        self,
+        snapshot: DaySnapshot,
+        changes: ChangeSet,
+        baseline_date: str,
+        baseline_scores: Columns,
+        baseline_rows: Dict[str, List[Dict[str, Any]]],
+    ) -> None:
+        self.snapshot = snapshot
+        self.changes = changes
+        self.baseline_date = baseline_date
+        self.baseline_scores = baseline_scores
+        self.baseline_rows = baseline_rows
+        self.changed_student_ids: Set[str] = set()
+        self._align()
+
+    @classmethod
+    def load(
+        cls,
+        storage: StorageBackend,
+        snapshot: DaySnapshot,
+        changes: ChangeSet,
+        baseline_date: str,
+        page_size: int = DEFAULT_PAGE_SIZE,
+    ) -> 'IncrementalDay':
+        """Read the baseline day's score rows and the derived rows that may be carried forward."""
+        if baseline_date == snapshot.calculation_date:
+            # Refreshing a day in place: the stored rows are the baseline and nothing is carried
+            baseline_scores = {c: snapshot.scores[c].copy() for c in BASELINE_SCORE_COLUMNS}
+            return cls(snapshot, changes, baseline_date, baseline_scores, {})
+
+        def load_day(table: str, columns) -> List[Dict[str, Any]]:
+            return paged_select(
+                storage, table, ', '.join(columns), eq={'calculation_date': baseline_date}, key=DAY_KEY, page_size=page_size,
+            )
+
+        baseline_scores = read_columns(
+            storage, 'student_subcategory_scores', BASELINE_SCORE_COLUMNS,
+            eq={'calculation_date': baseline_date}, key=DAY_KEY, page_size=page_size,
+        )
+        baseline_rows = {table: load_day(table, columns) for table, columns in CARRY_FORWARD_COLUMNS.items()}
+        return cls(snapshot, changes, baseline_date, baseline_scores, baseline_rows)
+
+    @property
+    def baseline_row_count(self) -> int:
+        return len(self.baseline_scores['student_id']) + sum(len(rows) for rows in self.baseline_rows.values())
+
+    def _align(self) -> None:
+        """Line the baseline score rows up with the snapshot's rows by (student, subcategory)."""
+        scores, base = self.snapshot.scores, self.baseline_scores
+        index = {key: i for i, key in enumerate(zip(base['student_id'], base['subcategory_id']))}
+        positions = np.fromiter(
+            (index.get(key, -1) for key in zip(scores['student_id'], scores['subcategory_id'])),
+            dtype=np.int64, count=self.snapshot.score_count,
+        )
+        self._present = positions >= 0
+        # Rows without a baseline counterpart point at an appended blank (NaN/None) row
+        take = np.where(self._present, positions, len(base['student_id']))
+        self._base_score = np.append(base['score'], np.nan)[take]
+        self._base_normalized = np.append(base['normalized_score'], np.nan)[take]
+        self._base_data_points = np.append(base['data_points_count'], None)[take]
+        # Baseline rows with no counterpart on the day (e.g. a score row that was removed)
+        matched = np.zeros(len(base['student_id']), dtype=bool)
+        matched[positions[self._present]] = True
+        self._dropped_students = set(base['student_id'][~matched])
+        self._dropped_subcategories = set(base['subcategory_id'][~matched])
+
+    def changed_subcategories(self) -> Set[str]:
+        """Subcategories whose raw distribution differs from the baseline or that had a changed submission."""
+        scores = self.snapshot.scores
+        raw_changed = ~self._present | ~same_values(scores['score'], self._base_score)
+        never_curved = ~np.isnan(scores['score']) & np.isnan(self._base_normalized)
+        changed = set(scores['subcategory_id'][raw_changed | never_curved])
+        changed |= self.changes.subcategory_ids | self._dropped_subcategories
+        return changed & set(scores['subcategory_id'])
+
+    def apply_normalization(self, aggregator) -> Dict[str, Any]:
+        """Re-curve the changed subcategories; the rest take the baseline's normalized scores."""
+        changed = self.changed_subcategories()
+        scores = self.snapshot.scores
+        stored = scores['normalized_score'].copy()
+        result = aggregator.normalize_snapshot(self.snapshot, only=changed)
+        # A re-curve only moves the ranks between a changed score's old and new place
+        self.snapshot.discard_normalized_scores(np.flatnonzero(same_values(scores['normalized_score'], stored)))
+
+        in_changed = np.fromiter((sid in changed for sid in scores['subcategory_id']), dtype=bool, count=self.snapshot.score_count)
+        carried = np.flatnonzero(self._present & ~in_changed & ~same_values(scores['normalized_score'], self._base_normalized))
+        if carried.size:
+            self.snapshot.set_normalized_scores(carried, self._base_normalized[carried])
+        logger.info(
+            f"Re-curved {len(changed)} of {len(set(scores['subcategory_id']))} subcategories; "
+            f"{carried.size} normalized scores carried forward from {self.baseline_date}"
+        )
+        return {'recurved_subcategories': sorted(changed), 'carried_rows': int(carried.size), 'results': result['results']}
+
+    def _changed_students(self) -> Set[str]:
+        scores = self.snapshot.scores
+        row_changed = (
+            ~self._present
+            | ~same_values(scores['score'], self._base_score)
+            | ~same_values(scores['normalized_score'], self._base_normalized)
+            | (scores['data_points_count'] != self._base_data_points)
+        )
+        return set(scores['student_id'][row_changed]) | self.changes.student_ids | self._dropped_students
+
+    def recompute_students(self, student_calculator) -> Dict[str, int]:
+        """Recompute changed students' category scores and holistic GPAs; carry the others forward."""
+        self.changed_student_ids = self._changed_students()
+        result = student_calculator.compute_student_scores_from_snapshot(
+            self.snapshot, only=self.changed_student_ids, merge_existing=True
+        )
+        scored = set(self.snapshot.scores['student_id']) & set(self.snapshot.students['id'])
+        unchanged = scored - self.changed_student_ids
+        result['student_rows_carried_forward'] = (
+            self._carry_forward('student_category_scores', 'student_id', unchanged)
+            + self._carry_forward('student_holistic_gpa', 'student_id', unchanged)
+        )
+        result['students_recomputed'] = len(scored & self.changed_student_ids)
+        return result
+
+    def recompute_companies(self, company_calculator) -> Dict[str, int]:
+        """Recompute companies with a changed student (call after `recompute_students`); carry the others forward."""
+        company_by_student = dict(zip(self.snapshot.students['id'], self.snapshot.students['company_id']))
+        scored = {company_by_student.get(sid) for sid in set(self.snapshot.scores['student_id'])} - {None, ''}
+        changed = {company_by_student.get(sid) for sid in self.changed_student_ids} & scored
+        result = company_calculator.compute_company_scores_from_snapshot(self.snapshot, only=changed, merge_existing=True)
+        unchanged = scored - changed
+        result['company_rows_carried_forward'] = sum(
+            self._carry_forward(table, 'company_id', unchanged)
+            for table in ('company_subcategory_scores', 'company_category_scores', 'company_holistic_gpa')
+        )
+        result['companies_recomputed'] = len(changed)
+        return result
+
+    def _carry_forward(self, table: str, key: str, keep: Set[str]) -> int:
+        """Stage the baseline rows of `table` whose `key` is in `keep`, re-dated to the snapshot's day."""
+        rows = [
+            dict(r, calculation_date=self.snapshot.calculation_date)
+            for r in self.baseline_rows.get(table, []) if r.get(key) in keep
+        ]
+        self.snapshot.stage(table, rows, on_conflict=NATURAL_KEYS[table])
+        return len(rows)
@@ -0,0 +1,72 @@
+"""
+apex_scoring.interning
+
+Dense integer codes for the id columns of in-memory score data.
+
+Score rows carry 36-character UUID strings (`student_id`, `subcategory_id`, ...)
+and every grouping used to sort those strings again. `IdTable` numbers a
+column's distinct ids once: `codes` is an int32 array aligned with the rows and
+`ids` the lookup table, sorted, so codes order exactly as `np.unique` numbers
+the strings and grouped results come out in the same order. Groupings then work
+on the codes, and ids are decoded (`ids[codes]`) only for the rows written.
+
+`DaySnapshot` builds the tables of its score rows once (`score_id_tables`);
+functions given plain columns build their own.
+"""
+
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+from apex_scoring.db import Columns
+
+# Id columns of score rows that get an `IdTable`
+SCORE_ID_COLUMNS = ('student_id', 'subcategory_id')
+
+
+class IdTable:
+    """int32 codes of an id column (`codes`) and the sorted distinct ids they index (`ids`); None is ''."""
+
+    __slots__ = ('ids', 'codes')
+
+    def __init__(self, values: Sequence[str]) -> None:
+        # A dict pass over the (interned) strings, rather than np.unique over a fixed-width copy of them
+        first_seen: Dict[str, int] = {}
+        codes = np.fromiter(
+            (first_seen.setdefault('' if v is None else str(v), len(first_seen)) for v in values),
+            dtype=np.int32, count=len(values),
+        )
+        ids = list(first_seen)
+        order = sorted(range(len(ids)), key=ids.__getitem__)
+        rank = np.empty(len(ids), dtype=np.int32)
+        rank[order] = np.arange(len(ids), dtype=np.int32)
+        self.ids = np.empty(len(ids), dtype=object)
+        self.ids[:] = [ids[i] for i in order]
+        self.codes = rank[codes]
+
+    def __len__(self) -> int:
+        return self.ids.size
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        """Ids of `codes`, as an object array."""
+        return self.ids[codes]
+
+    def groups(self) -> List[np.ndarray]:
+        """Row indices of each table entry's rows, in table order (ascending within a group)."""
+        if self.ids.size == 0:
+            return []
+        order = np.argsort(self.codes, kind='stable')
+        return np.split(order, np.cumsum(np.bincount(self.codes, minlength=self.ids.size))[:-1])
+
+    def members(self, keys: set) -> np.ndarray:
+        """Per table entry: whether its id is in `keys` (one set lookup per distinct id)."""
+        return np.fromiter((i in keys for i in self.ids), dtype=bool, count=self.ids.size)
+
+    def rows_in(self, keys: set) -> np.ndarray:
+        """Per row: whether its id is in `keys`."""
+        return self.members(keys)[self.codes]
+
+
+def score_id_tables(scores: Columns) -> Dict[str, IdTable]:
+    """`IdTable` of each of `SCORE_ID_COLUMNS` in score columns."""
+    return {column: IdTable(scores[column]) for column in SCORE_ID_COLUMNS}
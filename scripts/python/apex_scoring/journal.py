@@ -0,0 +1,100 @@
+"""
+apex_scoring.journal
+
+Journal of the completed units of work of a daily run.
+
+A run is a sequence of phases, and some phases split into independent units: one
+per subcategory when normalizing, one per table when flushing a snapshot, one per
+shard in a sharded run. `RunJournal` records every finished unit in the
+`score_run_journal` table, keyed by (calculation_date, phase, shard), with the
+rows it wrote. A resumed run of the same day skips the recorded units, so a run
+that failed or timed out in a late phase starts where it stopped instead of
+repeating the earlier phases' writes.
+
+A unit that failed partway is run again from the start, over whatever it had
+already written, so every journaled unit must be idempotent: its writes upsert
+on the table's natural key (`NATURAL_KEYS`) or update rows by id.
+"""
+
+import logging
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Set, Tuple
+
+from apex_scoring.db import paged_select
+from apex_scoring.storage import StorageBackend, as_storage
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_TABLE = 'score_run_journal'
+JOURNAL_KEY = 'calculation_date,phase,shard'
+JOURNAL_MIGRATION = 'supabase/migrations/20261017000600_score_run_journal.sql'
+
+# `shard` of a unit that covers its whole phase
+WHOLE_PHASE = ''
+
+
+class RunJournal:
+    """
+    Completed units of work for one `calculation_date`.
+
+    The day's entries are read once, on first use; `record` writes through to the
+    journal table and is safe to call from worker threads. Creating a journal on a
+    database without the table raises before any unit runs.
+    """
+
+    def __init__(self, storage: StorageBackend, calculation_date: str) -> None:
+        self.storage = as_storage(storage)
+        if not self.storage.has_table(JOURNAL_TABLE):
+            raise RuntimeError(
+                f"Resumable runs need the {JOURNAL_TABLE} table; apply {JOURNAL_MIGRATION} or run without resume"
+            )
+        self.calculation_date = calculation_date
+        self._entries: Optional[Dict[Tuple[str, str], Dict[str, Any]]] = None
+        self._lock = threading.Lock()
+
+    def _load(self) -> Dict[Tuple[str, str], Dict[str, Any]]:
+        with self._lock:
+            if self._entries is None:
+                rows = paged_select(
+                    self.storage, JOURNAL_TABLE, 'phase, shard, rows_written, details, completed_at',
+                    eq={'calculation_date': self.calculation_date}, key=('phase', 'shard'),
+                )
+                self._entries = {(r['phase'], r['shard'] or WHOLE_PHASE): r for r in rows}
+                if rows:
+                    logger.info(f"Run journal for {self.calculation_date}: {len(rows)} completed units")
+            return self._entries
+
+    def get(self, phase: str, shard: str = WHOLE_PHASE) -> Optional[Dict[str, Any]]:
+        """The recorded entry of a unit, or None when it has not completed."""
+        return self._load().get((phase, shard))
+
+    def done(self, phase: str, shard: str = WHOLE_PHASE) -> bool:
+        return self.get(phase, shard) is not None
+
+    def completed_shards(self, phase: str) -> Set[str]:
+        """Shards of `phase` recorded as completed (not including a whole-phase entry)."""
+        return {shard for p, shard in self._load() if p == phase and shard != WHOLE_PHASE}
+
+    def record(
+        self, phase: str, shard: str = WHOLE_PHASE, rows_written: int = 0, details: Optional[Dict[str, Any]] = None
+    ) -> None:
+        """Mark a unit as completed, replacing any earlier entry for it."""
+        row = {
+            'calculation_date': self.calculation_date,
+            'phase': phase,
+            'shard': shard,
+            'rows_written': int(rows_written),
+            'details': details or {},
+            'completed_at': datetime.now(timezone.utc).isoformat(),
+        }
+        self.storage.upsert(JOURNAL_TABLE, [row], on_conflict=JOURNAL_KEY)
+        entries = self._load()
+        with self._lock:
+            entries[(phase, shard)] = row
+
+    def clear(self) -> None:
+        """Forget every completed unit of the day, so the next resumed run starts from scratch."""
+        self.storage.delete(JOURNAL_TABLE, {'calculation_date': self.calculation_date})
+        with self._lock:
+            self._entries = {}
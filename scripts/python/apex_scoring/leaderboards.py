@@ -0,0 +1,229 @@
+"""
+apex_scoring.leaderboards
+
+Precomputed rank indexes of a scored day.
+
+Standings pages would otherwise sort the day's holistic rows on every request.
+`RankIndexBuilder` ranks them once per run instead and writes two tables:
+
+- `student_rank_index`, one row per (student_id, calculation_date): the student's
+  rank and percentile among all students and within their company.
+- `company_rank_index`, one row per (company_id, calculation_date): the company's
+  rank and percentile among companies.
+
+Ranks are competition ranks on holistic GPA (1 is the highest; tied GPAs share
+the best rank), percentiles are the share of the population with a strictly
+lower GPA (the bell curve's convention), and each rank carries its change since
+the previous ranked day (positive: moved up). A standing is then a single key
+lookup (`student_standing`) and a leaderboard an indexed range read
+(`company_leaderboard`).
+"""
+
+import logging
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from apex_scoring.changes import ChangeOnlyWriter, WRITE_COUNTS
+from apex_scoring.db import BulkWriter, DAY_KEY, DEFAULT_PAGE_SIZE, paged_select, read_columns
+from apex_scoring.storage import StorageBackend, as_storage
+
+logger = logging.getLogger(__name__)
+
+STUDENT_RANK_TABLE = 'student_rank_index'
+COMPANY_RANK_TABLE = 'company_rank_index'
+RANK_KEYS = {
+    STUDENT_RANK_TABLE: 'student_id,calculation_date',
+    COMPANY_RANK_TABLE: 'company_id,calculation_date',
+}
+
+# Journal unit of the rank index phase
+RANK_UNIT = 'rank_indexes'
+
+# Days looked back for the previous ranked day; rank changes are left empty past it
+RANK_CHANGE_LOOKBACK_DAYS = 7
+
+# GPAs are compared at this many decimals, so summation-order noise does not split ties
+RANK_DECIMALS = 9
+
+
+def competition_ranks(values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Rank (1 = highest, ties share the best rank) and percentile (share strictly below) of each value."""
+    values = np.round(np.asarray(values, dtype=float), RANK_DECIMALS)
+    if values.size == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=float)
+    ordered = np.sort(values)
+    ranks = values.size - np.searchsorted(ordered, values, side='right') + 1
+    percentiles = np.searchsorted(ordered, values, side='left') / values.size
+    return ranks, percentiles
+
+
+def previous_ranked_day(storage: StorageBackend, table: str, calculation_date: str) -> Optional[str]:
+    """The latest day before `calculation_date` (up to `RANK_CHANGE_LOOKBACK_DAYS` back) with rows in `table`."""
+    day = date.fromisoformat(calculation_date[:10])
+    for back in range(1, RANK_CHANGE_LOOKBACK_DAYS + 1):
+        candidate = (day - timedelta(days=back)).isoformat()
+        if storage.select(table, 'id', eq={'calculation_date': candidate}, limit=1):
+            return candidate
+    return None
+
+
+def _rank_change(previous: Dict[str, Any], key: str, rank: int) -> Optional[int]:
+    return None if previous.get(key) is None else int(previous[key]) - int(rank)
+
+
+class RankIndexBuilder:
+    """Writes a day's student and company rank indexes from its holistic GPA rows."""
+
+    def __init__(
+        self,
+        storage: StorageBackend,
+        write_chunk_size: int = BulkWriter.DEFAULT_CHUNK_SIZE,
+        page_size: int = DEFAULT_PAGE_SIZE,
+    ) -> None:
+        self.storage = as_storage(storage)
+        self.writer = BulkWriter(self.storage, chunk_size=write_chunk_size)
+        self.page_size = page_size
+
+    def _previous_ranks(self, table: str, key: str, columns: str, calculation_date: str) -> Dict[str, Dict[str, Any]]:
+        previous = previous_ranked_day(self.storage, table, calculation_date)
+        if previous is None:
+            return {}
+        rows = paged_select(
+            self.storage, table, f'id, calculation_date, {key}, {columns}', eq={'calculation_date': previous},
+            key=DAY_KEY, page_size=self.page_size,
+        )
+        return {r[key]: r for r in rows}
+
+    def student_rows(self, calculation_date: str) -> List[Dict[str, Any]]:
+        holistic = read_columns(
+            self.storage, 'student_holistic_gpa', ('student_id', 'holistic_gpa'),
+            eq={'calculation_date': calculation_date}, key=DAY_KEY, page_size=self.page_size,
+        )
+        scored = ~np.isnan(holistic['holistic_gpa'].astype(float))
+        student_ids = holistic['student_id'][scored]
+        gpas = holistic['holistic_gpa'][scored].astype(float)
+        if not student_ids.size:
+            return []
+        company_by_student = {
+            r['id']: r.get('company_id') or None
+            for r in paged_select(self.storage, 'students', 'id, company_id', page_size=self.page_size)
+        }
+        companies = np.array([company_by_student.get(s) or '' for s in student_ids], dtype=object)
+
+        overall_rank, overall_percentile = competition_ranks(gpas)
+        company_rank = np.zeros(gpas.size, dtype=np.int64)
+        company_percentile = np.full(gpas.size, np.nan)
+        company_size = np.zeros(gpas.size, dtype=np.int64)
+        for company in set(companies) - {''}:
+            members = np.flatnonzero(companies == company)
+            company_rank[members], company_percentile[members] = competition_ranks(gpas[members])
+            company_size[members] = members.size
+
+        previous = self._previous_ranks(STUDENT_RANK_TABLE, 'student_id', 'company_id, overall_rank, company_rank', calculation_date)
+        rows: List[Dict[str, Any]] = []
+        for i, student_id in enumerate(student_ids):
+            prior = previous.get(student_id, {})
+            company_id = companies[i] or None
+            in_company = company_id is not None
+            rows.append({
+                'student_id': student_id,
+                'company_id': company_id,
+                'calculation_date': calculation_date,
+                'holistic_gpa': float(gpas[i]),
+                'overall_rank': int(overall_rank[i]),
+                'overall_percentile': float(overall_percentile[i]),
+                'overall_rank_change': _rank_change(prior, 'overall_rank', overall_rank[i]),
+                'student_count': int(gpas.size),
+                'company_rank': int(company_rank[i]) if in_company else None,
+                'company_percentile': float(company_percentile[i]) if in_company else None,
+                # A student who moved company has no earlier rank in the new one
+                'company_rank_change': (
+                    _rank_change(prior, 'company_rank', company_rank[i])
+                    if in_company and prior.get('company_id') == company_id else None
+                ),
+                'company_student_count': int(company_size[i]) if in_company else None,
+            })
+        return rows
+
+    def company_rows(self, calculation_date: str) -> List[Dict[str, Any]]:
+        holistic = read_columns(
+            self.storage, 'company_holistic_gpa', ('company_id', 'holistic_gpa'),
+            eq={'calculation_date': calculation_date}, key=DAY_KEY, page_size=self.page_size,
+        )
+        scored = ~np.isnan(holistic['holistic_gpa'].astype(float))
+        company_ids = holistic['company_id'][scored]
+        gpas = holistic['holistic_gpa'][scored].astype(float)
+        ranks, percentiles = competition_ranks(gpas)
+        previous = self._previous_ranks(COMPANY_RANK_TABLE, 'company_id', 'rank', calculation_date)
+        return [
+            {
+                'company_id': company_id,
+                'calculation_date': calculation_date,
+                'holistic_gpa': float(gpas[i]),
+                'rank': int(ranks[i]),
+                'percentile': float(percentiles[i]),
+                'rank_change': _rank_change(previous.get(company_id, {}), 'rank', ranks[i]),
+                'company_count': int(gpas.size),
+            }
+            for i, company_id in enumerate(company_ids)
+        ]
+
+    def build(self, calculation_date: str, changes_only: bool = False) -> Dict[str, Any]:
+        """Rank the day's students and companies and upsert both indexes.
+
+        Returns the write counts summed over both tables, and per table in `tables`.
+        With `changes_only`, rows equal to the stored (or previous day's) rows are
+        not sent (see `ChangeOnlyWriter`). Nothing is built until both tables exist
+        (their migration is applied).
+        """
+        missing = [table for table in RANK_KEYS if not self.storage.has_table(table)]
+        if missing:
+            logger.warning(f"Rank index tables not found ({', '.join(missing)}); rank indexes are not built")
+            return {**dict.fromkeys(WRITE_COUNTS, 0), 'tables': {}}
+        changes = ChangeOnlyWriter(self.writer, page_size=self.page_size) if changes_only else None
+        tables: Dict[str, Dict[str, int]] = {}
+        for table, rows in (
+            (STUDENT_RANK_TABLE, self.student_rows(calculation_date)),
+            (COMPANY_RANK_TABLE, self.company_rows(calculation_date)),
+        ):
+            if changes is not None:
+                tables[table] = changes.upsert_day(table, rows, calculation_date, RANK_KEYS[table])
+            else:
+                tables[table] = dict.fromkeys(WRITE_COUNTS, 0)
+                tables[table]['rows_written'] = self.writer.upsert(table, rows, on_conflict=RANK_KEYS[table])
+        summary: Dict[str, Any] = {name: sum(t[name] for t in tables.values()) for name in WRITE_COUNTS}
+        summary['tables'] = tables
+        logger.info(f"Rank indexes for {calculation_date}: {summary['rows_written']} rows written")
+        return summary
+
+
+def _latest_day(storage: StorageBackend, table: str) -> Optional[str]:
+    latest = storage.select(table, 'calculation_date', order='calculation_date', desc=True, limit=1)
+    return str(latest[0]['calculation_date'])[:10] if latest else None
+
+
+def student_standing(
+    storage: StorageBackend, student_id: str, calculation_date: Optional[str] = None,
+) -> Optional[Dict[str, Any]]:
+    """A student's rank index row for `calculation_date` (default: their latest ranked day)."""
+    storage = as_storage(storage)
+    eq: Dict[str, Any] = {'student_id': student_id}
+    if calculation_date is not None:
+        eq['calculation_date'] = calculation_date
+    rows = storage.select(STUDENT_RANK_TABLE, '*', eq=eq, order='calculation_date', desc=True, limit=1)
+    return rows[0] if rows else None
+
+
+def company_leaderboard(
+    storage: StorageBackend, calculation_date: Optional[str] = None, limit: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """Companies in rank order for `calculation_date` (default: the latest ranked day)."""
+    storage = as_storage(storage)
+    calculation_date = calculation_date or _latest_day(storage, COMPANY_RANK_TABLE)
+    if calculation_date is None:
+        return []
+    return storage.select(
+        COMPANY_RANK_TABLE, '*', eq={'calculation_date': calculation_date}, order=['rank', 'company_id'], limit=limit,
+    )
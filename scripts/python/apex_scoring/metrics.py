@@ -0,0 +1,215 @@
+"""
+apex_scoring.metrics
+
+Per-phase instrumentation for the daily scoring run.
+
+`InstrumentedStorage` wraps any `StorageBackend` and counts queries, rows and
+(estimated) payload bytes, and the wall time spent inside storage calls.
+`PipelineMetrics.phase` snapshots those counters around a phase together with
+wall/CPU time and peak RSS, and emits each phase as a structlog event. The
+collected phases can also be written as an OpenMetrics text file.
+"""
+
+import json
+import resource
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+import structlog
+
+from apex_scoring.storage import StorageBackend
+
+log = structlog.get_logger(__name__)
+
+COUNTERS = ('queries', 'rows_read', 'rows_written', 'bytes_read', 'bytes_written', 'db_seconds')
+
+# Rows JSON-encoded per call to estimate payload size
+BYTES_SAMPLE_ROWS = 50
+
+
+def estimate_payload_bytes(rows: Sequence[Any]) -> int:
+    """Approximate JSON size of `rows`, extrapolated from the first `BYTES_SAMPLE_ROWS` rows."""
+    if not rows:
+        return 0
+    sample = rows[:BYTES_SAMPLE_ROWS]
+    sample_bytes = len(json.dumps(list(sample), default=str))
+    return int(sample_bytes * len(rows) / len(sample))
+
+
+class InstrumentedStorage(StorageBackend):
+    """`StorageBackend` decorator that counts every call made through it."""
+
+    def __init__(self, backend: StorageBackend) -> None:
+        self.backend = backend
+        self._lock = threading.Lock()
+        self._totals: Dict[str, float] = {name: 0 for name in COUNTERS}
+
+    def counters(self) -> Dict[str, float]:
+        with self._lock:
+            return dict(self._totals)
+
+    def _record(self, seconds: float, rows_read: int = 0, rows_written: int = 0,
+                bytes_read: int = 0, bytes_written: int = 0) -> None:
+        with self._lock:
+            t = self._totals
+            t['queries'] += 1
+            t['rows_read'] += rows_read
+            t['rows_written'] += rows_written
+            t['bytes_read'] += bytes_read
+            t['bytes_written'] += bytes_written
+            t['db_seconds'] += seconds
+
+    def select(self, table, columns='*', eq=None, in_=None, gt=None, after=None, order=None, desc=False, limit=None, offset=None):
+        start = time.perf_counter()
+        rows = self.backend.select(
+            table, columns, eq=eq, in_=in_, gt=gt, after=after, order=order, desc=desc, limit=limit, offset=offset
+        )
+        self._record(time.perf_counter() - start, rows_read=len(rows), bytes_read=estimate_payload_bytes(rows))
+        return rows
+
+    def upsert(self, table, rows, on_conflict=None):
+        rows = list(rows)
+        start = time.perf_counter()
+        written = self.backend.upsert(table, rows, on_conflict=on_conflict)
+        self._record(time.perf_counter() - start, rows_written=written, bytes_written=estimate_payload_bytes(rows))
+        return written
+
+    def bulk_update(self, table, rows, key='id'):
+        rows = list(rows)
+        start = time.perf_counter()
+        written = self.backend.bulk_update(table, rows, key=key)
+        self._record(time.perf_counter() - start, rows_written=written, bytes_written=estimate_payload_bytes(rows))
+        return written
+
+    def delete(self, table, eq=None, in_=None):
+        start = time.perf_counter()
+        self.backend.delete(table, eq, in_=in_)
+        self._record(time.perf_counter() - start)
+
+    def rpc(self, function, params=None):
+        start = time.perf_counter()
+        data = self.backend.rpc(function, params)
+        rows = data if isinstance(data, list) else []
+        self._record(time.perf_counter() - start, rows_read=len(rows), bytes_read=estimate_payload_bytes(rows))
+        return data
+
+    def has_table(self, table):
+        start = time.perf_counter()
+        exists = self.backend.has_table(table)
+        self._record(time.perf_counter() - start)
+        return exists
+
+    def copy_day(self, table, columns, from_date, to_date):
+        start = time.perf_counter()
+        copied = self.backend.copy_day(table, columns, from_date, to_date)
+        self._record(time.perf_counter() - start, rows_written=copied)
+        return copied
+
+
+def _reset_peak_rss() -> bool:
+    """Reset the kernel's RSS high-water mark (Linux only). Returns whether it worked."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def _peak_rss_bytes() -> int:
+    """Peak RSS since the last reset (Linux VmHWM), else the process-lifetime peak."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class PipelineMetrics:
+    """
+    Collects one metrics record per phase of a run.
+
+    `db_seconds` is wall time spent inside storage calls; `cpu_seconds` is process
+    CPU time. For a remote database the gap between `wall_seconds` and `cpu_seconds`
+    is mostly network/DB wait. With SQLite the database work itself is in-process CPU.
+    """
+
+    def __init__(self, storage: Optional[InstrumentedStorage] = None, **labels: Any) -> None:
+        self.storage = storage
+        self.labels = {k: str(v) for k, v in labels.items()}
+        self.phases: List[Dict[str, Any]] = []
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[Dict[str, Any]]:
+        """Measure the enclosed block; the yielded dict is filled in when the block exits."""
+        record: Dict[str, Any] = {'phase': name}
+        before = self.storage.counters() if self.storage else {}
+        per_phase_rss = _reset_peak_rss()
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        try:
+            yield record
+        finally:
+            record['wall_seconds'] = round(time.perf_counter() - wall_start, 6)
+            record['cpu_seconds'] = round(time.process_time() - cpu_start, 6)
+            after = self.storage.counters() if self.storage else {}
+            for counter in COUNTERS:
+                delta = after.get(counter, 0) - before.get(counter, 0)
+                record[counter] = round(delta, 6) if counter == 'db_seconds' else int(delta)
+            record['peak_rss_bytes'] = _peak_rss_bytes()
+            record['peak_rss_scope'] = 'phase' if per_phase_rss else 'process'
+            self.phases.append(record)
+            log.info('phase_metrics', **self.labels, **record)
+
+    def totals(self) -> Dict[str, Any]:
+        """Sums over all recorded phases (peak RSS is the maximum)."""
+        totals: Dict[str, Any] = {'phases': len(self.phases)}
+        for key in ('wall_seconds', 'cpu_seconds') + COUNTERS:
+            totals[key] = round(sum(p.get(key, 0) for p in self.phases), 6)
+        totals['peak_rss_bytes'] = max((p['peak_rss_bytes'] for p in self.phases), default=0)
+        return totals
+
+    def emit_totals(self) -> Dict[str, Any]:
+        totals = self.totals()
+        log.info('run_metrics', **self.labels, **totals)
+        return totals
+
+    def to_openmetrics(self, prefix: str = 'apex_scoring') -> str:
+        """Render the phase records in OpenMetrics text format (one gauge family per measurement)."""
+        families = {
+            'phase_wall_seconds': ('wall_seconds', 'Wall-clock time of the phase'),
+            'phase_cpu_seconds': ('cpu_seconds', 'Process CPU time during the phase'),
+            'phase_db_seconds': ('db_seconds', 'Wall time spent inside storage calls'),
+            'phase_queries': ('queries', 'Storage calls made'),
+            'phase_rows_read': ('rows_read', 'Rows returned by storage'),
+            'phase_rows_written': ('rows_written', 'Rows sent to storage'),
+            'phase_bytes_read': ('bytes_read', 'Estimated JSON bytes read'),
+            'phase_bytes_written': ('bytes_written', 'Estimated JSON bytes written'),
+            'phase_peak_rss_bytes': ('peak_rss_bytes', 'Peak resident set size'),
+        }
+        lines: List[str] = []
+        for family, (key, help_text) in families.items():
+            name = f'{prefix}_{family}'
+            lines.append(f'# TYPE {name} gauge')
+            lines.append(f'# HELP {name} {help_text}.')
+            for p in self.phases:
+                labels = {**self.labels, 'phase': p['phase']}
+                rendered = ','.join(f'{k}="{_escape_label(v)}"' for k, v in labels.items())
+                lines.append(f'{name}{{{rendered}}} {p.get(key, 0)}')
+        lines.append('# EOF')
+        return '\n'.join(lines) + '\n'
+
+    def write_openmetrics(self, path: str, prefix: str = 'apex_scoring') -> None:
+        with open(path, 'w') as f:
+            f.write(self.to_openmetrics(prefix))
+
+
+def _escape_label(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
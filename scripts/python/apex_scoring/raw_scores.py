@@ -0,0 +1,449 @@
+"""
+apex_scoring.raw_scores
+
+Raw subcategory scores computed from `event_submissions` in one vectorized pass.
+
+`RawScoreEngine` loads the approved submissions of an academic year in pages,
+flattens them into NumPy columns and aggregates every (student, subcategory)
+pair with `np.bincount`, following the rules in `docs/HOLISTIC_GPA_CALCULATION.md`:
+
+- attendance / monthly: attended / total submissions x 100
+- hours: community service hours, each day's submissions capped at 8 hours
+  together and the year capped at 12
+- points: sum of staff-assigned points
+- rating: average officer rating (1-5) x 20
+- gbe: attended events / events held x 100 plus bonus points, clamped to 0-100
+
+It replaces one `calculate_student_subcategory_scores` RPC per student. Grade
+subcategories are imported from Populi rather than computed: a new day gets each
+student's latest stored grade rows carried forward (`RawScoreEngine.grade_rows`).
+"""
+
+import logging
+from datetime import date, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from apex_scoring.changes import ChangeOnlyWriter
+from apex_scoring.db import BulkWriter, DEFAULT_PAGE_SIZE, NATURAL_KEYS, paged_select
+from apex_scoring.storage import StorageBackend, as_storage
+
+logger = logging.getLogger(__name__)
+
+# Aggregation rule of each subcategory, by `subcategories.name`
+AGGREGATION_KINDS: Dict[str, str] = {
+    'chapel_attendance': 'attendance',
+    'chapel_participation': 'rating',
+    'community_service_hours': 'hours',
+    'dream_team_involvement': 'monthly',
+    'fellow_friday_attendance': 'attendance',
+    'gbe_attendance': 'attendance',
+    'small_group_involvement': 'monthly',
+    'spiritual_formation_grade': 'grade',
+    'class_attendance_grades': 'grade',
+    'credentials_certifications': 'points',
+    'fellow_friday_participation': 'points',
+    'job_promotion_opportunities': 'points',
+    'practicum_grade': 'grade',
+    'company_community_events': 'attendance',
+    'company_team_building': 'rating',
+    'gbe_participation': 'gbe',
+    'lions_games_involvement': 'points',
+}
+
+# Kinds computed here, in column order of the aggregation
+SCORED_KINDS = ('attendance', 'monthly', 'hours', 'points', 'rating', 'gbe')
+
+# `submission_data` keys holding the value each kind sums, before falling back to `points_granted`
+VALUE_KEYS: Dict[str, Tuple[str, ...]] = {
+    'hours': ('hours',),
+    'points': ('assigned_points', 'points'),
+    'rating': ('rating', 'points'),
+    'gbe': ('bonus_points', 'points'),
+}
+
+# `submission_data.status` values that count as attended (attendance and monthly checks)
+ATTENDED_STATUSES = frozenset({'present', 'involved'})
+
+DAILY_HOURS_CAP = 8.0
+ANNUAL_HOURS_CAP = 12.0
+RATING_SCALE = 20.0
+
+SUBMISSION_COLUMNS = 'id, student_id, subcategory_id, event_id, submission_data, submitted_at, points_granted'
+# Enough of a GBE submission to count the events held
+GBE_EVENT_COLUMNS = 'id, student_id, subcategory_id, event_id, submitted_at'
+
+# Student ids per `in` filter when reading a subset of students (keeps PostgREST URLs short)
+STUDENT_FILTER_CHUNK = 200
+
+# Days looked back for stored grade rows when a later day already has them (a backfill)
+GRADE_LOOKBACK_DAYS = 31
+
+
+def academic_year_of(day: date) -> int:
+    """Academic year (`academic_year_start`) that `day` falls in; years start on 1 August."""
+    return day.year if day.month >= 8 else day.year - 1
+
+
+def academic_year_window(academic_year: int, calculation_date: date) -> Tuple[date, date]:
+    """First and last day whose submissions count towards `calculation_date`'s scores.
+
+    The academic year runs from 1 August; submissions after the calculation date
+    are left out so that recomputing a past day reproduces it.
+    """
+    start = date(academic_year, 8, 1)
+    end = min(calculation_date, date(academic_year + 1, 7, 31))
+    return start, end
+
+
+def _value(data: Dict[str, Any], keys: Tuple[str, ...], points_granted: Any) -> float:
+    for key in keys:
+        v = data.get(key)
+        if v is not None:
+            return float(v)
+    return float(points_granted) if points_granted is not None else 0.0
+
+
+def events_held(events: Iterable[Tuple[str, str]], subcategory_ids: Sequence[str]) -> np.ndarray:
+    """Distinct events held per subcategory (the GBE denominator) from (subcategory_id, event_id) pairs."""
+    sub_index = {sid: c for c, sid in enumerate(subcategory_ids)}
+    held = np.zeros(len(subcategory_ids))
+    for sub_id, _ in set(events):
+        c = sub_index.get(sub_id)
+        if c is not None:
+            held[c] += 1
+    return held
+
+
+class RawScoreEngine:
+    """
+    Computes `student_subcategory_scores.score` / `data_points_count` for a day.
+
+    Every student of the academic year gets a row for every submission-based
+    subcategory; a student with no submissions scores 0 with 0 data points.
+    """
+
+    def __init__(
+        self,
+        storage: StorageBackend,
+        write_chunk_size: int = BulkWriter.DEFAULT_CHUNK_SIZE,
+        page_size: int = DEFAULT_PAGE_SIZE,
+    ) -> None:
+        self.storage = as_storage(storage)
+        self.writer = BulkWriter(self.storage, chunk_size=write_chunk_size)
+        self.page_size = page_size
+
+    def load_submissions(
+        self, academic_year: int, calculation_date: date, student_ids: Optional[Sequence[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """Approved submissions from the start of the academic year (later ones are dropped in `compute`).
+
+        With `student_ids`, only those students' submissions are read, `STUDENT_FILTER_CHUNK` ids per filter.
+        """
+        start, _ = academic_year_window(academic_year, calculation_date)
+        # `gt` is exclusive: anything submitted after the day before the year starts
+        after = (start - timedelta(days=1)).isoformat() + 'T23:59:59.999999'
+        if student_ids is None:
+            return paged_select(
+                self.storage, 'event_submissions', SUBMISSION_COLUMNS,
+                eq={'approval_status': 'approved'}, gt={'submitted_at': after}, page_size=self.page_size, prefetch=True,
+            )
+        student_ids = list(student_ids)
+        submissions: List[Dict[str, Any]] = []
+        for i in range(0, len(student_ids), STUDENT_FILTER_CHUNK):
+            submissions.extend(paged_select(
+                self.storage, 'event_submissions', SUBMISSION_COLUMNS,
+                eq={'approval_status': 'approved'}, gt={'submitted_at': after},
+                in_={'student_id': student_ids[i:i + STUDENT_FILTER_CHUNK]}, page_size=self.page_size,
+            ))
+        return submissions
+
+    def load_events(
+        self, academic_year: int, calculation_date: date, students: Sequence[str], subcategory_ids: Sequence[str],
+        kinds: Sequence[str],
+    ) -> Set[Tuple[str, str]]:
+        """Distinct (subcategory_id, event_id) pairs of the year's GBE submissions, as `accumulate` collects them.
+
+        Reads only the GBE subcategories' submissions and only the columns needed, so a
+        run over a few students can still count events held over the whole population.
+        """
+        gbe_ids = [sub_id for sub_id, kind in zip(subcategory_ids, kinds) if kind == 'gbe']
+        if not gbe_ids:
+            return set()
+        start, end = (d.isoformat() for d in academic_year_window(academic_year, calculation_date))
+        after = (date.fromisoformat(start) - timedelta(days=1)).isoformat() + 'T23:59:59.999999'
+        rows = paged_select(
+            self.storage, 'event_submissions', GBE_EVENT_COLUMNS,
+            eq={'approval_status': 'approved'}, gt={'submitted_at': after}, in_={'subcategory_id': gbe_ids},
+            page_size=self.page_size,
+        )
+        wanted = set(students)
+        return {
+            (r['subcategory_id'], str(r['event_id'])) for r in rows
+            if r.get('event_id') is not None and r.get('student_id') in wanted
+            and start <= (r.get('submitted_at') or '')[:10] <= end
+        }
+
+    def compute(
+        self,
+        academic_year: int,
+        calculation_date: date,
+        student_ids: Optional[Iterable[str]] = None,
+        submissions: Optional[Sequence[Dict[str, Any]]] = None,
+    ) -> List[Dict[str, Any]]:
+        """Score rows for `calculation_date`, optionally only for `student_ids`.
+
+        With `student_ids`, only those students' submissions are read; events held
+        (the GBE denominator) are still counted over the whole population, from `load_events`.
+        """
+        students = [r['id'] for r in paged_select(
+            self.storage, 'students', 'id', eq={'academic_year_start': academic_year}, page_size=self.page_size
+        )]
+        all_subcategories = paged_select(self.storage, 'subcategories', 'id, name', page_size=self.page_size)
+        subcategories = [r for r in all_subcategories if AGGREGATION_KINDS.get(r['name']) in SCORED_KINDS]
+        if not students or not subcategories:
+            logger.warning(f"No students or submission-based subcategories for academic year {academic_year}")
+            return []
+        subcategory_ids = [r['id'] for r in subcategories]
+        kinds = np.array([AGGREGATION_KINDS[r['name']] for r in subcategories])
+
+        events = None
+        scored = students
+        if student_ids is not None:
+            wanted = set(student_ids)
+            scored = [sid for sid in students if sid in wanted]
+            events = self.load_events(academic_year, calculation_date, students, subcategory_ids, kinds)
+        if submissions is None:
+            submissions = self.load_submissions(
+                academic_year, calculation_date, student_ids=None if student_ids is None else scored
+            )
+
+        score, data_points = self._aggregate(
+            submissions, scored, subcategory_ids, kinds, academic_year, calculation_date, events
+        )
+        rows = self.score_rows(scored, subcategory_ids, score, data_points, academic_year, calculation_date)
+        return rows + self.grade_rows(academic_year, calculation_date, scored, all_subcategories)
+
+    def latest_grade_day(self, grade_ids: Sequence[str], calculation_date: date) -> Optional[str]:
+        """Latest day on or before `calculation_date` with stored grade rows, if any."""
+        table = 'student_subcategory_scores'
+        day = calculation_date.isoformat()
+        latest = self.storage.select(
+            table, 'calculation_date', in_={'subcategory_id': list(grade_ids)},
+            order='calculation_date', desc=True, limit=1,
+        )
+        if not latest:
+            return None
+        if str(latest[0]['calculation_date'])[:10] <= day:
+            return str(latest[0]['calculation_date'])[:10]
+        # A past day recomputed after later days were scored: step back from it
+        for back in range(GRADE_LOOKBACK_DAYS + 1):
+            candidate = (calculation_date - timedelta(days=back)).isoformat()
+            if self.storage.select(
+                table, 'id', eq={'calculation_date': candidate}, in_={'subcategory_id': list(grade_ids)}, limit=1
+            ):
+                return candidate
+        return None
+
+    def grade_rows(
+        self,
+        academic_year: int,
+        calculation_date: date,
+        students: Sequence[str],
+        subcategories: Optional[Sequence[Dict[str, Any]]] = None,
+    ) -> List[Dict[str, Any]]:
+        """Grade rows of `students` for `calculation_date`, carried forward from the latest stored day.
+
+        Grades are imported from Populi with no submissions behind them, so a new
+        day starts from the last import. Empty when the day already has its grade
+        rows (they are left as stored) or no grades were ever imported.
+        """
+        if subcategories is None:
+            subcategories = paged_select(self.storage, 'subcategories', 'id, name', page_size=self.page_size)
+        grade_ids = [r['id'] for r in subcategories if AGGREGATION_KINDS.get(r['name']) == 'grade']
+        if not grade_ids or not students:
+            return []
+        day = calculation_date.isoformat()
+        source = self.latest_grade_day(grade_ids, calculation_date)
+        if source is None or source == day:
+            return []
+        wanted = set(students)
+        stored = paged_select(
+            self.storage, 'student_subcategory_scores', 'id, student_id, subcategory_id, score, data_points_count',
+            eq={'calculation_date': source}, in_={'subcategory_id': grade_ids}, page_size=self.page_size,
+        )
+        logger.info(f"Carrying {len(stored)} grade rows forward from {source} to {day}")
+        return [
+            {
+                'student_id': r['student_id'],
+                'subcategory_id': r['subcategory_id'],
+                'score': r['score'],
+                'data_points_count': r['data_points_count'],
+                'academic_year_start': academic_year,
+                'academic_year_end': academic_year + 1,
+                'calculation_date': day,
+            }
+            for r in stored if r['student_id'] in wanted
+        ]
+
+    @staticmethod
+    def score_rows(
+        students: Sequence[str],
+        subcategory_ids: Sequence[str],
+        score: np.ndarray,
+        data_points: np.ndarray,
+        academic_year: int,
+        calculation_date: date,
+        keep: Optional[np.ndarray] = None,
+    ) -> List[Dict[str, Any]]:
+        """`student_subcategory_scores` rows from (students, subcategories) matrices, for the `keep` students."""
+        day = calculation_date.isoformat()
+        indices = range(len(students)) if keep is None else np.nonzero(keep)[0].tolist()
+        rows: List[Dict[str, Any]] = []
+        for i in indices:
+            for c, sub_id in enumerate(subcategory_ids):
+                rows.append({
+                    'student_id': students[i],
+                    'subcategory_id': sub_id,
+                    'score': float(score[i, c]),
+                    'data_points_count': int(data_points[i, c]),
+                    'academic_year_start': academic_year,
+                    'academic_year_end': academic_year + 1,
+                    'calculation_date': day,
+                })
+        return rows
+
+    def _aggregate(
+        self,
+        submissions: Sequence[Dict[str, Any]],
+        students: List[str],
+        subcategory_ids: List[str],
+        kinds: np.ndarray,
+        academic_year: int,
+        calculation_date: date,
+        events: Optional[Iterable[Tuple[str, str]]] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """(score, data_points) matrices of shape (students, subcategories).
+
+        Events held are counted from `events` when given, else from the submissions themselves.
+        """
+        partial = self.accumulate(submissions, students, subcategory_ids, kinds, academic_year, calculation_date)
+        held = events_held(partial['events'] if events is None else events, subcategory_ids)
+        return self.finalize(kinds, partial['count'], partial['attended'], partial['value'], held), partial['count']
+
+    def accumulate(
+        self,
+        submissions: Sequence[Dict[str, Any]],
+        students: List[str],
+        subcategory_ids: List[str],
+        kinds: np.ndarray,
+        academic_year: int,
+        calculation_date: date,
+    ) -> Dict[str, Any]:
+        """Per (student, subcategory) sums of the submissions, before any ratio is taken.
+
+        Returns `count`, `attended` and `value` matrices of shape (students, subcategories)
+        and `events`, the distinct (subcategory_id, event_id) pairs of GBE submissions. Partials for
+        disjoint sets of students add up (`events` as a union), so sharded runs can
+        accumulate separately and `finalize` once.
+        """
+        n_students, n_subs = len(students), len(subcategory_ids)
+        student_index = {sid: i for i, sid in enumerate(students)}
+        sub_index = {sid: c for c, sid in enumerate(subcategory_ids)}
+        start, end = (d.isoformat() for d in academic_year_window(academic_year, calculation_date))
+
+        # Flatten the submissions into columns; this is the only per-row Python loop
+        n = len(submissions)
+        s_idx = np.empty(n, dtype=np.int64)
+        c_idx = np.empty(n, dtype=np.int64)
+        attended = np.empty(n, dtype=bool)
+        value = np.empty(n, dtype=float)
+        day_no = np.zeros(n, dtype=np.int64)
+        events = set()
+        k = 0
+        for r in submissions:
+            i = student_index.get(r.get('student_id'))
+            c = sub_index.get(r.get('subcategory_id'))
+            submitted = (r.get('submitted_at') or '')[:10]
+            if i is None or c is None or not (start <= submitted <= end):
+                continue
+            data = r.get('submission_data') or {}
+            status = data.get('status')
+            kind = kinds[c]
+            s_idx[k], c_idx[k] = i, c
+            attended[k] = status is None or status in ATTENDED_STATUSES
+            value[k] = _value(data, VALUE_KEYS[kind], r.get('points_granted')) if kind in VALUE_KEYS else 0.0
+            if kind == 'hours':
+                day_no[k] = date.fromisoformat(submitted).toordinal()
+            if kind == 'gbe' and r.get('event_id') is not None:
+                events.add((subcategory_ids[c], str(r['event_id'])))
+            k += 1
+        s_idx, c_idx, attended, value, day_no = s_idx[:k], c_idx[:k], attended[:k], value[:k], day_no[:k]
+        logger.info(f"Aggregating {k} approved submissions for {n_students} students x {n_subs} subcategories")
+
+        # Daily cap: a student's community service hours on one day count up to 8 together,
+        # so each submission of the day is scaled by capped / total
+        hours = np.nonzero(kinds[c_idx] == 'hours')[0]
+        if hours.size:
+            _, group = np.unique(
+                np.stack([s_idx[hours], c_idx[hours], day_no[hours]]), axis=1, return_inverse=True
+            )
+            group = group.ravel()
+            daily = np.bincount(group, weights=value[hours])
+            scale = np.where(daily > DAILY_HOURS_CAP, DAILY_HOURS_CAP / np.maximum(daily, DAILY_HOURS_CAP), 1.0)
+            value[hours] *= scale[group]
+
+        key = s_idx * n_subs + c_idx
+        size = n_students * n_subs
+        return {
+            'count': np.bincount(key, minlength=size).reshape(n_students, n_subs),
+            'attended': np.bincount(key, weights=attended, minlength=size).reshape(n_students, n_subs),
+            'value': np.bincount(key, weights=value, minlength=size).reshape(n_students, n_subs),
+            'events': events,
+        }
+
+    @staticmethod
+    def finalize(
+        kinds: np.ndarray, count: np.ndarray, attended_sum: np.ndarray, value_sum: np.ndarray, held: np.ndarray
+    ) -> np.ndarray:
+        """Scores from accumulated sums; `held` is the number of distinct events per subcategory."""
+        safe_count = np.maximum(count, 1)
+        ratio = np.where(count > 0, attended_sum / safe_count * 100.0, 0.0)
+        average = np.where(count > 0, value_sum / safe_count * RATING_SCALE, 0.0)
+        gbe = np.clip(attended_sum / np.maximum(held, 1.0) * 100.0 + value_sum, 0.0, 100.0)
+
+        score = np.select(
+            [np.isin(kinds, ('attendance', 'monthly')), kinds == 'hours', kinds == 'points', kinds == 'rating', kinds == 'gbe'],
+            [ratio, np.minimum(value_sum, ANNUAL_HOURS_CAP), value_sum, average, gbe],
+        )
+        return np.round(score, 2)
+
+    def compute_and_write(
+        self,
+        academic_year: int,
+        calculation_date: date,
+        student_ids: Optional[Iterable[str]] = None,
+        changes_only: bool = False,
+    ) -> Dict[str, Any]:
+        """Compute the day's raw scores and upsert them on (student, subcategory, day).
+
+        Only `score` and `data_points_count` are written, so a stored
+        `normalized_score` is kept until the next normalization. With `changes_only`
+        (whole population only) rows equal to the stored ones are not sent, and a new
+        day starts as a server-side copy of the previous day, normalized scores included.
+        """
+        table = 'student_subcategory_scores'
+        rows = self.compute(academic_year, calculation_date, student_ids=student_ids)
+        if changes_only and student_ids is None:
+            counts = ChangeOnlyWriter(self.writer).upsert_day(
+                table, rows, calculation_date.isoformat(), NATURAL_KEYS[table], carry_columns=('normalized_score',),
+            )
+        else:
+            counts = {'rows_written': self.writer.upsert(table, rows, on_conflict=NATURAL_KEYS[table])}
+        return {
+            'students_scored': len({r['student_id'] for r in rows}),
+            'subcategories_scored': len({r['subcategory_id'] for r in rows}),
+            'rows_upserted': counts['rows_written'],
+            **{name: value for name, value in counts.items() if name != 'rows_written'},
+        }
@@ -0,0 +1,190 @@
+"""
+apex_scoring.scoring_config
+
+The scoring configuration of a run, compiled once.
+
+Weights come from `subcategories.weight` and `categories.weight`. Which
+subcategories stay out of category averages, and which are GPA subcategories
+(normalized score = raw score, no curve), are versioned rows of
+`scoring_configs`: the highest version applies, and the built-in defaults below
+apply when the table has no rows (or does not exist yet). A change is a new row,
+not a code edit.
+
+`ScoringConfig` compiles all of it into index maps and a subcategory x category
+weight matrix, so a day's category scores and holistic GPAs are a few matrix
+products over a students x subcategories score array:
+
+    scores = config.score_matrix(student_codes, subcategory_codes, n_students, values)
+    categories = config.category_scores(scores)     # students x categories
+    holistic = config.holistic_gpas(categories)     # students
+"""
+
+import hashlib
+import json
+import logging
+from typing import Any, Dict, Iterable, Optional, Sequence
+
+import numpy as np
+
+from apex_scoring.db import DEFAULT_PAGE_SIZE, paged_select
+from apex_scoring.storage import StorageBackend, as_storage
+
+logger = logging.getLogger(__name__)
+
+SCORING_CONFIG_TABLE = 'scoring_configs'
+
+# Kept out of category averages until a scoring_configs row says otherwise
+DEFAULT_EXCLUDED_SUBCATEGORY_IDS = frozenset({
+    '865e0e15-c14d-4b23-abd2-5f1b6ccf5dbc',  # chapel team participation (spiritual)
+    'a3bab151-0ce1-402f-b507-7d6c3489bc8c',  # promotions (professional)
+    'efdbc642-a52d-4872-ada5-2687fc03be73',  # credentials (professional)
+    '221c3ba8-42e5-4f4f-a553-ba3134b6d433',  # fellow friday team (professional)
+})
+
+# GPA subcategories: their raw score is already a GPA, so it is not curved
+DEFAULT_GPA_SUBCATEGORY_IDS = frozenset({
+    'f50830fe-b820-4223-89e2-e69241b459af',
+    '8d13f1b9-33e1-4a62-be45-488a6834112f',
+    'd1d972a4-2484-4b9a-a53c-0b63bb2e952c',
+})
+
+
+def _weight(value: Any) -> float:
+    """A weight column value; missing, zero or unparsable weights count as 1.0."""
+    try:
+        return float(value or 1.0)
+    except (TypeError, ValueError):
+        return 1.0
+
+
+def latest_config_row(storage: StorageBackend) -> Optional[Dict[str, Any]]:
+    """The highest-version `scoring_configs` row, or None when there is none (or no table)."""
+    storage = as_storage(storage)
+    if not storage.has_table(SCORING_CONFIG_TABLE):
+        logger.warning(f"Table {SCORING_CONFIG_TABLE} not found; using the default scoring config")
+        return None
+    rows = storage.select(SCORING_CONFIG_TABLE, '*', order='version', desc=True, limit=1)
+    return rows[0] if rows else None
+
+
+class ScoringConfig:
+    """
+    Subcategory/category structure and weights of a run, compiled into arrays.
+
+    Subcategories are the matrix rows in `subcategory_ids` order and categories
+    the columns in `category_ids` order (both sorted). Excluded subcategories are
+    not rows at all. `weight_matrix[s, c]` is subcategory s's weight when it
+    belongs to category c and 0 otherwise; every row has at most one nonzero, and
+    the sparse form is kept as `subcategory_category` (column per row, -1 for none)
+    and `subcategory_weights`.
+    """
+
+    def __init__(
+        self,
+        subcategory_rows: Iterable[Dict[str, Any]],
+        category_rows: Iterable[Dict[str, Any]],
+        version: int = 0,
+        excluded_subcategory_ids: Iterable[str] = DEFAULT_EXCLUDED_SUBCATEGORY_IDS,
+        gpa_subcategory_ids: Iterable[str] = DEFAULT_GPA_SUBCATEGORY_IDS,
+    ) -> None:
+        self.version = version
+        self.excluded_subcategory_ids = frozenset(excluded_subcategory_ids)
+        self.gpa_subcategory_ids = frozenset(gpa_subcategory_ids)
+        included = [r for r in subcategory_rows if r['id'] not in self.excluded_subcategory_ids]
+        self.cat_by_sub: Dict[str, Optional[str]] = {r['id']: r.get('category_id') for r in included}
+        self.weight_by_sub: Dict[str, float] = {r['id']: _weight(r.get('weight')) for r in included}
+        self.category_weights: Dict[str, float] = {r['id']: _weight(r.get('weight')) for r in category_rows}
+
+        self.subcategory_ids = np.array(sorted(self.cat_by_sub), dtype=object)
+        self.subcategory_index = {sid: i for i, sid in enumerate(self.subcategory_ids)}
+        self.category_ids = np.array(sorted({c for c in self.cat_by_sub.values() if c}), dtype=object)
+        self.category_index = {cid: i for i, cid in enumerate(self.category_ids)}
+
+        self.subcategory_category = np.array(
+            [self.category_index.get(self.cat_by_sub[sid] or '', -1) for sid in self.subcategory_ids], dtype=np.int64,
+        )
+        self.subcategory_weights = np.array([self.weight_by_sub[sid] for sid in self.subcategory_ids], dtype=float)
+        rows = np.flatnonzero(self.subcategory_category >= 0)
+        self.weight_matrix = np.zeros((self.subcategory_ids.size, self.category_ids.size))
+        self.weight_matrix[rows, self.subcategory_category[rows]] = self.subcategory_weights[rows]
+        self.membership = np.zeros_like(self.weight_matrix)
+        self.membership[rows, self.subcategory_category[rows]] = 1.0
+        self.category_weight_vector = np.array(
+            [self.category_weights.get(cid, 1.0) for cid in self.category_ids], dtype=float,
+        )
+
+    @classmethod
+    def from_rows(
+        cls,
+        subcategory_rows: Iterable[Dict[str, Any]],
+        category_rows: Iterable[Dict[str, Any]],
+        config_row: Optional[Dict[str, Any]] = None,
+    ) -> 'ScoringConfig':
+        """Compile from subcategory and category rows and a `scoring_configs` row (None: defaults)."""
+        row = config_row or {}
+        excluded = row.get('excluded_subcategory_ids')
+        gpa = row.get('gpa_subcategory_ids')
+        return cls(
+            subcategory_rows, category_rows, version=int(row.get('version') or 0),
+            excluded_subcategory_ids=DEFAULT_EXCLUDED_SUBCATEGORY_IDS if excluded is None else excluded,
+            gpa_subcategory_ids=DEFAULT_GPA_SUBCATEGORY_IDS if gpa is None else gpa,
+        )
+
+    @classmethod
+    def load(cls, storage: StorageBackend, page_size: int = DEFAULT_PAGE_SIZE) -> 'ScoringConfig':
+        """Read the subcategories, categories and latest `scoring_configs` row and compile them."""
+        storage = as_storage(storage)
+        config = cls.from_rows(
+            paged_select(storage, 'subcategories', 'id, category_id, weight', page_size=page_size),
+            paged_select(storage, 'categories', 'id, weight', page_size=page_size),
+            latest_config_row(storage),
+        )
+        logger.info(f"Scoring config version {config.version} ({config.fingerprint}): "
+                    f"{config.subcategory_ids.size} subcategories in {config.category_ids.size} categories")
+        return config
+
+    @property
+    def fingerprint(self) -> str:
+        """Short hash of everything the config compiles, weights included, for telling runs apart."""
+        content = json.dumps({
+            'excluded': sorted(self.excluded_subcategory_ids),
+            'gpa': sorted(self.gpa_subcategory_ids),
+            'subcategories': {sid: [self.cat_by_sub[sid], self.weight_by_sub[sid]] for sid in sorted(self.cat_by_sub)},
+            'categories': self.category_weights,
+        }, sort_keys=True)
+        return hashlib.sha1(content.encode()).hexdigest()[:12]
+
+    # ---------- Matrix engine ----------
+    def subcategory_codes(self, subcategory_ids: Sequence[str]) -> np.ndarray:
+        """Matrix row of each subcategory id; -1 for ids that are excluded or unknown."""
+        keys, inverse = np.unique(np.asarray(subcategory_ids, dtype=object).astype(str), return_inverse=True)
+        codes = np.array([self.subcategory_index.get(key, -1) for key in keys.tolist()], dtype=np.int64)
+        return codes[inverse].reshape(-1)
+
+    def score_matrix(
+        self, student_codes: np.ndarray, subcategory_codes: np.ndarray, n_students: int, values: np.ndarray,
+    ) -> np.ndarray:
+        """Students x subcategories array of `values` (NaN where a student has no score)."""
+        matrix = np.full((n_students, self.subcategory_ids.size), np.nan)
+        matrix[student_codes, subcategory_codes] = values
+        return matrix
+
+    def category_scores(self, scores: np.ndarray) -> np.ndarray:
+        """Weighted average of each student's scores per category, ignoring NaN; NaN where none count."""
+        present = ~np.isnan(scores)
+        numerator = np.where(present, scores, 0.0) @ self.weight_matrix
+        denominator = present @ self.weight_matrix
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(denominator > 0, numerator / denominator, np.nan)
+
+    def subcategory_counts(self, held: np.ndarray) -> np.ndarray:
+        """Number of subcategories per (student, category) from a students x subcategories boolean array."""
+        return (held @ self.membership).astype(np.int64)
+
+    def holistic_gpas(self, category_scores: np.ndarray) -> np.ndarray:
+        """Category-weighted average of each student's normalized category scores; NaN where none."""
+        present = ~np.isnan(category_scores)
+        numerator = np.where(present, category_scores, 0.0) @ self.category_weight_vector
+        denominator = present @ self.category_weight_vector
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(denominator > 0, numerator / denominator, np.nan)
@@ -0,0 +1,187 @@
+"""
+apex_scoring.shadow
+
+Shadow (compute-only) runs of the daily pipeline against production data.
+
+`ShadowStorage` wraps the production backend and a local SQLite sink. Reads go
+to production and every write goes to the sink. The first time a run writes to
+a table for a calculation day, the sink gets a copy of production's rows for
+that table and day. From then on, reads of that day (filtered on
+`calculation_date`) are answered by the sink, so later phases see the run's own
+writes exactly as they would in production. Nothing is ever written upstream.
+
+`diff_day` compares the sink's score tables for the day with what production
+has stored, row by row on each table's natural key. `export_parquet` writes the
+sink's day to Parquet with the score archive layout.
+"""
+
+import logging
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from apex_scoring.archive import SCORE_TABLES, ScoreArchive
+from apex_scoring.changes import DEFAULT_ATOL, values_equal
+from apex_scoring.db import DAY_KEY, DEFAULT_PAGE_SIZE, NATURAL_KEYS, iter_row_pages, paged_select
+from apex_scoring.storage import SQLiteStorage, StorageBackend, as_storage
+
+logger = logging.getLogger(__name__)
+
+# Columns that differ between any two writes of the same row
+IGNORED_COLUMNS = frozenset({'id', 'updated_at', 'created_at'})
+
+# Mismatched natural keys listed per table in a diff
+SAMPLE_KEYS = 5
+
+# (table, calculation_date) the sink holds; calculation_date None: the whole table
+_Shadowed = Tuple[str, Optional[str]]
+
+
+def _day(value: Any) -> str:
+    return str(value)[:10]
+
+
+class ShadowStorage(StorageBackend):
+    """`StorageBackend` that reads from `source` and writes only to the SQLite `sink`."""
+
+    def __init__(self, source: StorageBackend, sink: SQLiteStorage, page_size: int = DEFAULT_PAGE_SIZE) -> None:
+        self.source = as_storage(source)
+        self.sink = sink
+        self.page_size = page_size
+        self._shadowed: Set[_Shadowed] = set()
+        self._lock = threading.Lock()
+
+    @property
+    def shadowed(self) -> Set[_Shadowed]:
+        """(table, calculation_date) pairs written by this run, so served from the sink."""
+        with self._lock:
+            return set(self._shadowed)
+
+    def _reads_sink(self, table: str, eq: Optional[Dict[str, Any]]) -> bool:
+        day = (eq or {}).get('calculation_date')
+        with self._lock:
+            return (table, None) in self._shadowed or (day is not None and (table, _day(day)) in self._shadowed)
+
+    def _shadow(self, table: str, days: Iterable[Optional[str]]) -> None:
+        """Copy production's rows of `table` for each of `days` into the sink, once per run."""
+        with self._lock:
+            for day in set(days):
+                if (table, day) in self._shadowed:
+                    continue
+                columns = ', '.join(self.sink._columns(table))
+                eq = {'calculation_date': day} if day is not None else None
+                # A sink reused from an earlier shadow run starts again from production's rows
+                if day is not None:
+                    self.sink.delete(table, eq)
+                copied = 0
+                for page in iter_row_pages(self.source, table, columns, eq=eq, page_size=self.page_size):
+                    copied += self.sink.upsert(table, page)
+                logger.info(f"Shadowing {table} for {day or 'all days'}: copied {copied} production rows to the sink")
+                self._shadowed.add((table, day))
+
+    def _shadow_rows(self, table: str, rows: List[Dict[str, Any]]) -> None:
+        if 'calculation_date' in self.sink._columns(table):
+            self._shadow(table, {_day(r['calculation_date']) for r in rows if r.get('calculation_date')})
+        else:
+            self._shadow(table, [None])
+
+    def select(self, table, columns='*', eq=None, in_=None, gt=None, after=None, order=None, desc=False, limit=None, offset=None):
+        backend = self.sink if self._reads_sink(table, eq) else self.source
+        return backend.select(table, columns, eq=eq, in_=in_, gt=gt, after=after, order=order, desc=desc, limit=limit, offset=offset)
+
+    def upsert(self, table, rows, on_conflict=None):
+        rows = list(rows)
+        self._shadow_rows(table, rows)
+        return self.sink.upsert(table, rows, on_conflict=on_conflict)
+
+    def bulk_update(self, table, rows, key='id'):
+        rows = list(rows)
+        self._shadow_rows(table, rows)
+        return self.sink.bulk_update(table, rows, key=key)
+
+    def delete(self, table, eq=None, in_=None):
+        day = (eq or {}).get('calculation_date')
+        self._shadow(table, [_day(day) if day is not None else None])
+        self.sink.delete(table, eq, in_=in_)
+
+    def has_table(self, table):
+        # Skip what the production run would skip, though the sink has every table
+        return self.source.has_table(table)
+
+    def rpc(self, function, params=None):
+        # Database functions may write to production; a shadow run only uses the in-process phases
+        raise RuntimeError(f"Shadow runs cannot call database functions ({function})")
+
+
+def diff_table(
+    expected: List[Dict[str, Any]], actual: List[Dict[str, Any]], key: Iterable[str], atol: float = DEFAULT_ATOL,
+) -> Dict[str, Any]:
+    """Row-level differences of `actual` against `expected`, matched on the `key` columns.
+
+    Counts rows missing from `actual`, extra rows in `actual` and rows whose other
+    shared columns differ, with changed rows per column and, for numeric columns, the
+    largest absolute difference.
+    """
+    key = tuple(key)
+    expected_by_key = {tuple(_day(r[k]) if k == 'calculation_date' else r[k] for k in key): r for r in expected}
+    actual_by_key = {tuple(_day(r[k]) if k == 'calculation_date' else r[k] for k in key): r for r in actual}
+    missing = [k for k in expected_by_key if k not in actual_by_key]
+    extra = [k for k in actual_by_key if k not in expected_by_key]
+    changed: List[Tuple[Any, ...]] = []
+    columns: Dict[str, Dict[str, Any]] = {}
+    for k, want in expected_by_key.items():
+        got = actual_by_key.get(k)
+        if got is None:
+            continue
+        row_changed = False
+        for column in (want.keys() & got.keys()) - IGNORED_COLUMNS - set(key):
+            a, b = want.get(column), got.get(column)
+            if values_equal(a, b, atol):
+                continue
+            row_changed = True
+            stats = columns.setdefault(column, {'rows': 0})
+            stats['rows'] += 1
+            if isinstance(a, (int, float)) and isinstance(b, (int, float)) and not isinstance(a, bool):
+                stats['max_abs_delta'] = max(stats.get('max_abs_delta', 0.0), abs(float(a) - float(b)))
+        if row_changed:
+            changed.append(k)
+    return {
+        'expected_rows': len(expected_by_key),
+        'actual_rows': len(actual_by_key),
+        'missing_rows': len(missing),
+        'extra_rows': len(extra),
+        'changed_rows': len(changed),
+        'changed_columns': columns,
+        'sample_keys': {
+            'missing': missing[:SAMPLE_KEYS], 'extra': extra[:SAMPLE_KEYS], 'changed': changed[:SAMPLE_KEYS],
+        },
+    }
+
+
+def diff_day(
+    source: StorageBackend,
+    sink: StorageBackend,
+    calculation_date: str,
+    tables: Iterable[str] = SCORE_TABLES,
+    atol: float = DEFAULT_ATOL,
+    page_size: int = DEFAULT_PAGE_SIZE,
+) -> Dict[str, Dict[str, Any]]:
+    """Diff each score table's `calculation_date` rows in `sink` against those stored in `source`."""
+    source = as_storage(source)
+    summary: Dict[str, Dict[str, Any]] = {}
+    for table in tables:
+        def load(storage: StorageBackend) -> List[Dict[str, Any]]:
+            return paged_select(storage, table, '*', eq={'calculation_date': calculation_date}, key=DAY_KEY, page_size=page_size)
+
+        diff = diff_table(load(source), load(sink), NATURAL_KEYS[table].split(','), atol=atol)
+        logger.info(f"Shadow diff of {table} for {calculation_date}: {diff['changed_rows']} changed, "
+                    f"{diff['missing_rows']} missing, {diff['extra_rows']} extra of {diff['expected_rows']} rows")
+        summary[table] = diff
+    return summary
+
+
+def export_parquet(
+    sink: StorageBackend, root: str, calculation_date: str, tables: Iterable[str] = SCORE_TABLES,
+) -> Dict[str, int]:
+    """Write the sink's `calculation_date` rows of `tables` to Parquet under `root`. Returns rows per table."""
+    archive = ScoreArchive(sink, root)
+    return {table: archive.export_day(table, calculation_date) for table in tables}
@@ -0,0 +1,402 @@
+"""
+apex_scoring.sharding
+
+Sharded (map/reduce) execution of the daily pipeline.
+
+One daily run is bounded by a single core and, on Lambda, a single timeout.
+`ShardedDailyRun` splits the day into shards that run through a `ShardExecutor`
+and merges what they return:
+
+1. Raw scores (optional), sharded by student-id hash. Each shard reads only its
+   students' submissions and returns the per (student, subcategory) sums from
+   `RawScoreEngine.accumulate` plus the GBE events it saw. The reducer unions the
+   events into the events-held denominator, finalizes the scores and upserts them.
+2. Normalization, sharded by subcategory. A subcategory's curve only needs its own
+   rows, so each shard curves and writes its subcategories completely.
+3. Student category scores and holistic GPAs, sharded by student-id hash. Each
+   shard writes its students' rows and returns per (company, subcategory) partial
+   sums (`CompanyScoreCalculator.company_subcategory_partials`) and, with a
+   `sketch_k`, a score sketch per cohort of its rows.
+4. Company scores, in the reducer: the partials are merged into company
+   subcategory means and rolled up to categories and holistic GPAs. Shard
+   sketches are merged per cohort and stored (`SketchStore.write`).
+5. Rank indexes, in the reducer, from the holistic rows every shard wrote.
+
+Student shards are assigned with CRC32 of the id, so a student always lands in
+the same shard. `LocalShardExecutor` runs shards on worker processes; an executor
+that invokes one Lambda per shard only has to implement `ShardExecutor.map`.
+Writes are upserts on the natural keys, so a failed run can simply be repeated;
+with `resume`, the repeat skips the phases and shards the run journal has as done.
+"""
+
+import logging
+import multiprocessing
+import time
+import zlib
+from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from apex_scoring.aggregators import NORMALIZE_UNIT, SubcategoryAggregator
+from apex_scoring.backfill import DEFAULT_PROCESSES, StorageFactory, _init_worker, _run_in_worker
+from apex_scoring.company_scores import (
+    STUDENT_SCORE_COLUMNS,
+    CompanyScoreCalculator,
+    StudentCategoryHolisticCalculator,
+)
+from apex_scoring.concurrency import TaskPool
+from apex_scoring.db import BulkWriter, DAY_KEY, DEFAULT_PAGE_SIZE, NATURAL_KEYS, paged_select, rows_to_columns
+from apex_scoring.journal import RunJournal
+from apex_scoring.leaderboards import RANK_UNIT, RankIndexBuilder
+from apex_scoring.raw_scores import (
+    AGGREGATION_KINDS,
+    SCORED_KINDS,
+    STUDENT_FILTER_CHUNK,
+    RawScoreEngine,
+    events_held,
+)
+from apex_scoring.sketches import SketchStore, cohort_sketches, merge_cohort_sketches
+from apex_scoring.storage import StorageBackend, as_storage
+
+logger = logging.getLogger(__name__)
+
+# Journal phase of per-shard student score units (shard = '<index>/<shards>')
+STUDENT_SHARD_UNIT = 'student_scores'
+
+
+def shard_of(key: str, shards: int) -> int:
+    """Shard of `key` among `shards`, stable across processes and runs."""
+    return zlib.crc32(key.encode()) % shards
+
+
+def split_by_hash(keys: Sequence[str], shards: int) -> List[List[str]]:
+    """`keys` grouped by `shard_of`; empty shards are dropped."""
+    groups: List[List[str]] = [[] for _ in range(shards)]
+    for key in keys:
+        groups[shard_of(key, shards)].append(key)
+    return [g for g in groups if g]
+
+
+class ShardExecutor(ABC):
+    """
+    Runs a shard task once per argument tuple and returns the results in order.
+
+    A task is a module-level function called as `task(storage, *args)` with the
+    executor's storage; its arguments and result must be picklable.
+    """
+
+    @abstractmethod
+    def map(self, task: Callable[..., Any], args: Sequence[Tuple]) -> List[Any]:
+        """`[task(storage, *a) for a in args]`, run wherever the executor runs shards."""
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self) -> 'ShardExecutor':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class LocalShardExecutor(ShardExecutor):
+    """
+    Runs shards on up to `processes` local worker processes.
+
+    Workers are started with `spawn` and open their own storage through
+    `open_storage`; the pool is kept for every phase of a run and shut down by
+    `close`. With one process, shards run inline on a single storage.
+    """
+
+    def __init__(self, open_storage: StorageFactory, processes: int = DEFAULT_PROCESSES) -> None:
+        if processes <= 0:
+            raise ValueError("processes must be positive")
+        self.open_storage = open_storage
+        self.processes = processes
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._storage: Optional[StorageBackend] = None
+
+    def map(self, task: Callable[..., Any], args: Sequence[Tuple]) -> List[Any]:
+        if self.processes == 1 or len(args) <= 1:
+            if self._storage is None:
+                self._storage = self.open_storage()
+            return [task(self._storage, *a) for a in args]
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.processes,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(self.open_storage,),
+            )
+        return list(self._pool.map(_run_in_worker, [task] * len(args), args))
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+
+# ---------- Shard tasks ----------
+def raw_score_shard(
+    storage: StorageBackend,
+    academic_year: int,
+    calculation_date: date,
+    student_ids: List[str],
+    subcategory_ids: List[str],
+    kinds: List[str],
+    page_size: int = DEFAULT_PAGE_SIZE,
+) -> Dict[str, Any]:
+    """Accumulated submission sums of `student_ids` (see `RawScoreEngine.accumulate`)."""
+    engine = RawScoreEngine(storage, page_size=page_size)
+    submissions = engine.load_submissions(academic_year, calculation_date, student_ids=student_ids)
+    partial = engine.accumulate(
+        submissions, student_ids, subcategory_ids, np.array(kinds), academic_year, calculation_date
+    )
+    partial['students'] = student_ids
+    return partial
+
+
+def normalize_shard(
+    storage: StorageBackend,
+    calculation_date: str,
+    subcategory_ids: List[str],
+    write_chunk_size: int = BulkWriter.DEFAULT_CHUNK_SIZE,
+    page_size: int = DEFAULT_PAGE_SIZE,
+    resume: bool = False,
+) -> Dict[str, dict]:
+    """Curve and write `subcategory_ids` for `calculation_date`; results by subcategory id.
+
+    With `resume`, subcategories the run journal has as normalized are skipped and
+    each newly normalized one is recorded.
+    """
+    aggregator = SubcategoryAggregator(
+        storage, write_chunk_size=write_chunk_size, pool=TaskPool(max_workers=1), page_size=page_size,
+    )
+    journal = RunJournal(storage, calculation_date) if resume else None
+    results: Dict[str, dict] = {}
+    for sid in subcategory_ids:
+        entry = journal.get(NORMALIZE_UNIT, sid) if journal is not None else None
+        if entry is not None:
+            results[sid] = {**entry['details'], 'rows_written': 0, 'resumed': True}
+            continue
+        results[sid] = aggregator.normalize_subcategory_for_day(sid, calculation_date)
+        if journal is not None:
+            journal.record(NORMALIZE_UNIT, sid, rows_written=results[sid].get('rows_written', 0), details={
+                k: v for k, v in results[sid].items() if k in ('normalized', 'reason', 'count')
+            })
+    return results
+
+
+def student_score_shard(
+    storage: StorageBackend,
+    calculation_date: str,
+    company_by_student: Dict[str, str],
+    write_chunk_size: int = BulkWriter.DEFAULT_CHUNK_SIZE,
+    page_size: int = DEFAULT_PAGE_SIZE,
+    journal_shard: Optional[str] = None,
+    sketch_k: Optional[int] = None,
+) -> Dict[str, Any]:
+    """Write the category scores and holistic GPAs of one shard of students.
+
+    `company_by_student` holds every student of the shard (company id or None).
+    Returns the row counts and the shard's company subcategory partials, plus its
+    cohort score sketches with a `sketch_k`. With a `journal_shard`, the shard is
+    recorded in the run journal once written, and a shard already recorded only
+    recomputes its partials (and sketches) for the reducer.
+    """
+    journal = RunJournal(storage, calculation_date) if journal_shard is not None else None
+    student_ids = list(company_by_student)
+    rows: List[Dict[str, Any]] = []
+    for i in range(0, len(student_ids), STUDENT_FILTER_CHUNK):
+        rows.extend(paged_select(
+            storage, 'student_subcategory_scores', ', '.join(STUDENT_SCORE_COLUMNS),
+            eq={'calculation_date': calculation_date}, in_={'student_id': student_ids[i:i + STUDENT_FILTER_CHUNK]},
+            key=DAY_KEY, page_size=page_size,
+        ))
+    scores = rows_to_columns(rows, STUDENT_SCORE_COLUMNS)
+    companies = {sid: cid for sid, cid in company_by_student.items() if cid}
+    partials = CompanyScoreCalculator.company_subcategory_partials(scores, companies)
+    sketches = cohort_sketches(scores, sketch_k) if sketch_k else {}
+    if journal is not None and journal.done(STUDENT_SHARD_UNIT, journal_shard):
+        return {'student_category_rows_upserted': 0, 'student_holistic_rows_upserted': 0,
+                'company_partials': partials, 'score_sketches': sketches, 'resumed': True}
+
+    students = StudentCategoryHolisticCalculator(storage, write_chunk_size=write_chunk_size, page_size=page_size)
+    category_payloads, holistic_payloads = students._student_score_payloads(
+        scores, set(student_ids), students._load_config(), calculation_date,
+    )
+    outcome = {
+        'student_category_rows_upserted': students.writer.upsert(
+            'student_category_scores', category_payloads, on_conflict=NATURAL_KEYS['student_category_scores']
+        ),
+        'student_holistic_rows_upserted': students.writer.upsert(
+            'student_holistic_gpa', holistic_payloads, on_conflict=NATURAL_KEYS['student_holistic_gpa']
+        ),
+    }
+    if journal is not None:
+        journal.record(STUDENT_SHARD_UNIT, journal_shard, rows_written=sum(outcome.values()), details=outcome)
+    return {**outcome, 'company_partials': partials, 'score_sketches': sketches}
+
+
+# ---------- Reducer ----------
+class ShardedDailyRun:
+    """
+    Runs one day's pipeline as map tasks on `executor` and reduces in this process.
+
+    `storage` is the reducer's own connection; `shards` defaults to one per
+    executor process. A run with `resume` records its phases, subcategories and
+    student shards in the run journal and skips the ones already recorded for the
+    day; a student shard is keyed by its index and the shard count. With
+    `sketch_k`, the student phase also stores the day's cohort score sketches.
+    """
+
+    def __init__(
+        self,
+        storage: StorageBackend,
+        executor: ShardExecutor,
+        shards: Optional[int] = None,
+        write_chunk_size: int = BulkWriter.DEFAULT_CHUNK_SIZE,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        sketch_k: Optional[int] = None,
+    ) -> None:
+        self.storage = as_storage(storage)
+        self.executor = executor
+        self.sketch_k = sketch_k
+        self.shards = shards or getattr(executor, 'processes', None) or DEFAULT_PROCESSES
+        if self.shards <= 0:
+            raise ValueError("shards must be positive")
+        self.writer = BulkWriter(self.storage, chunk_size=write_chunk_size)
+        self.write_chunk_size = write_chunk_size
+        self.page_size = page_size
+        self.journal: Optional[RunJournal] = None
+
+    def run(
+        self, academic_year: int, calculation_date: date, calculate_raw_scores: bool = False, resume: bool = False,
+    ) -> Dict[str, Any]:
+        """Score `calculation_date`; returns a summary per phase."""
+        started = time.perf_counter()
+        day = calculation_date.isoformat()
+        logger.info(f"Sharded run for {day} with {self.shards} shards (raw scores: {calculate_raw_scores})")
+        self.journal = RunJournal(self.storage, day) if resume else None
+        phases: List[Dict[str, Any]] = []
+
+        def timed(name: str, unit: str, run: Callable[[], Dict[str, Any]]) -> None:
+            entry = self.journal.get(unit) if self.journal is not None else None
+            if entry is not None:
+                phases.append({'phase': name, **entry['details'], 'status': 'skipped', 'seconds': 0.0})
+                logger.info(f"Skipping {name}: completed at {entry['completed_at']} by an earlier run")
+                return
+            phase_started = time.perf_counter()
+            summary = run()
+            phases.append({'phase': name, **summary, 'seconds': round(time.perf_counter() - phase_started, 3)})
+            logger.info(f"{name}: {phases[-1]}")
+            if self.journal is not None:
+                self.journal.record(unit, rows_written=summary.get('rows_written', summary.get('rows_upserted', 0)),
+                                    details=summary)
+
+        if calculate_raw_scores:
+            timed('Calculate Raw Subcategory Scores (sharded)', 'raw_scores',
+                  lambda: self.raw_scores(academic_year, calculation_date))
+        timed('Normalize Subcategory Scores (sharded)', NORMALIZE_UNIT, lambda: self.normalize(day))
+        timed('Student and Company Scores (sharded)', 'company_scores', lambda: self.student_and_company_scores(day))
+        timed('Build Rank Indexes', RANK_UNIT, lambda: self.rank_indexes(day))
+        return {
+            'academic_year': academic_year,
+            'calculation_date': day,
+            'shards': self.shards,
+            'phases': phases,
+            'total_execution_time': round(time.perf_counter() - started, 3),
+        }
+
+    def raw_scores(self, academic_year: int, calculation_date: date) -> Dict[str, Any]:
+        """Map: per-shard submission sums. Reduce: events held over all shards, final scores, upserts."""
+        students = sorted(r['id'] for r in paged_select(
+            self.storage, 'students', 'id', eq={'academic_year_start': academic_year}, page_size=self.page_size
+        ))
+        all_subcategories = paged_select(self.storage, 'subcategories', 'id, name', page_size=self.page_size)
+        subcategories = [r for r in all_subcategories if AGGREGATION_KINDS.get(r['name']) in SCORED_KINDS]
+        if not students or not subcategories:
+            logger.warning(f"No students or submission-based subcategories for academic year {academic_year}")
+            return {'shards': 0, 'rows_upserted': 0}
+        subcategory_ids = [r['id'] for r in subcategories]
+        kinds = [AGGREGATION_KINDS[r['name']] for r in subcategories]
+
+        student_shards = split_by_hash(students, self.shards)
+        partials = self.executor.map(raw_score_shard, [
+            (academic_year, calculation_date, shard, subcategory_ids, kinds, self.page_size) for shard in student_shards
+        ])
+        held = events_held(set().union(*(p['events'] for p in partials)), subcategory_ids)
+        rows: List[Dict[str, Any]] = []
+        for p in partials:
+            score = RawScoreEngine.finalize(np.array(kinds), p['count'], p['attended'], p['value'], held)
+            rows.extend(RawScoreEngine.score_rows(
+                p['students'], subcategory_ids, score, p['count'], academic_year, calculation_date,
+            ))
+        rows.extend(RawScoreEngine(self.storage, page_size=self.page_size).grade_rows(
+            academic_year, calculation_date, students, all_subcategories,
+        ))
+        written = self.writer.upsert(
+            'student_subcategory_scores', rows, on_conflict=NATURAL_KEYS['student_subcategory_scores']
+        )
+        return {'shards': len(student_shards), 'students_scored': len(students), 'rows_upserted': written}
+
+    def normalize(self, calculation_date: str) -> Dict[str, Any]:
+        """Map only: every shard curves and writes whole subcategories."""
+        subcategory_ids = sorted(r['id'] for r in paged_select(
+            self.storage, 'subcategories', 'id', page_size=self.page_size
+        ))
+        # Round-robin over a handful of subcategories balances better than hashing
+        sub_shards = [s for s in (subcategory_ids[i::self.shards] for i in range(self.shards)) if s]
+        results: Dict[str, dict] = {}
+        for shard_results in self.executor.map(normalize_shard, [
+            (calculation_date, shard, self.write_chunk_size, self.page_size, self.journal is not None)
+            for shard in sub_shards
+        ]):
+            results.update(shard_results)
+        return {
+            'shards': len(sub_shards),
+            'subcategories_processed': len(results),
+            'rows_written': sum(r.get('rows_written', 0) for r in results.values()),
+        }
+
+    def student_and_company_scores(self, calculation_date: str) -> Dict[str, Any]:
+        """Map: student rows and company partials per student shard. Reduce: company rollups and upserts."""
+        company_by_student = {
+            r['id']: r.get('company_id')
+            for r in paged_select(self.storage, 'students', 'id, company_id', page_size=self.page_size)
+        }
+        student_shards = split_by_hash(sorted(company_by_student), self.shards)
+        outcomes = self.executor.map(student_score_shard, [
+            (calculation_date, {sid: company_by_student[sid] for sid in shard}, self.write_chunk_size, self.page_size,
+             f'{shard_of(shard[0], self.shards)}/{self.shards}' if self.journal is not None else None, self.sketch_k)
+            for shard in student_shards
+        ])
+
+        companies = CompanyScoreCalculator(self.storage, write_chunk_size=self.write_chunk_size, page_size=self.page_size)
+        sub_payloads, cat_payloads, hol_payloads = companies.company_payloads_from_partials(
+            [o['company_partials'] for o in outcomes], companies._load_subcategory_map(), calculation_date,
+        )
+        summary: Dict[str, Any] = {
+            'shards': len(student_shards),
+            'student_category_rows_upserted': sum(o['student_category_rows_upserted'] for o in outcomes),
+            'student_holistic_rows_upserted': sum(o['student_holistic_rows_upserted'] for o in outcomes),
+        }
+        for table, payloads, label in (
+            ('company_subcategory_scores', sub_payloads, 'company_subcategory_rows_upserted'),
+            ('company_category_scores', cat_payloads, 'company_category_rows_upserted'),
+            ('company_holistic_gpa', hol_payloads, 'company_holistic_rows_upserted'),
+        ):
+            summary[label] = self.writer.upsert(table, payloads, on_conflict=NATURAL_KEYS[table])
+        if self.sketch_k:
+            sketches = merge_cohort_sketches(o['score_sketches'] for o in outcomes)
+            store = SketchStore(self.storage, k=self.sketch_k, write_chunk_size=self.write_chunk_size, page_size=self.page_size)
+            summary['sketch_rows_upserted'] = store.write(sketches, calculation_date)['rows_written']
+        return summary
+
+    def rank_indexes(self, calculation_date: str) -> Dict[str, Any]:
+        """Reduce only: rank the day's holistic rows once every shard has written them."""
+        ranks = RankIndexBuilder(self.storage, write_chunk_size=self.write_chunk_size, page_size=self.page_size)
+        return {k: v for k, v in ranks.build(calculation_date).items() if k != 'tables'}
@@ -0,0 +1,283 @@
+"""
+apex_scoring.sketches
+
+Mergeable quantile sketches of raw scores, for percentile ranks against pooled
+reference populations.
+
+`BellCurveCalculator` ranks a score against the exact population it is given, so
+ranking against every cohort of a subcategory, or several years of them, would
+hold all of those scores in memory. `KLLSketch` (Karnin, Lang and Liberty's
+compactor hierarchy) keeps O(k) of them instead: a buffer per level, where an
+item at level h stands for 2**h scores. A full level is sorted and every other
+item (random offset) is promoted, so a rank estimate is off by at most about
+`rank_error(k)` times the population size; populations that fit in the first
+level are exact. Sketches built separately (per shard, per cohort, per year)
+merge into a sketch of the union with the same bound.
+
+`SketchStore` keeps one sketch per (subcategory_id, academic_year_start) cohort
+in `subcategory_score_sketches`, built from the cohort's latest scored day, and
+merges the cohorts asked for into a reference population:
+
+    reference = SketchStore(storage).reference(subcategory_id, academic_years=[2023, 2024, 2025])
+    normalized, stats = BellCurveCalculator().apply_bell_curve_to_array(scores, reference=reference)
+"""
+
+import logging
+import math
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from apex_scoring.db import DAY_KEY, DEFAULT_PAGE_SIZE, BulkWriter, Columns, iter_pages, paged_select
+from apex_scoring.storage import StorageBackend, as_storage
+
+logger = logging.getLogger(__name__)
+
+SKETCH_TABLE = 'subcategory_score_sketches'
+SKETCH_KEY = 'subcategory_id,academic_year_start'
+
+DEFAULT_K = 200
+# Capacity of each level relative to the one above it
+LEVEL_DECAY = 2 / 3
+MIN_LEVEL_CAPACITY = 8
+
+# Cohort of score rows without an academic year
+NO_COHORT = -1
+
+
+# Rank error fit, as for the DataSketches KLL sketch: about RANK_ERROR_SCALE / k**RANK_ERROR_EXPONENT
+RANK_ERROR_SCALE = 2.296
+RANK_ERROR_EXPONENT = 0.9444
+
+
+def rank_error(k: int) -> float:
+    """Approximate worst-case normalized rank error (99% confidence) of a sketch with parameter `k`."""
+    return RANK_ERROR_SCALE / k ** RANK_ERROR_EXPONENT
+
+
+def k_for_error(error: float) -> int:
+    """Smallest `k` whose `rank_error` is at most `error` (e.g. 0.01 for ranks within 1%)."""
+    if not 0 < error < 1:
+        raise ValueError("error must be between 0 and 1")
+    return max(MIN_LEVEL_CAPACITY, math.ceil((RANK_ERROR_SCALE / error) ** (1 / RANK_ERROR_EXPONENT)))
+
+
+class KLLSketch:
+    """KLL quantile sketch of float values; `percentile_ranks` matches `calculate_percentile_ranks` up to `rank_error(k)`."""
+
+    def __init__(self, k: int = DEFAULT_K, seed: int = 0) -> None:
+        if k < MIN_LEVEL_CAPACITY:
+            raise ValueError(f"k must be at least {MIN_LEVEL_CAPACITY}")
+        self.k = k
+        self.seed = seed
+        self.n = 0
+        self.levels: List[np.ndarray] = [np.empty(0, dtype=float)]
+        self._rng = np.random.default_rng(seed)
+        # (sorted items, weight of the items strictly before each position), rebuilt after a change
+        self._view: Optional[Tuple[np.ndarray, np.ndarray]] = None
+
+    @property
+    def error(self) -> float:
+        return rank_error(self.k)
+
+    @property
+    def size(self) -> int:
+        """Items retained (the sketch's memory, whatever `n` is)."""
+        return sum(level.size for level in self.levels)
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.levels) - level - 1
+        return max(MIN_LEVEL_CAPACITY, int(math.ceil(self.k * LEVEL_DECAY ** depth)))
+
+    def _compress(self) -> None:
+        while True:
+            full = next((h for h, items in enumerate(self.levels) if items.size > self._capacity(h)), None)
+            if full is None:
+                return
+            if full + 1 == len(self.levels):
+                self.levels.append(np.empty(0, dtype=float))
+            items = np.sort(self.levels[full], kind='mergesort')
+            # An odd item out stays behind, so every promoted pair stands for exactly two items
+            kept, pairs = items[:items.size % 2], items[items.size % 2:]
+            self.levels[full] = kept
+            self.levels[full + 1] = np.concatenate((self.levels[full + 1], pairs[int(self._rng.integers(2))::2]))
+
+    def update(self, values: Union[float, Sequence[float], np.ndarray]) -> 'KLLSketch':
+        """Add values (NaN ignored)."""
+        values = np.atleast_1d(np.asarray(values, dtype=float))
+        values = values[~np.isnan(values)]
+        if values.size:
+            self.n += int(values.size)
+            self.levels[0] = np.concatenate((self.levels[0], values))
+            self._compress()
+            self._view = None
+        return self
+
+    def merge(self, other: 'KLLSketch') -> 'KLLSketch':
+        """Fold `other` into this sketch (the smaller `k` of the two is kept)."""
+        self.k = min(self.k, other.k)
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0, dtype=float))
+        for h, items in enumerate(other.levels):
+            self.levels[h] = np.concatenate((self.levels[h], items))
+        self.n += other.n
+        self._compress()
+        self._view = None
+        return self
+
+    def _sorted_view(self) -> Tuple[np.ndarray, np.ndarray]:
+        if self._view is None:
+            items = np.concatenate(self.levels)
+            weights = np.concatenate([np.full(level.size, 2 ** h, dtype=np.int64) for h, level in enumerate(self.levels)])
+            order = np.argsort(items, kind='mergesort')
+            self._view = (items[order], np.concatenate(([0], np.cumsum(weights[order]))))
+        return self._view
+
+    def ranks(self, values: Union[Sequence[float], np.ndarray]) -> np.ndarray:
+        """Estimated number of added values strictly below each of `values`."""
+        items, below = self._sorted_view()
+        return below[np.searchsorted(items, np.asarray(values, dtype=float), side='left')]
+
+    def percentile_ranks(self, values: Union[Sequence[float], np.ndarray]) -> np.ndarray:
+        """Estimated share of added values strictly below each of `values` (0.5 for an empty sketch)."""
+        values = np.asarray(values, dtype=float)
+        if self.n == 0:
+            return np.full(values.shape, 0.5)
+        return self.ranks(values) / self.n
+
+    def quantiles(self, fractions: Union[Sequence[float], np.ndarray]) -> np.ndarray:
+        """Estimated values at the given rank fractions (0 = minimum, 1 = maximum)."""
+        items, below = self._sorted_view()
+        if items.size == 0:
+            return np.full(np.shape(fractions), np.nan)
+        targets = np.asarray(fractions, dtype=float) * self.n
+        return items[np.clip(np.searchsorted(below[1:], targets, side='right'), 0, items.size - 1)]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'k': self.k, 'n': self.n, 'seed': self.seed, 'levels': [level.tolist() for level in self.levels]}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'KLLSketch':
+        sketch = cls(int(data['k']), seed=int(data.get('seed', 0)))
+        sketch.n = int(data['n'])
+        sketch.levels = [np.asarray(level, dtype=float) for level in data['levels']] or [np.empty(0, dtype=float)]
+        return sketch
+
+
+def cohort_sketches(scores: Columns, k: int = DEFAULT_K) -> Dict[Tuple[str, int], KLLSketch]:
+    """One sketch per (subcategory_id, academic_year_start) of score columns."""
+    sketches: Dict[Tuple[str, int], KLLSketch] = {}
+    add_cohort_scores(sketches, scores, k)
+    return sketches
+
+
+def add_cohort_scores(sketches: Dict[Tuple[str, int], KLLSketch], scores: Columns, k: int = DEFAULT_K) -> None:
+    """Add a page of score columns to `sketches`, keyed by (subcategory_id, academic_year_start)."""
+    values = np.asarray(scores['score'], dtype=float)
+    present = ~np.isnan(values)
+    years = np.array([NO_COHORT if y is None else int(y) for y in scores['academic_year_start']], dtype=np.int64)
+    subcategory_ids = np.asarray(scores['subcategory_id'], dtype=object)
+    for subcategory_id, year in set(zip(subcategory_ids[present], years[present].tolist())):
+        cohort = present & (subcategory_ids == subcategory_id) & (years == year)
+        sketches.setdefault((subcategory_id, year), KLLSketch(k)).update(values[cohort])
+
+
+def merge_cohort_sketches(partials: Iterable[Dict[Tuple[str, int], KLLSketch]]) -> Dict[Tuple[str, int], KLLSketch]:
+    """Merge per-shard cohort sketches into one sketch per cohort."""
+    merged: Dict[Tuple[str, int], KLLSketch] = {}
+    for partial in partials:
+        for key, sketch in partial.items():
+            if key in merged:
+                merged[key].merge(sketch)
+            else:
+                merged[key] = sketch
+    return merged
+
+
+class SketchStore:
+    """Persists cohort sketches in `subcategory_score_sketches` and merges them into reference populations."""
+
+    def __init__(
+        self,
+        storage: StorageBackend,
+        k: int = DEFAULT_K,
+        write_chunk_size: int = BulkWriter.DEFAULT_CHUNK_SIZE,
+        page_size: int = DEFAULT_PAGE_SIZE,
+    ) -> None:
+        self.storage = as_storage(storage)
+        self.k = k
+        self.writer = BulkWriter(self.storage, chunk_size=write_chunk_size)
+        self.page_size = page_size
+        self._keeps_sketches: Optional[bool] = None
+
+    @property
+    def keeps_sketches(self) -> bool:
+        """Whether sketches are written: only once the `subcategory_score_sketches` migration is applied."""
+        if self._keeps_sketches is None:
+            self._keeps_sketches = self.storage.has_table(SKETCH_TABLE)
+            if not self._keeps_sketches:
+                logger.warning(f"Table {SKETCH_TABLE} not found; score sketches are not written")
+        return self._keeps_sketches
+
+    def build_day(self, calculation_date: str) -> Dict[Tuple[str, int], KLLSketch]:
+        """Sketch the day's raw scores per cohort, reading the day a page at a time."""
+        sketches: Dict[Tuple[str, int], KLLSketch] = {}
+        for page in iter_pages(
+            self.storage, 'student_subcategory_scores', ('subcategory_id', 'academic_year_start', 'score'),
+            eq={'calculation_date': calculation_date}, key=DAY_KEY, page_size=self.page_size, prefetch=True,
+        ):
+            add_cohort_scores(sketches, page, self.k)
+        return sketches
+
+    def write(self, sketches: Dict[Tuple[str, int], KLLSketch], calculation_date: str) -> Dict[str, int]:
+        """Store `sketches` as their cohorts' sketches, unless a cohort already has one from a later day."""
+        if not self.keeps_sketches:
+            return {'cohorts': len(sketches), 'rows_written': 0}
+        stored = {
+            (r['subcategory_id'], int(r['academic_year_start'])): str(r['calculation_date'])[:10]
+            for r in paged_select(
+                self.storage, SKETCH_TABLE, 'id, subcategory_id, academic_year_start, calculation_date',
+                page_size=self.page_size,
+            )
+        }
+        rows = [
+            {
+                'subcategory_id': subcategory_id,
+                'academic_year_start': year,
+                'calculation_date': calculation_date,
+                'k': sketch.k,
+                'n': sketch.n,
+                'sketch': sketch.to_dict(),
+            }
+            for (subcategory_id, year), sketch in sorted(sketches.items())
+            if stored.get((subcategory_id, year), '') <= calculation_date
+        ]
+        written = self.writer.upsert(SKETCH_TABLE, rows, on_conflict=SKETCH_KEY)
+        logger.info(f"Score sketches for {calculation_date}: {written} cohorts written, "
+                    f"{len(sketches) - len(rows)} kept from later days")
+        return {'cohorts': len(sketches), 'rows_written': written}
+
+    def update_day(self, calculation_date: str) -> Dict[str, int]:
+        if not self.keeps_sketches:
+            return {'cohorts': 0, 'rows_written': 0}
+        return self.write(self.build_day(calculation_date), calculation_date)
+
+    def reference(
+        self, subcategory_id: str, academic_years: Optional[Iterable[int]] = None,
+    ) -> Optional[KLLSketch]:
+        """Merged sketch of the subcategory's cohorts (all of them, or those of `academic_years`)."""
+        rows = paged_select(
+            self.storage, SKETCH_TABLE, 'id, academic_year_start, sketch', eq={'subcategory_id': subcategory_id},
+            page_size=self.page_size,
+        )
+        years = None if academic_years is None else {int(y) for y in academic_years}
+        sketches = [
+            KLLSketch.from_dict(r['sketch']) for r in rows
+            if years is None or int(r['academic_year_start']) in years
+        ]
+        if not sketches:
+            return None
+        reference = sketches[0]
+        for sketch in sketches[1:]:
+            reference.merge(sketch)
+        return reference
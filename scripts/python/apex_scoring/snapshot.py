@@ -0,0 +1,260 @@
+"""
+apex_scoring.snapshot
+
+In-memory snapshot of one calculation day shared by every phase of the daily run.
+
+`DaySnapshot.load` reads students, companies, categories, subcategories, the
+scoring config and the day's `student_subcategory_scores` rows once and keeps them
+as NumPy column arrays (the config compiled, as `config`).
+Phases read from the snapshot, update it in place and stage their writes on it;
+`flush` sends the staged writes at the end of the run.
+"""
+
+from __future__ import annotations
+
+import logging
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+from apex_scoring.changes import WRITE_COUNTS, ChangeOnlyWriter
+from apex_scoring.db import BulkWriter, Columns, DAY_KEY, DEFAULT_PAGE_SIZE, FLOAT_COLUMNS, read_columns, rows_to_columns
+from apex_scoring.interning import IdTable, score_id_tables
+from apex_scoring.journal import RunJournal
+from apex_scoring.scoring_config import ScoringConfig, latest_config_row
+from apex_scoring.storage import StorageBackend, as_storage
+
+if TYPE_CHECKING:
+    from supabase import Client
+
+logger = logging.getLogger(__name__)
+
+# Journal phase of per-table flush units (shard = table name)
+FLUSH_UNIT = 'flush'
+
+# Columns loaded per table
+STUDENT_COLUMNS = ('id', 'company_id', 'academic_year_start')
+COMPANY_COLUMNS = ('id', 'name', 'is_active')
+CATEGORY_COLUMNS = ('id', 'name', 'weight')
+SUBCATEGORY_COLUMNS = ('id', 'name', 'category_id', 'weight')
+SCORE_COLUMNS = (
+    'id', 'student_id', 'subcategory_id', 'score', 'normalized_score', 'data_points_count',
+    'academic_year_start', 'academic_year_end', 'calculation_date', 'updated_at',
+)
+
+
+def iter_records(columns: Columns) -> Iterator[Dict[str, Any]]:
+    """Yield row dicts back out of a column mapping."""
+    names = list(columns)
+    for values in zip(*(columns[n] for n in names)):
+        yield dict(zip(names, values))
+
+
+def same_values(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Elementwise equality treating NaN as equal to NaN."""
+    return (a == b) | (np.isnan(a) & np.isnan(b))
+
+
+def _column_length(columns: Columns) -> int:
+    return len(next(iter(columns.values()))) if columns else 0
+
+
+class DaySnapshot:
+    """
+    Columnar copy of the tables the daily pipeline reads for a single calculation_date.
+
+    Writes are staged per table with `stage` and sent by `flush`; normalized scores
+    updated with `set_normalized_scores` are tracked and flushed as one bulk update.
+    """
+
+    def __init__(
+        self,
+        calculation_date: str,
+        students: Columns,
+        companies: Columns,
+        categories: Columns,
+        subcategories: Columns,
+        scores: Columns,
+        config_row: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        self.calculation_date = calculation_date
+        self.students = students
+        self.companies = companies
+        self.categories = categories
+        self.subcategories = subcategories
+        self.scores = scores
+        self.config = ScoringConfig.from_rows(self.records('subcategories'), self.records('categories'), config_row)
+        # int32 codes of the score rows' student and subcategory ids, for grouping
+        self.score_ids: Dict[str, IdTable] = score_id_tables(scores)
+        self._normalized_dirty = np.zeros(self.score_count, dtype=bool)
+        # Normalized scores as stored, so flushing skips the ones that did not change
+        self._stored_normalized = scores['normalized_score'].copy()
+        self._staged: Dict[str, Dict[str, Any]] = {}
+        # Per-phase results other phases may read (e.g. student category rows)
+        self.results: Dict[str, List[Dict[str, Any]]] = {}
+        # Rows written, skipped as unchanged and copied forward per table by `flush`
+        self.write_counts: Dict[str, Dict[str, int]] = {}
+
+    @classmethod
+    def load(
+        cls,
+        storage: StorageBackend | Client,
+        calculation_date: str,
+        page_size: int = DEFAULT_PAGE_SIZE,
+    ) -> 'DaySnapshot':
+        """Read every table the pipeline needs for `calculation_date` exactly once."""
+        storage = as_storage(storage)
+
+        def load_table(table: str, columns: Sequence[str], eq: Optional[Dict[str, Any]] = None) -> Columns:
+            key = DAY_KEY if 'calculation_date' in columns else ('id',)
+            return read_columns(storage, table, columns, eq=eq, key=key, page_size=page_size)
+
+        snapshot = cls(
+            calculation_date=calculation_date,
+            students=load_table('students', STUDENT_COLUMNS),
+            companies=load_table('companies', COMPANY_COLUMNS),
+            categories=load_table('categories', CATEGORY_COLUMNS),
+            subcategories=load_table('subcategories', SUBCATEGORY_COLUMNS),
+            scores=load_table('student_subcategory_scores', SCORE_COLUMNS, eq={'calculation_date': calculation_date}),
+            config_row=latest_config_row(storage),
+        )
+        logger.info(
+            f"Loaded day snapshot for {calculation_date}: {snapshot.student_count} students, "
+            f"{snapshot.score_count} score rows, ~{snapshot.nbytes / 1e6:.1f} MB"
+        )
+        return snapshot
+
+    # ---------- Shape ----------
+    @property
+    def student_count(self) -> int:
+        return _column_length(self.students)
+
+    @property
+    def score_count(self) -> int:
+        return _column_length(self.scores)
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate in-memory size of the loaded columns (object columns counted by pointer)."""
+        total = 0
+        for table in (self.students, self.companies, self.categories, self.subcategories, self.scores):
+            total += sum(arr.nbytes for arr in table.values())
+        return total + sum(ids.codes.nbytes + ids.ids.nbytes for ids in self.score_ids.values())
+
+    # ---------- Lookups ----------
+    def records(self, table: str) -> Iterator[Dict[str, Any]]:
+        """Iterate one of the loaded tables as row dicts."""
+        return iter_records(getattr(self, table))
+
+    def score_rows(self, mask: Optional[np.ndarray] = None) -> List[Dict[str, Any]]:
+        """Score rows as dicts (NaN mapped back to None), optionally filtered by a boolean mask."""
+        columns = self.scores if mask is None else {k: v[mask] for k, v in self.scores.items()}
+        rows = list(iter_records(columns))
+        for r in rows:
+            for column in FLOAT_COLUMNS:
+                if column in r and np.isnan(r[column]):
+                    r[column] = None
+        return rows
+
+    def academic_year_students(self, academic_year: int) -> List[Dict[str, Any]]:
+        mask = self.students['academic_year_start'] == academic_year
+        return list(iter_records({k: v[mask] for k, v in self.students.items()}))
+
+    # ---------- In-place updates ----------
+    def set_normalized_scores(self, row_indices: np.ndarray, values: np.ndarray) -> None:
+        """Overwrite `normalized_score` for the given score rows and mark them for flushing."""
+        self.scores['normalized_score'][row_indices] = values
+        self._normalized_dirty[row_indices] = True
+
+    def discard_normalized_scores(self, row_indices: np.ndarray) -> None:
+        """Drop the pending `normalized_score` writes for the given score rows (e.g. values that did not change)."""
+        self._normalized_dirty[row_indices] = False
+
+    def stage(self, table: str, rows: List[Dict[str, Any]], on_conflict: Optional[str] = None) -> None:
+        """Queue `rows` to be upserted into `table` on `flush`."""
+        entry = self._staged.setdefault(table, {'rows': [], 'on_conflict': on_conflict})
+        entry['rows'].extend(rows)
+
+    def pending_counts(self) -> Dict[str, int]:
+        counts = {table: len(entry['rows']) for table, entry in self._staged.items()}
+        dirty = int(self._normalized_dirty.sum())
+        if dirty:
+            counts['student_subcategory_scores'] = dirty
+        return counts
+
+    def _normalized_score_payloads(self) -> List[Dict[str, Any]]:
+        # On Supabase a bulk update is an upsert on `id`, whose insert half needs the NOT NULL key columns.
+        idx = np.flatnonzero(self._normalized_dirty)
+        s = self.scores
+        return [
+            {
+                'id': s['id'][i],
+                'student_id': s['student_id'][i],
+                'subcategory_id': s['subcategory_id'][i],
+                'score': None if np.isnan(s['score'][i]) else float(s['score'][i]),
+                'academic_year_start': s['academic_year_start'][i],
+                'academic_year_end': s['academic_year_end'][i],
+                'calculation_date': s['calculation_date'][i],
+                'normalized_score': float(s['normalized_score'][i]),
+            }
+            for i in idx
+        ]
+
+    def flush(
+        self, writer: BulkWriter, journal: Optional[RunJournal] = None, changes_only: bool = False,
+    ) -> Dict[str, int]:
+        """Send every staged write. Returns rows written per table.
+
+        Normalized scores equal to the value their row already holds are never sent.
+        With `changes_only`, staged upserts go through `ChangeOnlyWriter`, which sends
+        only the rows that differ from the day's stored rows or, for a new day, from
+        the previous day's (copied forward on the server). Rows written, skipped and
+        copied per table are kept in `write_counts`.
+
+        With a `journal`, tables it records as flushed are skipped and each table is
+        recorded once written, so a flush interrupted part way resumes with the next table.
+        """
+        written: Dict[str, int] = {}
+        changes = ChangeOnlyWriter(writer) if changes_only else None
+
+        def flushed(table: str) -> bool:
+            if journal is not None and journal.done(FLUSH_UNIT, table):
+                logger.info(f"Skipping flush of {table}: already written for {self.calculation_date}")
+                return True
+            return False
+
+        def record(table: str) -> None:
+            if journal is not None:
+                journal.record(FLUSH_UNIT, table, rows_written=written[table])
+
+        def count(table: str, counts: Dict[str, int]) -> None:
+            totals = self.write_counts.setdefault(table, dict.fromkeys(WRITE_COUNTS, 0))
+            for name, value in counts.items():
+                totals[name] += value
+
+        # Rows whose stored normalized score already has the new value
+        unchanged = self._normalized_dirty & same_values(self.scores['normalized_score'], self._stored_normalized)
+        if unchanged.any():
+            count('student_subcategory_scores', {'rows_skipped': int(unchanged.sum())})
+            self._normalized_dirty[unchanged] = False
+        if self._normalized_dirty.any():
+            table = 'student_subcategory_scores'
+            if not flushed(table):
+                written[table] = writer.update(table, self._normalized_score_payloads())
+                count(table, {'rows_written': written[table]})
+                record(table)
+            self._normalized_dirty[:] = False
+        self._stored_normalized = self.scores['normalized_score'].copy()
+        # Tables are flushed in staging order, which follows the phase order
+        for table, entry in self._staged.items():
+            if flushed(table):
+                continue
+            if changes is not None and entry['on_conflict']:
+                counts = changes.upsert_day(table, entry['rows'], self.calculation_date, entry['on_conflict'])
+            else:
+                counts = {'rows_written': writer.upsert(table, entry['rows'], on_conflict=entry['on_conflict'])}
+            written[table] = written.get(table, 0) + counts['rows_written']
+            count(table, counts)
+            record(table)
+        self._staged.clear()
+        return written
@@ -0,0 +1,467 @@
+"""
+apex_scoring.storage
+
+Storage backends for the scoring pipeline.
+
+`StorageBackend` covers the handful of table operations the calculators use:
+filtered/ordered selects, upserts and bulk updates. `SupabaseStorage` maps them
+onto the PostgREST query builder; `SQLiteStorage` is a local stand-in backed by
+the standard-library `sqlite3` module that can load a schema fixture, so the
+pipeline can be benchmarked and profiled offline.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import uuid
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SCHEMA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'schema.sql')
+
+Row = Dict[str, Any]
+Order = Union[str, Sequence[str], None]
+
+# Rows per request of the client-side `StorageBackend.copy_day` fallback
+COPY_PAGE_SIZE = 1000
+
+# Database function that copies a day's rows on the server (see README, "Change-Only Writes")
+COPY_DAY_FUNCTION = 'copy_score_day'
+
+# PostgREST error codes for a table that does not exist (PGRST205 since PostgREST 12)
+MISSING_TABLE_CODES = frozenset({'PGRST205', '42P01'})
+# ... and for a database function that does not exist
+MISSING_FUNCTION_CODES = frozenset({'PGRST202', '42883'})
+
+
+def _split_columns(columns: str) -> List[str]:
+    return [c.strip() for c in columns.split(',') if c.strip()]
+
+
+def _quote(name: str) -> str:
+    return f'"{name}"'
+
+
+def _order_columns(order: Order) -> List[str]:
+    if order is None:
+        return []
+    if isinstance(order, str):
+        return [order]
+    return list(order)
+
+
+def _postgrest_value(value: Any) -> str:
+    return '"' + str(value).replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+def _postgrest_after(after: Dict[str, Any]) -> str:
+    """PostgREST `or` filter for `(c1, c2, ...) > (v1, v2, ...)`: c1 > v1, or c1 = v1 and c2 > v2, ..."""
+    items = list(after.items())
+    terms = []
+    for k, (column, value) in enumerate(items):
+        conditions = [f'{c}.eq.{_postgrest_value(v)}' for c, v in items[:k]]
+        conditions.append(f'{column}.gt.{_postgrest_value(value)}')
+        terms.append(conditions[0] if len(conditions) == 1 else f'and({",".join(conditions)})')
+    return ','.join(terms)
+
+
+class StorageBackend(ABC):
+    """
+    Table operations used by the scoring pipeline.
+
+    Filters are keyword mappings: `eq` is column -> value, `in_` is column -> values and
+    `gt` is column -> exclusive lower bound. `after` is an ordered column -> value mapping
+    compared as one tuple, `(a, b) > (x, y)`, for keyset pagination.
+    `order` is a column name or a sequence of names, all sorted in the `desc` direction.
+
+    `select`, `upsert`, `bulk_update` and `delete` are abstract, so a backend missing
+    one fails when it is created; `rpc`, `copy_day` and `has_table` are optional.
+    """
+
+    @abstractmethod
+    def select(
+        self,
+        table: str,
+        columns: str = '*',
+        eq: Optional[Dict[str, Any]] = None,
+        in_: Optional[Dict[str, Sequence[Any]]] = None,
+        gt: Optional[Dict[str, Any]] = None,
+        after: Optional[Dict[str, Any]] = None,
+        order: Order = None,
+        desc: bool = False,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+    ) -> List[Row]:
+        """Rows of `table` matching every filter, as dicts of the requested `columns`."""
+
+    @abstractmethod
+    def upsert(self, table: str, rows: Sequence[Row], on_conflict: Optional[str] = None) -> int:
+        """Insert `rows`, merging on `on_conflict` columns (the primary key when omitted). Returns rows sent."""
+
+    @abstractmethod
+    def bulk_update(self, table: str, rows: Sequence[Row], key: str = 'id') -> int:
+        """Update existing rows matched on `key` with the other columns of each row. Returns rows sent."""
+
+    @abstractmethod
+    def delete(
+        self, table: str, eq: Optional[Dict[str, Any]] = None, in_: Optional[Dict[str, Sequence[Any]]] = None,
+    ) -> None:
+        """Delete the rows matching every `eq` and `in_` filter (at least one filter is required)."""
+
+    def rpc(self, function: str, params: Optional[Dict[str, Any]] = None) -> Any:
+        raise NotImplementedError(f"{type(self).__name__} does not support RPC calls ({function})")
+
+    def has_table(self, table: str) -> bool:
+        """Whether `table` exists. Tables added by a migration that may not be applied yet are checked first."""
+        return True
+
+    def copy_day(self, table: str, columns: Sequence[str], from_date: str, to_date: str) -> int:
+        """Copy `columns` of every `from_date` row of `table` to new rows dated `to_date`. Returns rows copied.
+
+        Meant for a day with no rows in `table` yet. Backends that can run the copy
+        server-side override this; the fallback reads the rows and upserts them back.
+        """
+        copied = 0
+        after: Optional[Dict[str, Any]] = None
+        while True:
+            page = self.select(
+                table, ', '.join(['id', *columns]), eq={'calculation_date': from_date},
+                after=after, order='id', limit=COPY_PAGE_SIZE,
+            )
+            if not page:
+                return copied
+            after = {'id': page[-1]['id']}
+            copied += self.upsert(table, [dict({c: r[c] for c in columns}, calculation_date=to_date) for r in page])
+            if len(page) < COPY_PAGE_SIZE:
+                return copied
+
+
+class SupabaseStorage(StorageBackend):
+    """`StorageBackend` over a `supabase.Client` (PostgREST)."""
+
+    DEFAULT_MAX_CONNECTIONS = 10
+    DEFAULT_TIMEOUT_SECONDS = 120.0
+
+    def __init__(self, client) -> None:
+        self.client = client
+        # Cleared once `copy_score_day` turns out to be missing (its migration is not applied)
+        self._copy_day_on_server = True
+
+    @classmethod
+    def connect(
+        cls,
+        url: str,
+        key: str,
+        max_connections: int = DEFAULT_MAX_CONNECTIONS,
+        timeout: float = DEFAULT_TIMEOUT_SECONDS,
+    ) -> 'SupabaseStorage':
+        """Create a client whose PostgREST requests share one keep-alive `httpx` connection pool.
+
+        The pool allows `max_connections` requests in flight, so it should be at least
+        the number of worker threads issuing queries.
+        """
+        import httpx
+        from supabase import ClientOptions, create_client
+
+        http_client = httpx.Client(
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            timeout=timeout,
+        )
+        try:
+            options = ClientOptions(httpx_client=http_client)
+        except TypeError:
+            # Older supabase releases have no `httpx_client` option; PostgREST keeps its own session
+            http_client.close()
+            options = None
+        client = create_client(url, key, options=options) if options else create_client(url, key)
+        return cls(client)
+
+    def select(self, table, columns='*', eq=None, in_=None, gt=None, after=None, order=None, desc=False, limit=None, offset=None):
+        query = self.client.table(table).select(columns)
+        for column, value in (eq or {}).items():
+            query = query.eq(column, value)
+        for column, values in (in_ or {}).items():
+            query = query.in_(column, list(values))
+        for column, value in (gt or {}).items():
+            query = query.gt(column, value)
+        if after:
+            query = query.or_(_postgrest_after(after))
+        for column in _order_columns(order):
+            query = query.order(column, desc=desc)
+        if offset is not None:
+            end = offset + (limit if limit is not None else 1000) - 1
+            query = query.range(offset, end)
+        elif limit is not None:
+            query = query.limit(limit)
+        return query.execute().data or []
+
+    def upsert(self, table, rows, on_conflict=None):
+        rows = list(rows)
+        if not rows:
+            return 0
+        query = self.client.table(table)
+        if on_conflict:
+            query.upsert(rows, on_conflict=on_conflict).execute()
+        else:
+            query.upsert(rows).execute()
+        return len(rows)
+
+    def bulk_update(self, table, rows, key='id'):
+        # PostgREST has no multi-row UPDATE; an upsert keyed on `key` is one request.
+        # The insert half of the upsert checks NOT NULL columns, so rows must carry them.
+        return self.upsert(table, rows, on_conflict=key)
+
+    def delete(self, table, eq=None, in_=None):
+        if not eq and not in_:
+            raise ValueError(f"Refusing to delete every row of {table}")
+        query = self.client.table(table).delete()
+        for column, value in (eq or {}).items():
+            query = query.eq(column, value)
+        for column, values in (in_ or {}).items():
+            query = query.in_(column, list(values))
+        query.execute()
+
+    def rpc(self, function, params=None):
+        return self.client.rpc(function, params or {}).execute().data
+
+    def has_table(self, table):
+        try:
+            self.client.table(table).select('*').limit(1).execute()
+        except Exception as e:
+            if getattr(e, 'code', None) in MISSING_TABLE_CODES:
+                return False
+            raise
+        return True
+
+    def copy_day(self, table, columns, from_date, to_date):
+        if self._copy_day_on_server:
+            try:
+                copied = self.rpc(COPY_DAY_FUNCTION, {
+                    'p_table': table, 'p_columns': list(columns), 'p_from': from_date, 'p_to': to_date,
+                })
+                return int(copied or 0)
+            except Exception as e:
+                if getattr(e, 'code', None) not in MISSING_FUNCTION_CODES:
+                    raise
+                logger.warning(f"Database function {COPY_DAY_FUNCTION} not found; copying days client-side")
+                self._copy_day_on_server = False
+        return super().copy_day(table, columns, from_date, to_date)
+
+
+class SQLiteStorage(StorageBackend):
+    """
+    Local `StorageBackend` on SQLite.
+
+    Mirrors the PostgREST behaviour the pipeline relies on: generated `id`s,
+    `updated_at` stamped on every write, JSON columns round-tripped as objects and
+    BOOLEAN columns returned as bools.
+    """
+
+    # Seconds a write waits for another connection's lock (e.g. backfill worker processes)
+    DEFAULT_TIMEOUT_SECONDS = 5.0
+
+    def __init__(
+        self, path: str = ':memory:', schema_path: Optional[str] = None, timeout: float = DEFAULT_TIMEOUT_SECONDS
+    ) -> None:
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=timeout)
+        self._conn.row_factory = sqlite3.Row
+        # Row ids generated inside SQL statements, as Postgres does for `copy_day`
+        self._conn.create_function('gen_random_uuid', 0, lambda: str(uuid.uuid4()))
+        if path != ':memory:':
+            # Bulk loads commit per chunk; WAL with NORMAL sync avoids an fsync per commit
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._lock = threading.Lock()
+        self._table_info: Dict[str, Dict[str, str]] = {}
+        if schema_path:
+            self.load_schema(schema_path)
+
+    def load_schema(self, schema_path: str = DEFAULT_SCHEMA_PATH) -> None:
+        """Execute a SQL schema fixture (CREATE TABLE/INDEX statements)."""
+        with open(schema_path) as f:
+            script = f.read()
+        with self._lock:
+            self._conn.executescript(script)
+            self._conn.commit()
+        self._table_info.clear()
+        logger.info(f"Loaded schema fixture {schema_path} into {self.path}")
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def clone(self) -> 'SQLiteStorage':
+        """In-memory copy of this database (e.g. to rerun a pipeline against the same starting state)."""
+        copy = SQLiteStorage(':memory:')
+        with self._lock:
+            self._conn.backup(copy._conn)
+        return copy
+
+    def has_table(self, table):
+        try:
+            self._columns(table)
+        except ValueError:
+            return False
+        return True
+
+    def _columns(self, table: str) -> Dict[str, str]:
+        """Column name -> declared type (upper-cased) for `table`."""
+        if table not in self._table_info:
+            info = self._conn.execute(f'PRAGMA table_info("{table}")').fetchall()
+            if not info:
+                raise ValueError(f"Unknown table {table!r}")
+            self._table_info[table] = {r['name']: (r['type'] or '').upper() for r in info}
+        return self._table_info[table]
+
+    def _decode(self, table: str, row: sqlite3.Row) -> Row:
+        types = self._columns(table)
+        out: Row = {}
+        for column in row.keys():
+            value = row[column]
+            declared = types.get(column, '')
+            if value is not None and declared.startswith('JSON'):
+                value = json.loads(value)
+            elif value is not None and declared == 'BOOLEAN':
+                value = bool(value)
+            out[column] = value
+        return out
+
+    def _encode(self, table: str, column: str, value: Any) -> Any:
+        declared = self._columns(table).get(column, '')
+        if value is not None and declared.startswith('JSON'):
+            return json.dumps(value)
+        return value
+
+    def _encode_rows(self, table: str, columns: Sequence[str], rows: Sequence[Row]) -> List[List[Any]]:
+        """Parameter lists for `columns` of each row, JSON columns serialized."""
+        types = self._columns(table)
+        json_positions = [i for i, c in enumerate(columns) if types.get(c, '').startswith('JSON')]
+        values = [[r.get(c) for c in columns] for r in rows]
+        for v in values:
+            for i in json_positions:
+                if v[i] is not None:
+                    v[i] = json.dumps(v[i])
+        return values
+
+    def select(self, table, columns='*', eq=None, in_=None, gt=None, after=None, order=None, desc=False, limit=None, offset=None):
+        known = self._columns(table)
+        selected = list(known) if columns.strip() == '*' else _split_columns(columns)
+        clauses: List[str] = []
+        params: List[Any] = []
+        for column, value in (eq or {}).items():
+            clauses.append(f'"{column}" = ?')
+            params.append(self._encode(table, column, value))
+        for column, values in (in_ or {}).items():
+            values = list(values)
+            if not values:
+                return []
+            clauses.append(f'"{column}" IN ({", ".join("?" for _ in values)})')
+            params.extend(values)
+        for column, value in (gt or {}).items():
+            clauses.append(f'"{column}" > ?')
+            params.append(self._encode(table, column, value))
+        if after:
+            clauses.append(
+                f'({", ".join(_quote(c) for c in after)}) > ({", ".join("?" for _ in after)})'
+            )
+            params.extend(self._encode(table, c, v) for c, v in after.items())
+        sql = f'SELECT {", ".join(_quote(c) for c in selected)} FROM {_quote(table)}'
+        if clauses:
+            sql += ' WHERE ' + ' AND '.join(clauses)
+        order_columns = _order_columns(order)
+        if order_columns:
+            direction = 'DESC' if desc else 'ASC'
+            sql += ' ORDER BY ' + ', '.join(f'"{c}" {direction}' for c in order_columns)
+        if limit is not None or offset is not None:
+            sql += ' LIMIT ? OFFSET ?'
+            params.extend([limit if limit is not None else -1, offset or 0])
+        with self._lock:
+            cursor = self._conn.execute(sql, params)
+            return [self._decode(table, r) for r in cursor.fetchall()]
+
+    def upsert(self, table, rows, on_conflict=None):
+        rows = list(rows)
+        if not rows:
+            return 0
+        known = self._columns(table)
+        now = datetime.now(timezone.utc).isoformat()
+        conflict = _split_columns(on_conflict) if on_conflict else ['id']
+        prepared: List[Row] = []
+        for r in rows:
+            r = dict(r)
+            if 'id' in known and not r.get('id'):
+                r['id'] = str(uuid.uuid4())
+            if 'updated_at' in known:
+                r['updated_at'] = now
+            prepared.append(r)
+        columns = list(prepared[0])
+        updates = [c for c in columns if c not in conflict and c != 'id']
+        sql = (
+            f'INSERT INTO {_quote(table)} ({", ".join(_quote(c) for c in columns)}) '
+            f'VALUES ({", ".join("?" for _ in columns)}) '
+            f'ON CONFLICT ({", ".join(_quote(c) for c in conflict)}) '
+        )
+        sql += ('DO UPDATE SET ' + ', '.join(f'"{c}" = excluded."{c}"' for c in updates)) if updates else 'DO NOTHING'
+        values = self._encode_rows(table, columns, prepared)
+        with self._lock:
+            self._conn.executemany(sql, values)
+            self._conn.commit()
+        return len(prepared)
+
+    def bulk_update(self, table, rows, key='id'):
+        rows = list(rows)
+        if not rows:
+            return 0
+        known = self._columns(table)
+        columns = [c for c in rows[0] if c != key]
+        if 'updated_at' in known and 'updated_at' not in columns:
+            columns.append('updated_at')
+        now = datetime.now(timezone.utc).isoformat()
+        sql = f'UPDATE {_quote(table)} SET {", ".join(f"{_quote(c)} = ?" for c in columns)} WHERE {_quote(key)} = ?'
+        if 'updated_at' in known:
+            rows = [r if 'updated_at' in r else dict(r, updated_at=now) for r in rows]
+        values = self._encode_rows(table, columns + [key], rows)
+        with self._lock:
+            self._conn.executemany(sql, values)
+            self._conn.commit()
+        return len(rows)
+
+    def delete(self, table, eq=None, in_=None):
+        if not eq and not in_:
+            raise ValueError(f"Refusing to delete every row of {table}")
+        clauses = [f'{_quote(c)} = ?' for c in eq or {}]
+        params = [self._encode(table, c, v) for c, v in (eq or {}).items()]
+        for column, values in (in_ or {}).items():
+            values = list(values)
+            if not values:
+                return
+            clauses.append(f'{_quote(column)} IN ({", ".join("?" for _ in values)})')
+            params.extend(values)
+        with self._lock:
+            self._conn.execute(f'DELETE FROM {_quote(table)} WHERE {" AND ".join(clauses)}', params)
+            self._conn.commit()
+
+    def copy_day(self, table, columns, from_date, to_date):
+        known = self._columns(table)
+        generated = {'id': 'gen_random_uuid()', 'updated_at': '?'}
+        generated = {c: expr for c, expr in generated.items() if c in known}
+        names = ', '.join(_quote(c) for c in [*generated, *columns, 'calculation_date'])
+        values = ', '.join([*generated.values(), *(_quote(c) for c in columns), '?'])
+        params = [datetime.now(timezone.utc).isoformat()] if 'updated_at' in generated else []
+        sql = f'INSERT INTO {_quote(table)} ({names}) SELECT {values} FROM {_quote(table)} WHERE "calculation_date" = ?'
+        with self._lock:
+            cursor = self._conn.execute(sql, [*params, to_date, from_date])
+            self._conn.commit()
+        return cursor.rowcount
+
+
+def as_storage(backend_or_client) -> StorageBackend:
+    """Accept either a `StorageBackend` or a raw `supabase.Client` and return a backend."""
+    if isinstance(backend_or_client, StorageBackend):
+        return backend_or_client
+    return SupabaseStorage(backend_or_client)
@@ -0,0 +1,420 @@
+"""
+apex_scoring.synthetic
+
+Population-scale synthetic data for load-testing the daily scoring pipeline.
+
+`PopulationGenerator` builds categories, subcategories, companies and students,
+then generates `event_submissions` and the matching `student_subcategory_scores`
+block by block with NumPy. Raw scores follow the aggregation rules in
+`docs/HOLISTIC_GPA_CALCULATION.md`. Each block can be written to a
+`StorageBackend` with chunked bulk upserts or streamed to CSV/Parquet files.
+"""
+
+import csv
+import json
+import logging
+import os
+import uuid
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from apex_scoring.db import BulkWriter
+from apex_scoring.storage import StorageBackend, as_storage
+
+logger = logging.getLogger(__name__)
+
+# Stable namespace so generated reference ids are the same on every run
+SYNTHETIC_NAMESPACE = uuid.UUID('6f0c5a57-3f1e-4e8e-9a55-5c1b8f1f5a11')
+
+CATEGORIES = {
+    'spiritual': 1.0,
+    'professional': 1.0,
+    'academic': 1.0,
+    'team': 1.0,
+}
+
+# Production ids the calculators special-case (curve exclusions and GPA passthrough)
+KNOWN_SUBCATEGORY_IDS = {
+    'chapel_participation': '865e0e15-c14d-4b23-abd2-5f1b6ccf5dbc',
+    'job_promotion_opportunities': 'a3bab151-0ce1-402f-b507-7d6c3489bc8c',
+    'credentials_certifications': 'efdbc642-a52d-4872-ada5-2687fc03be73',
+    'fellow_friday_participation': '221c3ba8-42e5-4f4f-a553-ba3134b6d433',
+    'practicum_grade': 'f50830fe-b820-4223-89e2-e69241b459af',
+    'spiritual_formation_grade': '8d13f1b9-33e1-4a62-be45-488a6834112f',
+    'class_attendance_grades': 'd1d972a4-2484-4b9a-a53c-0b63bb2e952c',
+}
+
+# Per subcategory: category, aggregation kind, submission type, instances per year
+# and the default Beta(a, b) distribution of each student's propensity.
+#   attendance / monthly: one submission per instance, present with probability p
+#   rating: 1-5 officer rating per participation, raw = average x 20
+#   hours: community service hours, 8 per day and 12 per year caps
+#   points: staff-assigned points per approved submission, raw = sum
+#   gbe: attendance plus 0-5 bonus points per attended event, clamped to 0-100
+#   grade: imported from Populi on the 0-4 GPA scale, no submissions
+SUBCATEGORY_PROFILES: Dict[str, Dict[str, Any]] = {
+    'chapel_attendance': {'category': 'spiritual', 'kind': 'attendance', 'submission_type': 'attendance', 'instances': 30, 'beta': (8.0, 2.0)},
+    'chapel_participation': {'category': 'spiritual', 'kind': 'rating', 'submission_type': 'team_participation', 'instances': 8, 'beta': (2.0, 3.0)},
+    'community_service_hours': {'category': 'spiritual', 'kind': 'hours', 'submission_type': 'community_service', 'instances': 6, 'beta': (2.0, 2.0)},
+    'dream_team_involvement': {'category': 'spiritual', 'kind': 'monthly', 'submission_type': 'dream_team', 'instances': 9, 'beta': (2.0, 2.0)},
+    'fellow_friday_attendance': {'category': 'spiritual', 'kind': 'attendance', 'submission_type': 'attendance', 'instances': 12, 'beta': (6.0, 2.0)},
+    'gbe_attendance': {'category': 'spiritual', 'kind': 'attendance', 'submission_type': 'attendance', 'instances': 8, 'beta': (6.0, 2.0)},
+    'small_group_involvement': {'category': 'spiritual', 'kind': 'monthly', 'submission_type': 'small_group', 'instances': 9, 'beta': (3.0, 2.0)},
+    'spiritual_formation_grade': {'category': 'spiritual', 'kind': 'grade', 'submission_type': None, 'instances': 1, 'beta': (6.0, 2.0)},
+    'class_attendance_grades': {'category': 'academic', 'kind': 'grade', 'submission_type': None, 'instances': 1, 'beta': (5.0, 2.0)},
+    'credentials_certifications': {'category': 'professional', 'kind': 'points', 'submission_type': 'credentials', 'instances': 4, 'beta': (1.5, 3.0)},
+    'fellow_friday_participation': {'category': 'professional', 'kind': 'points', 'submission_type': 'team_participation', 'instances': 6, 'beta': (2.0, 3.0)},
+    'job_promotion_opportunities': {'category': 'professional', 'kind': 'points', 'submission_type': 'job_promotion', 'instances': 4, 'beta': (1.5, 3.0)},
+    'practicum_grade': {'category': 'professional', 'kind': 'grade', 'submission_type': None, 'instances': 1, 'beta': (6.0, 2.0)},
+    'company_community_events': {'category': 'team', 'kind': 'attendance', 'submission_type': 'attendance', 'instances': 6, 'beta': (5.0, 2.0)},
+    'company_team_building': {'category': 'team', 'kind': 'rating', 'submission_type': 'company_team_building', 'instances': 6, 'beta': (3.0, 2.0)},
+    'gbe_participation': {'category': 'team', 'kind': 'gbe', 'submission_type': 'gbe_participation', 'instances': 8, 'beta': (4.0, 2.0)},
+    'lions_games_involvement': {'category': 'team', 'kind': 'points', 'submission_type': 'lions_games', 'instances': 5, 'beta': (2.0, 2.0)},
+}
+
+# Submission types that need staff review; the rest are auto-approved
+REVIEWED_SUBMISSION_TYPES = frozenset({'credentials', 'job_promotion'})
+
+SCORE_COLUMNS = (
+    'id', 'student_id', 'subcategory_id', 'score', 'normalized_score', 'data_points_count',
+    'academic_year_start', 'academic_year_end', 'calculation_date',
+)
+SUBMISSION_COLUMNS = (
+    'id', 'event_id', 'student_id', 'submitted_by', 'submission_data', 'submitted_at', 'subcategory_id',
+    'needs_approval', 'approval_status', 'approved_by', 'approved_at', 'points_granted',
+)
+
+GENERATED_TABLES = ('student_subcategory_scores', 'event_submissions')
+
+
+def _stable_id(*parts: Any) -> str:
+    return str(uuid.uuid5(SYNTHETIC_NAMESPACE, '/'.join(str(p) for p in parts)))
+
+
+def _random_ids(rng: np.random.Generator, n: int) -> List[str]:
+    raw = rng.integers(0, 2 ** 63, size=(n, 2), dtype=np.int64)
+    return [str(uuid.UUID(int=(int(hi) << 64) | int(lo), version=4)) for hi, lo in raw]
+
+
+class PopulationGenerator:
+    """
+    Deterministic synthetic population for one academic year and calculation date.
+
+    Output depends only on the constructor arguments: students are generated in
+    fixed blocks of `BLOCK_SIZE`, each with its own seeded random stream.
+    `distributions` overrides the Beta(a, b) propensity of any subcategory by name.
+    With `include_submissions=False` only the score rows are produced, which is
+    all the daily pipeline reads.
+    """
+
+    BLOCK_SIZE = 1000
+
+    def __init__(
+        self,
+        n_students: int,
+        n_companies: int = 6,
+        seed: int = 0,
+        academic_year: int = 2025,
+        calculation_date: Optional[date] = None,
+        distributions: Optional[Dict[str, Tuple[float, float]]] = None,
+        include_submissions: bool = True,
+    ) -> None:
+        if n_students <= 0 or n_companies <= 0:
+            raise ValueError("n_students and n_companies must be positive")
+        unknown = set(distributions or {}) - set(SUBCATEGORY_PROFILES)
+        if unknown:
+            raise ValueError(f"Unknown subcategories in distributions: {sorted(unknown)}")
+        self.n_students = n_students
+        self.n_companies = n_companies
+        self.seed = seed
+        self.academic_year = academic_year
+        self.calculation_date = calculation_date or date.today()
+        self.distributions = {name: tuple(profile['beta']) for name, profile in SUBCATEGORY_PROFILES.items()}
+        self.distributions.update({name: (float(a), float(b)) for name, (a, b) in (distributions or {}).items()})
+        self.year_start = min(date(academic_year, 8, 1), self.calculation_date)
+        self.include_submissions = include_submissions
+        self._students: Optional[List[Dict[str, Any]]] = None
+
+    # ---------- Reference tables ----------
+    def categories(self) -> List[Dict[str, Any]]:
+        return [
+            {'id': _stable_id('category', name), 'name': name, 'display_name': name.title(), 'weight': weight}
+            for name, weight in CATEGORIES.items()
+        ]
+
+    def subcategories(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                'id': self.subcategory_id(name),
+                'category_id': _stable_id('category', profile['category']),
+                'name': name,
+                'display_name': name.replace('_', ' ').title(),
+                'data_source': 'populi' if profile['kind'] == 'grade' else 'student_input',
+                'weight': 1.0,
+            }
+            for name, profile in SUBCATEGORY_PROFILES.items()
+        ]
+
+    @staticmethod
+    def subcategory_id(name: str) -> str:
+        return KNOWN_SUBCATEGORY_IDS.get(name) or _stable_id('subcategory', name)
+
+    def companies(self) -> List[Dict[str, Any]]:
+        return [
+            {'id': _stable_id('company', self.seed, i), 'name': f'Company {i + 1}', 'is_active': True}
+            for i in range(self.n_companies)
+        ]
+
+    def students(self) -> List[Dict[str, Any]]:
+        if self._students is None:
+            rng = np.random.default_rng([self.seed, 0])
+            ids = _random_ids(rng, self.n_students)
+            company_ids = [c['id'] for c in self.companies()]
+            assignment = rng.integers(0, self.n_companies, size=self.n_students)
+            self._students = [
+                {
+                    'id': sid,
+                    'company_id': company_ids[assignment[i]],
+                    'academic_role': 'student',
+                    'academic_year_start': self.academic_year,
+                    'academic_year_end': self.academic_year + 1,
+                    'student_id': 100000 + i,
+                }
+                for i, sid in enumerate(ids)
+            ]
+        return self._students
+
+    def reference_tables(self) -> Dict[str, List[Dict[str, Any]]]:
+        """Reference rows in foreign-key order."""
+        return {
+            'categories': self.categories(),
+            'subcategories': self.subcategories(),
+            'companies': self.companies(),
+            'students': self.students(),
+        }
+
+    # ---------- Generated tables ----------
+    def iter_blocks(self) -> Iterator[Dict[str, List[Dict[str, Any]]]]:
+        """Yield {'student_subcategory_scores': rows, 'event_submissions': rows} per block of students."""
+        students = self.students()
+        for block, start in enumerate(range(0, self.n_students, self.BLOCK_SIZE)):
+            rng = np.random.default_rng([self.seed, 1, block])
+            student_ids = [s['id'] for s in students[start:start + self.BLOCK_SIZE]]
+            scores: List[Dict[str, Any]] = []
+            submissions: List[Dict[str, Any]] = []
+            for name, profile in SUBCATEGORY_PROFILES.items():
+                self._generate_subcategory(rng, name, profile, student_ids, scores, submissions)
+            yield {'student_subcategory_scores': scores, 'event_submissions': submissions}
+
+    def _instance_days(self, n: int) -> np.ndarray:
+        """Day offsets of `n` scheduled instances spread evenly from the start of the year to the calculation date."""
+        span = (self.calculation_date - self.year_start).days
+        return np.linspace(0, span, n + 1)[:n].astype(int) if span > 0 else np.zeros(n, dtype=int)
+
+    def _generate_subcategory(
+        self,
+        rng: np.random.Generator,
+        name: str,
+        profile: Dict[str, Any],
+        student_ids: Sequence[str],
+        scores: List[Dict[str, Any]],
+        submissions: List[Dict[str, Any]],
+    ) -> None:
+        m, n = len(student_ids), profile['instances']
+        kind = profile['kind']
+        a, b = self.distributions[name]
+        p = rng.beta(a, b, size=m)
+        hit = rng.random((m, n)) < p[:, None]
+        span = max((self.calculation_date - self.year_start).days, 0)
+
+        if kind in ('attendance', 'monthly'):
+            raw = hit.sum(axis=1) / n * 100.0
+            emit, days, values = np.ones_like(hit), np.broadcast_to(self._instance_days(n), hit.shape), hit
+            data_points = np.full(m, n)
+        elif kind == 'gbe':
+            bonus = np.where(hit, rng.binomial(5, (p * 0.5)[:, None], size=(m, n)), 0)
+            raw = np.clip(hit.sum(axis=1) / n * 100.0 + bonus.sum(axis=1), 0.0, 100.0)
+            emit, days, values = hit, np.broadcast_to(self._instance_days(n), hit.shape), bonus
+            data_points = hit.sum(axis=1)
+        elif kind == 'rating':
+            ratings = np.clip(np.rint(1 + 4 * p[:, None] + rng.normal(0, 0.7, size=(m, n))), 1, 5)
+            counts = hit.sum(axis=1)
+            with np.errstate(invalid='ignore'):
+                raw = np.where(counts > 0, (ratings * hit).sum(axis=1) / np.maximum(counts, 1) * 20.0, 0.0)
+            emit, days, values = hit, rng.integers(0, span + 1, size=(m, n)), ratings
+            data_points = counts
+        elif kind == 'hours':
+            hours = np.rint(rng.uniform(1.0, 2.0 + 8.0 * p[:, None], size=(m, n)) * 2) / 2
+            days = rng.integers(0, span + 1, size=(m, n))
+            # A student's hours on one day count up to 8 together
+            served = hours * hit
+            daily = ((days[:, :, None] == days[:, None, :]) * served[:, None, :]).sum(axis=2)
+            capped = served * np.where(daily > 8.0, 8.0 / np.maximum(daily, 8.0), 1.0)
+            raw = np.minimum(capped.sum(axis=1), 12.0)
+            emit, values = hit, hours
+            data_points = hit.sum(axis=1)
+        elif kind == 'points':
+            points = rng.integers(5, 51, size=(m, n))
+            raw = (points * hit).sum(axis=1).astype(float)
+            emit, days, values = hit, rng.integers(0, span + 1, size=(m, n)), points
+            data_points = hit.sum(axis=1)
+        elif kind == 'grade':
+            raw = np.clip(4.0 * p, 0.0, 4.0)
+            emit, days, values = None, None, None
+            data_points = np.ones(m, dtype=int)
+        else:
+            raise ValueError(f"Unknown subcategory kind {kind!r}")
+
+        subcategory_id = self.subcategory_id(name)
+        raw = np.round(raw, 2)
+        score_ids = _random_ids(rng, m)
+        calculation_date = self.calculation_date.isoformat()
+        for i, sid in enumerate(student_ids):
+            scores.append({
+                'id': score_ids[i],
+                'student_id': sid,
+                'subcategory_id': subcategory_id,
+                'score': float(raw[i]),
+                'normalized_score': None,
+                'data_points_count': int(data_points[i]),
+                'academic_year_start': self.academic_year,
+                'academic_year_end': self.academic_year + 1,
+                'calculation_date': calculation_date,
+            })
+
+        if emit is None or not self.include_submissions:
+            return
+        rows, cols = np.nonzero(emit)
+        submission_ids = _random_ids(rng, len(rows))
+        event_ids = [_stable_id('event', name, j) for j in range(n)] if kind in ('attendance', 'monthly', 'gbe') else None
+        for k, (i, j) in enumerate(zip(rows.tolist(), cols.tolist())):
+            day = self.year_start + timedelta(days=int(days[i, j]))
+            submitted_at = datetime.combine(day, time(12, 0), tzinfo=timezone.utc).isoformat()
+            data, points = self._submission_data(profile, day, bool(hit[i, j]), values[i, j])
+            reviewed = profile['submission_type'] in REVIEWED_SUBMISSION_TYPES
+            submissions.append({
+                'id': submission_ids[k],
+                'event_id': event_ids[j] if event_ids else None,
+                'student_id': student_ids[i],
+                'submitted_by': student_ids[i],
+                'submission_data': data,
+                'submitted_at': submitted_at,
+                'subcategory_id': subcategory_id,
+                'needs_approval': reviewed,
+                'approval_status': 'approved',
+                'approved_by': None,
+                'approved_at': submitted_at,
+                'points_granted': points,
+            })
+
+    @staticmethod
+    def _submission_data(profile: Dict[str, Any], day: date, hit: bool, value: Any) -> Tuple[Dict[str, Any], Optional[float]]:
+        """`submission_data` payload (shapes from packages/types event-submissions) and points granted."""
+        submission_type = profile['submission_type']
+        kind = profile['kind']
+        if kind == 'attendance':
+            return {'submission_type': submission_type, 'status': 'present' if hit else 'absent'}, None
+        if kind == 'monthly':
+            return {'submission_type': submission_type, 'status': 'involved' if hit else 'not_involved'}, None
+        if kind == 'hours':
+            return {
+                'submission_type': submission_type,
+                'hours': float(value),
+                'organization': 'Synthetic Community Partner',
+                'date_of_service': day.isoformat(),
+            }, None
+        if submission_type == 'team_participation':
+            team_type = 'chapel_team' if kind == 'rating' else 'fellow_friday_team'
+            return {
+                'submission_type': submission_type,
+                'team_type': team_type,
+                'date_of_participation': day.isoformat(),
+                'points': float(value),
+            }, float(value)
+        if kind == 'points':
+            return {'submission_type': submission_type, 'assigned_points': float(value)}, float(value)
+        # rating and gbe: officer-entered points
+        return {'submission_type': submission_type, 'points': float(value)}, float(value)
+
+    # ---------- Sinks ----------
+    def write_to_storage(
+        self,
+        storage: StorageBackend,
+        chunk_size: int = BulkWriter.DEFAULT_CHUNK_SIZE,
+    ) -> Dict[str, int]:
+        """Insert the reference tables and every generated block through chunked bulk upserts."""
+        writer = BulkWriter(as_storage(storage), chunk_size=chunk_size)
+        written: Dict[str, int] = {}
+        for table, rows in self.reference_tables().items():
+            written[table] = writer.upsert(table, rows)
+        for block in self.iter_blocks():
+            for table, rows in block.items():
+                written[table] = written.get(table, 0) + writer.upsert(table, rows)
+        logger.info(f"Wrote synthetic population: {written}")
+        return written
+
+    def write_csv(self, directory: str) -> Dict[str, str]:
+        """Stream every table to `<directory>/<table>.csv`; JSON columns are written as JSON text."""
+        os.makedirs(directory, exist_ok=True)
+        paths: Dict[str, str] = {}
+        for table, rows in self.reference_tables().items():
+            paths[table] = self._write_csv_rows(os.path.join(directory, f'{table}.csv'), rows)
+        columns = {'student_subcategory_scores': SCORE_COLUMNS, 'event_submissions': SUBMISSION_COLUMNS}
+        files = {t: open(os.path.join(directory, f'{t}.csv'), 'w', newline='') for t in GENERATED_TABLES}
+        try:
+            writers = {t: csv.DictWriter(f, fieldnames=columns[t]) for t, f in files.items()}
+            for w in writers.values():
+                w.writeheader()
+            for block in self.iter_blocks():
+                for table, rows in block.items():
+                    writers[table].writerows(self._flatten(r) for r in rows)
+        finally:
+            for f in files.values():
+                f.close()
+        paths.update({t: f.name for t, f in files.items()})
+        return paths
+
+    def write_parquet(self, directory: str) -> Dict[str, str]:
+        """Stream every table to `<directory>/<table>.parquet`, one row group per block. Requires pyarrow."""
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError("Parquet output requires pyarrow (pip install pyarrow)") from e
+
+        os.makedirs(directory, exist_ok=True)
+        paths: Dict[str, str] = {}
+        for table, rows in self.reference_tables().items():
+            paths[table] = os.path.join(directory, f'{table}.parquet')
+            pq.write_table(pa.Table.from_pylist(rows), paths[table])
+        writers: Dict[str, Any] = {}
+        try:
+            for block in self.iter_blocks():
+                for table, rows in block.items():
+                    if not rows:
+                        continue
+                    batch = pa.Table.from_pylist([self._flatten(r) for r in rows])
+                    if table not in writers:
+                        paths[table] = os.path.join(directory, f'{table}.parquet')
+                        writers[table] = pq.ParquetWriter(paths[table], batch.schema)
+                    writers[table].write_table(batch.cast(writers[table].schema))
+        finally:
+            for w in writers.values():
+                w.close()
+        return paths
+
+    @staticmethod
+    def _flatten(row: Dict[str, Any]) -> Dict[str, Any]:
+        if isinstance(row.get('submission_data'), dict):
+            row = dict(row, submission_data=json.dumps(row['submission_data']))
+        return row
+
+    @staticmethod
+    def _write_csv_rows(path: str, rows: List[Dict[str, Any]]) -> str:
+        with open(path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]) if rows else [])
+            writer.writeheader()
+            writer.writerows(rows)
+        return path
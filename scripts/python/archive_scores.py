@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+ACU Blueprint Holistic GPA Scoring System - Score Archive
+
+Exports older days of the six daily score tables to partitioned Parquet files
+(`<root>/<table>/year=<academic year>/date=<day>/part-0.parquet`) and optionally
+prunes them from the database, keeping the last day of each week with
+--keep-weekly. Requires pyarrow.
+
+Usage:
+    python archive_scores.py --academic-year 2024 [--root score_archive] [--prune [--keep-weekly]]
+    python archive_scores.py --before 2025-09-01 [--start 2025-08-01] [--tables student_holistic_gpa]
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+from datetime import date
+
+from dotenv import load_dotenv
+
+# Add the scripts directory to the Python path for imports
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from apex_scoring.archive import SCORE_TABLES, ScoreArchive
+from apex_scoring.db import DEFAULT_PAGE_SIZE
+from apex_scoring.storage import DEFAULT_SCHEMA_PATH, SQLiteStorage, SupabaseStorage
+
+load_dotenv()
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='ACU Blueprint score archive')
+    window = parser.add_mutually_exclusive_group(required=True)
+    window.add_argument('--academic-year', type=int,
+                        help='Archive a closed academic year (1 August YEAR to 31 July YEAR+1)')
+    window.add_argument('--before', metavar='YYYY-MM-DD', help='Archive every day before this date')
+    parser.add_argument('--start', metavar='YYYY-MM-DD', help='With --before, only archive days from this date')
+    parser.add_argument('--tables', nargs='+', choices=SCORE_TABLES, default=list(SCORE_TABLES),
+                        help='Tables to archive (default: all six score tables)')
+    parser.add_argument('--root', default='score_archive', help='Archive directory (default: score_archive)')
+    parser.add_argument('--prune', action='store_true', help='Delete archived days from the database')
+    parser.add_argument('--keep-weekly', action='store_true',
+                        help='With --prune, keep the last scored day of each week in the database')
+    parser.add_argument('--page-size', type=int, default=DEFAULT_PAGE_SIZE,
+                        help=f'Rows per read request (default: {DEFAULT_PAGE_SIZE})')
+    parser.add_argument('--local-db', metavar='PATH',
+                        help='Archive from a local SQLite database instead of Supabase')
+    parser.add_argument('--schema', default=DEFAULT_SCHEMA_PATH,
+                        help='Schema fixture to load into --local-db (default: apex_scoring/fixtures/schema.sql)')
+    args = parser.parse_args()
+
+    if args.academic_year is not None:
+        start, end = date(args.academic_year, 8, 1), date(args.academic_year + 1, 8, 1)
+        if end > date.today():
+            logger.error(f"Academic year {args.academic_year} is not closed yet; use --before for older days")
+            sys.exit(1)
+    else:
+        start = date.fromisoformat(args.start) if args.start else None
+        end = date.fromisoformat(args.before)
+
+    if args.local_db:
+        storage = SQLiteStorage(args.local_db, schema_path=args.schema)
+    else:
+        supabase_url = os.getenv('NEXT_PUBLIC_SUPABASE_URL')
+        supabase_key = os.getenv('SUPABASE_SERVICE_ROLE_KEY')
+        if not supabase_url or not supabase_key:
+            logger.error("Missing Supabase credentials. Please set NEXT_PUBLIC_SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY environment variables.")
+            sys.exit(1)
+        storage = SupabaseStorage.connect(supabase_url, supabase_key)
+
+    archive = ScoreArchive(storage, args.root, page_size=args.page_size)
+    summary = archive.archive(end, start=start, tables=args.tables, prune=args.prune, keep_weekly=args.keep_weekly)
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -44,7 +44,8 @@ cp -r . "$PACKAGE_DIR/"
 
 # Install dependencies in the package directory
 cd "$PACKAGE_DIR"
-pip install -r requirements.txt -t .
+# Runtime dependencies only; dev and notebook tooling stay out of the function package
+pip install -r requirements-lambda.txt -t .
 
 # Remove unnecessary files
 find . -type d -name "__pycache__" -exec rm -rf {} + 2>/dev/null || true
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+ACU Blueprint Holistic GPA Scoring System - Pipeline Benchmarks
+
+Times every phase of `DailyScoreCalculator.run_daily_calculation`, plus the bell
+curve transform on its own, against synthetic populations loaded into a local
+SQLite database. The cold import of `daily_score_calculation` (the Lambda
+handler's module) is timed in a fresh interpreter. Results are written as JSON. When a baseline JSON is given, the
+script exits non-zero if any benchmark slowed down past the allowed ratio.
+
+Usage:
+    python benchmark_pipeline.py [--sizes 1000 10000 100000] [--modes snapshot set-based]
+                                 [--repeat 3] [--output results.json]
+                                 [--baseline previous.json] [--max-slowdown 1.25]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import date, datetime, timezone
+from typing import Dict, List, Optional
+
+import numpy as np
+import structlog
+
+# Add the scripts directory to the Python path for imports
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from apex_scoring.bell_curve import BellCurveCalculator
+from apex_scoring.db import BulkWriter
+from apex_scoring.storage import DEFAULT_SCHEMA_PATH, SQLiteStorage
+from apex_scoring.synthetic import PopulationGenerator
+from daily_score_calculation import DailyScoreCalculator
+
+logger = logging.getLogger(__name__)
+
+ACADEMIC_YEAR = 2025
+CALCULATION_DATE = date(2025, 10, 1)
+
+# Modules the Lambda handler should not load at import time
+HEAVY_MODULES = ('pandas', 'scipy', 'supabase', 'pyarrow')
+
+MODES = {
+    'legacy': {'set_based': False, 'use_snapshot': False},
+    'set-based': {'set_based': True, 'use_snapshot': False},
+    'snapshot': {'set_based': False, 'use_snapshot': True},
+}
+
+
+def _summarize(runs: List[float]) -> Dict[str, object]:
+    return {'runs': runs, 'min': min(runs), 'median': statistics.median(runs), 'max': max(runs)}
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def load_population(n_students: int, seed: int, write_chunk_size: int) -> SQLiteStorage:
+    """Generate `n_students` and load their score rows into an in-memory database."""
+    storage = SQLiteStorage(':memory:', schema_path=DEFAULT_SCHEMA_PATH)
+    generator = PopulationGenerator(
+        n_students,
+        seed=seed,
+        academic_year=ACADEMIC_YEAR,
+        calculation_date=CALCULATION_DATE,
+        include_submissions=False,
+    )
+    generator.write_to_storage(storage, chunk_size=write_chunk_size)
+    return storage
+
+
+def benchmark_bell_curve(n_students: int, seed: int, repeat: int) -> List[float]:
+    raw = np.random.default_rng(seed).gamma(2.0, 20.0, size=n_students)
+    calculator = BellCurveCalculator()
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        calculator.apply_bell_curve_to_array(raw)
+        runs.append(time.perf_counter() - start)
+    return runs
+
+
+def benchmark_import(module: str, repeat: int) -> Dict[str, object]:
+    """Cold import of `module` in a fresh interpreter, `repeat` times; also lists heavy modules it pulled in."""
+    code = (
+        'import json, sys, time\n'
+        'start = time.perf_counter()\n'
+        f'import {module}\n'
+        'seconds = time.perf_counter() - start\n'
+        f'print(json.dumps({{"seconds": seconds, "heavy": [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))\n'
+    )
+    runs, heavy = [], []
+    for _ in range(repeat):
+        out = subprocess.run(
+            [sys.executable, '-c', code], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout
+        result = json.loads(out.strip().splitlines()[-1])
+        runs.append(result['seconds'])
+        heavy = result['heavy']
+    return {**_summarize(runs), 'heavy_modules': heavy}
+
+
+def benchmark_pipeline(base: SQLiteStorage, mode: str, repeat: int, write_chunk_size: int) -> Dict[str, List[float]]:
+    """Run the daily calculation `repeat` times on fresh copies of `base`; seconds per phase and in total."""
+    timings: Dict[str, List[float]] = {}
+    for _ in range(repeat):
+        storage = base.clone()
+        calculator = DailyScoreCalculator(write_chunk_size=write_chunk_size, storage=storage)
+        start = time.perf_counter()
+        results = asyncio.run(calculator.run_daily_calculation(
+            academic_year=ACADEMIC_YEAR,
+            calculation_date=CALCULATION_DATE,
+            **MODES[mode],
+        ))
+        timings.setdefault('total', []).append(time.perf_counter() - start)
+        for phase in results['phases']:
+            timings.setdefault(phase['phase'], []).append(phase['execution_time_seconds'])
+        storage.close()
+    return timings
+
+
+def run_benchmarks(args: argparse.Namespace) -> Dict[str, object]:
+    benchmarks: Dict[str, Dict[str, object]] = {}
+    # Lambda cold start: what loading the handler module costs
+    name = 'import/daily_score_calculation'
+    benchmarks[name] = benchmark_import('daily_score_calculation', args.repeat)
+    print(f"  {name}: median {benchmarks[name]['median']:.3f}s, heavy modules: {benchmarks[name]['heavy_modules'] or 'none'}")
+
+    for n_students in args.sizes:
+        setup_start = time.perf_counter()
+        base = load_population(n_students, args.seed, args.write_chunk_size)
+        print(f"{n_students} students: population loaded in {time.perf_counter() - setup_start:.1f}s")
+
+        benchmarks[f'{n_students}/bell_curve'] = _summarize(benchmark_bell_curve(n_students, args.seed, args.repeat))
+        for mode in args.modes:
+            for phase, runs in benchmark_pipeline(base, mode, args.repeat, args.write_chunk_size).items():
+                name = f'{n_students}/{mode}/{phase}'
+                benchmarks[name] = _summarize(runs)
+                print(f"  {name}: median {benchmarks[name]['median']:.3f}s")
+        base.close()
+
+    return {
+        'metadata': {
+            'created_at': datetime.now(timezone.utc).isoformat(),
+            'git_revision': _git_revision(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'seed': args.seed,
+            'repeat': args.repeat,
+        },
+        'benchmarks': benchmarks,
+    }
+
+
+def compare_to_baseline(current: Dict[str, object], baseline: Dict[str, object], max_slowdown: float, min_delta: float) -> List[str]:
+    """Names of benchmarks whose median slowed down by more than `max_slowdown` (and `min_delta` seconds)."""
+    regressions = []
+    for name, result in current['benchmarks'].items():
+        previous = baseline['benchmarks'].get(name)
+        if previous is None:
+            continue
+        now, before = result['median'], previous['median']
+        ratio = now / before if before > 0 else float('inf')
+        flagged = ratio > max_slowdown and now - before > min_delta
+        if flagged:
+            regressions.append(name)
+        print(f"  {'REGRESSION' if flagged else 'ok':<10} {name}: {before:.3f}s -> {now:.3f}s ({ratio:.2f}x)")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='ACU Blueprint scoring pipeline benchmarks')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000],
+                        help='Synthetic population sizes (default: 1000 10000 100000)')
+    parser.add_argument('--modes', nargs='+', choices=sorted(MODES), default=['snapshot', 'set-based'],
+                        help='Pipeline modes to time (default: snapshot set-based; legacy is slow past 1k students)')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per benchmark (default: 3)')
+    parser.add_argument('--seed', type=int, default=0, help='Population seed (default: 0)')
+    parser.add_argument('--write-chunk-size', type=int, default=BulkWriter.DEFAULT_CHUNK_SIZE,
+                        help=f'Rows per bulk write (default: {BulkWriter.DEFAULT_CHUNK_SIZE})')
+    parser.add_argument('--output', default='benchmark_results.json', help='Where to write the results JSON')
+    parser.add_argument('--baseline', help='Previous results JSON to compare against')
+    parser.add_argument('--max-slowdown', type=float, default=1.25,
+                        help='Fail when a median is more than this many times the baseline (default: 1.25)')
+    parser.add_argument('--min-delta', type=float, default=0.05,
+                        help='Ignore slowdowns smaller than this many seconds (default: 0.05)')
+    args = parser.parse_args()
+
+    # Keep per-phase INFO logging (stdlib and structlog) out of the timings and the console
+    logging.getLogger().setLevel(logging.WARNING)
+    structlog.configure(wrapper_class=structlog.make_filtering_bound_logger(logging.WARNING))
+
+    results = run_benchmarks(args)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print(f"Comparing against {args.baseline} (max slowdown {args.max_slowdown}x)")
+        regressions = compare_to_baseline(results, baseline, args.max_slowdown, args.min_delta)
+        if regressions:
+            print(f"{len(regressions)} benchmark(s) regressed past {args.max_slowdown}x")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -8,28 +8,42 @@ with normalized scores using a bell curve distribution.
 
 Usage:
     python scripts/daily_score_calculation.py [--academic-year YEAR] [--batch-size SIZE] [--dry-run]
+    python scripts/daily_score_calculation.py --backfill START END [--processes N] [--raw-scores]
+    python scripts/daily_score_calculation.py --shards N [--calculation-date DAY] [--raw-scores]
+    python scripts/daily_score_calculation.py --shadow SINK.db [--calculation-date DAY] [--shadow-report PATH]
 
 Author: ACU Blueprint Development Team
 Date: 2024
 """
 
 import asyncio
+import functools
+import json
 import logging
 import os
 import sys
-from datetime import datetime, date
-from typing import List, Dict, Optional, Tuple
+from datetime import datetime, date, timezone
+from typing import Any, Callable, List, Dict, Optional, Tuple
 import argparse
 
-import pandas as pd
-import numpy as np
-from supabase import create_client, Client
 from dotenv import load_dotenv
 
 # Add the scripts directory to the Python path for imports
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from apex_scoring.aggregators import SubcategoryAggregator
+from apex_scoring.aggregators import NORMALIZE_UNIT, SubcategoryAggregator
+from apex_scoring.concurrency import DEFAULT_MAX_WORKERS, TaskPool
+from apex_scoring.db import BulkWriter, paged_select
+from apex_scoring.incremental import (
+    IncrementalDay, carry_forward_scores, default_watermark, find_baseline_day, find_changed_submissions,
+)
+from apex_scoring.journal import RunJournal
+from apex_scoring.leaderboards import RANK_UNIT, RankIndexBuilder
+from apex_scoring.sketches import SketchStore, k_for_error
+from apex_scoring.metrics import InstrumentedStorage, PipelineMetrics
+from apex_scoring.raw_scores import RawScoreEngine
+from apex_scoring.storage import DEFAULT_SCHEMA_PATH, SQLiteStorage, StorageBackend, SupabaseStorage
+from apex_scoring.snapshot import DaySnapshot
 from apex_scoring.company_scores import (
     StudentCategoryHolisticCalculator,
     CompanyScoreCalculator,
@@ -45,6 +59,19 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Journal unit of a snapshot run whose phases all completed and flushed
+SNAPSHOT_UNIT = 'snapshot'
+
+
+def _flush_summary(written: Dict[str, int], snapshot: DaySnapshot) -> Dict[str, Any]:
+    """Phase summary of a snapshot flush: rows written per table and the rows it did not send."""
+    counts = snapshot.write_counts.values()
+    return {
+        'rows_written': written,
+        'rows_skipped': sum(c['rows_skipped'] for c in counts),
+        'rows_carried_forward': sum(c['rows_carried_forward'] for c in counts),
+    }
+
 
 class DailyScoreCalculator:
     """
@@ -58,20 +85,52 @@ class DailyScoreCalculator:
     5. Updates company standings
     """
     
-    def __init__(self, supabase_url: str, supabase_key: str):
-        """Initialize the calculator with Supabase client."""
-        self.supabase: Client = create_client(supabase_url, supabase_key)
+    def __init__(
+        self,
+        supabase_url: Optional[str] = None,
+        supabase_key: Optional[str] = None,
+        write_chunk_size: int = BulkWriter.DEFAULT_CHUNK_SIZE,
+        storage: Optional[StorageBackend] = None,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        sketch_k: Optional[int] = None,
+    ):
+        """Initialize the calculator with a storage backend (a Supabase client unless `storage` is given).
+
+        `max_workers` bounds how many independent subcategories are
+        processed concurrently (and sizes the Supabase connection pool).
+        With `sketch_k`, each run also updates the cohort score sketches
+        (`apex_scoring.sketches`) with that sketch size.
+        """
+        if storage is None:
+            storage = SupabaseStorage.connect(supabase_url, supabase_key, max_connections=max(max_workers, 1) + 2)
+        # Every phase reads and writes through the instrumented wrapper so it can be measured
+        self.storage = InstrumentedStorage(storage)
+        self.metrics = PipelineMetrics(self.storage)
+        # Run journal of the current resumable run (see `run_daily_calculation(resume=True)`)
+        self.journal: Optional[RunJournal] = None
+        self.writer = BulkWriter(self.storage, chunk_size=write_chunk_size)
         # Use notebook-exported calculators (no DB RPCs)
-        self.subcategory_aggregator = SubcategoryAggregator(self.supabase)
-        self.student_calculator = StudentCategoryHolisticCalculator(self.supabase)
-        self.company_calculator = CompanyScoreCalculator(self.supabase)
+        self.pool = TaskPool(max_workers=max_workers)
+        self.raw_score_engine = RawScoreEngine(self.storage, write_chunk_size=write_chunk_size)
+        self.subcategory_aggregator = SubcategoryAggregator(self.storage, write_chunk_size=write_chunk_size, pool=self.pool)
+        self.student_calculator = StudentCategoryHolisticCalculator(self.storage, write_chunk_size=write_chunk_size)
+        self.company_calculator = CompanyScoreCalculator(self.storage, write_chunk_size=write_chunk_size)
+        self.rank_indexes = RankIndexBuilder(self.storage, write_chunk_size=write_chunk_size)
+        self.sketches = SketchStore(self.storage, k=sketch_k, write_chunk_size=write_chunk_size) if sketch_k else None
         
     async def run_daily_calculation(
         self, 
         academic_year: Optional[int] = None,
         calculation_date: Optional[date] = None,
         batch_size: int = 50,
-        dry_run: bool = False
+        dry_run: bool = False,
+        set_based: bool = False,
+        use_snapshot: bool = False,
+        incremental: bool = False,
+        since: Optional[str] = None,
+        calculate_raw_scores: bool = False,
+        resume: bool = False,
+        changes_only: bool = False
     ) -> Dict[str, any]:
         """
         Run the complete daily scoring calculation process.
@@ -81,6 +140,23 @@ class DailyScoreCalculator:
             calculation_date: Date for calculation (defaults to today)
             batch_size: Number of students to process per batch
             dry_run: If True, don't update database
+            set_based: If True, compute student category scores and holistic GPAs
+                for the whole day in one pass instead of per student
+            use_snapshot: If True, load the day once into a DaySnapshot, run every
+                phase against it in memory and flush all writes at the end
+            incremental: If True, only recompute what changed since the last scored
+                day and carry everything else forward (falls back to a full snapshot
+                run when there is no earlier scored day)
+            since: Submission watermark for the incremental run (ISO timestamp);
+                defaults to when the last scored day was written
+            calculate_raw_scores: If True, first compute the day's raw subcategory
+                scores from approved event submissions (incremental runs always
+                recompute them for the changed students)
+            resume: If True, record completed units of work in the run journal and
+                skip the units an earlier run of the same day already completed
+            changes_only: If True, raw scores and the snapshot and incremental flushes
+                only write the rows that differ from the day's stored rows, or from the
+                previous day's (copied forward on the server) when the day is new
             
         Returns:
             Dictionary with calculation results and statistics
@@ -93,80 +169,141 @@ class DailyScoreCalculator:
             
         logger.info(f"Starting daily score calculation for academic year {academic_year}")
         logger.info(f"Calculation date: {calculation_date}, Batch size: {batch_size}")
-        logger.info(f"Dry run mode: {dry_run}")
+        logger.info(f"Dry run mode: {dry_run}, Set-based mode: {set_based}, Snapshot mode: {use_snapshot}, "
+                    f"Incremental mode: {incremental}, Raw scores: {calculate_raw_scores}, Changes only: {changes_only}")
         
         start_time = datetime.now()
+        self.metrics = PipelineMetrics(self.storage, calculation_date=calculation_date.isoformat())
         results = {
             'academic_year': academic_year,
             'calculation_date': calculation_date.isoformat(),
             'batch_size': batch_size,
             'dry_run': dry_run,
+            'set_based': set_based,
+            'use_snapshot': use_snapshot,
+            'incremental': incremental,
+            'calculate_raw_scores': calculate_raw_scores,
+            'resume': resume,
+            'changes_only': changes_only,
             'phases': [],
             'total_execution_time': None,
             'status': 'in_progress'
         }
         
         try:
+            self.journal = RunJournal(self.storage, calculation_date.isoformat()) if resume and not dry_run else None
+            snapshot = None
+            incremental_applied = False
+            if incremental and not dry_run:
+                snapshot = self._run_incremental_phases(results, academic_year, calculation_date, since, changes_only)
+                incremental_applied = snapshot is not None
+                results['incremental'] = incremental_applied
+                # No earlier scored day to start from: do a full snapshot run instead
+                use_snapshot = use_snapshot or not incremental_applied
+
+            # Raw subcategory scores (optional): from event submissions in one vectorized pass
+            if calculate_raw_scores and not dry_run and not incremental_applied:
+                self._run_phase(
+                    results, 'Calculate Raw Subcategory Scores',
+                    lambda: self.raw_score_engine.compute_and_write(academic_year, calculation_date, changes_only=changes_only),
+                    lambda r: r,
+                    unit='raw_scores',
+                )
+
+            # A resumed snapshot run that already flushed everything has nothing left to do
+            snapshot_done = (
+                use_snapshot and snapshot is None and not dry_run
+                and self._skip_completed(results, 'Snapshot Phases', SNAPSHOT_UNIT)
+            )
+            if use_snapshot and snapshot is None and not snapshot_done:
+                snapshot = self._run_phase(
+                    results, 'Load Day Snapshot',
+                    lambda: DaySnapshot.load(self.storage, calculation_date.isoformat()),
+                    lambda r: {'score_rows': r.score_count, 'snapshot_bytes': r.nbytes},
+                )
+            # Phases 2-5 one table at a time (no snapshot)
+            per_phase = snapshot is None and not snapshot_done
+
             # Phase 1: Get all students for this academic year
-            students = await self._get_students(academic_year)
+            students = await self._get_students(academic_year, snapshot)
             total_students = len(students)
             logger.info(f"Found {total_students} students to process")
+
+            # Phases 2-5 (snapshot): in-memory against the snapshot, writes flushed at the end
+            if not dry_run and snapshot is not None and not incremental_applied:
+                self._run_snapshot_phases(snapshot, results, changes_only)
             
             # Phase 2: Normalize latest-day subcategory scores (non-GPA via bell curve, GPA = score)
-            if not dry_run:
-                phase_start = datetime.now()
-                norm_result = self.subcategory_aggregator.normalize_all_subcategories_for_latest_day()
-                phase_time = (datetime.now() - phase_start).total_seconds()
-                results['phases'].append({
-                    'phase': 'Normalize Subcategory Scores (latest day)',
-                    'subcategories_processed': len(norm_result.get('results', {})),
-                    'execution_time_seconds': phase_time,
-                    'status': 'completed'
-                })
+            if not dry_run and per_phase:
+                self._run_phase(
+                    results, 'Normalize Subcategory Scores (latest day)',
+                    lambda: self.subcategory_aggregator.normalize_all_subcategories_for_latest_day(journal=self.journal),
+                    lambda r: {'subcategories_processed': len(r.get('results', {})),
+                               'rows_written': r.get('rows_written', 0)},
+                    unit=NORMALIZE_UNIT,
+                )
+
+            # Phases 3+4 (set-based): one read of the day, grouped in memory, bulk upserts
+            if not dry_run and per_phase and set_based:
+                self._run_phase(
+                    results, 'Calculate Student Category Scores and Holistic GPAs (set-based)',
+                    lambda: self.student_calculator.compute_student_scores_for_day_bulk(calculation_date.isoformat()),
+                    lambda r: {'category_rows_upserted': r.get('student_category_rows_upserted', 0),
+                               'holistic_rows_upserted': r.get('student_holistic_rows_upserted', 0)},
+                    unit='student_scores',
+                )
 
             # Phase 3: Student category scores
-            if not dry_run:
-                phase_start = datetime.now()
-                cat_res = self.student_calculator.compute_student_category_scores_for_day(calculation_date.isoformat())
-                phase_time = (datetime.now() - phase_start).total_seconds()
-                results['phases'].append({
-                    'phase': 'Calculate Student Category Scores',
-                    'rows_upserted': cat_res.get('student_category_rows_upserted', 0),
-                    'execution_time_seconds': phase_time,
-                    'status': 'completed'
-                })
+            if not dry_run and per_phase and not set_based:
+                self._run_phase(
+                    results, 'Calculate Student Category Scores',
+                    lambda: self.student_calculator.compute_student_category_scores_for_day(calculation_date.isoformat()),
+                    lambda r: {'rows_upserted': r.get('student_category_rows_upserted', 0)},
+                    unit='student_category_scores',
+                )
 
             # Phase 4: Student holistic GPAs
-            if not dry_run:
-                phase_start = datetime.now()
-                hol_res = self.student_calculator.compute_student_holistic_gpa_for_day(calculation_date.isoformat())
-                phase_time = (datetime.now() - phase_start).total_seconds()
-                results['phases'].append({
-                    'phase': 'Calculate Student Holistic GPAs',
-                    'rows_upserted': hol_res.get('student_holistic_rows_upserted', 0),
-                    'execution_time_seconds': phase_time,
-                    'status': 'completed'
-                })
+            if not dry_run and per_phase and not set_based:
+                self._run_phase(
+                    results, 'Calculate Student Holistic GPAs',
+                    lambda: self.student_calculator.compute_student_holistic_gpa_for_day(calculation_date.isoformat()),
+                    lambda r: {'rows_upserted': r.get('student_holistic_rows_upserted', 0)},
+                    unit='student_holistic_gpa',
+                )
 
             # Phase 5: Company scores
+            if not dry_run and per_phase:
+                self._run_phase(
+                    results, 'Update Company Scores',
+                    lambda: self.company_calculator.compute_company_scores_for_day(calculation_date.isoformat()),
+                    lambda r: {'subcategory_rows': r.get('company_subcategory_rows_upserted', 0),
+                               'category_rows': r.get('company_category_rows_upserted', 0),
+                               'holistic_rows': r.get('company_holistic_rows_upserted', 0)},
+                    unit='company_scores',
+                )
+
+            # Phase 6: Student and company rank indexes, so standings are read instead of sorted
             if not dry_run:
-                phase_start = datetime.now()
-                comp_sub = self.company_calculator.compute_company_subcategory_scores_for_day(calculation_date.isoformat())
-                comp_cat = self.company_calculator.compute_company_category_scores_for_day(calculation_date.isoformat())
-                comp_hol = self.company_calculator.compute_company_holistic_gpa_for_day(calculation_date.isoformat())
-                phase_time = (datetime.now() - phase_start).total_seconds()
-                results['phases'].append({
-                    'phase': 'Update Company Scores',
-                    'subcategory_rows': comp_sub.get('company_subcategory_rows_upserted', 0),
-                    'category_rows': comp_cat.get('company_category_rows_upserted', 0),
-                    'holistic_rows': comp_hol.get('company_holistic_rows_upserted', 0),
-                    'execution_time_seconds': phase_time,
-                    'status': 'completed'
-                })
+                self._run_phase(
+                    results, 'Build Rank Indexes',
+                    lambda: self.rank_indexes.build(calculation_date.isoformat(), changes_only=changes_only),
+                    lambda r: {k: v for k, v in r.items() if k != 'tables'},
+                    unit=RANK_UNIT,
+                )
+
+            # Phase 7: Cohort score sketches, the pooled reference populations for percentile ranks
+            if not dry_run and self.sketches is not None:
+                self._run_phase(
+                    results, 'Update Score Sketches',
+                    lambda: self.sketches.update_day(calculation_date.isoformat()),
+                    lambda r: r,
+                    unit='score_sketches',
+                )
             
             # Calculate total execution time
             total_time = (datetime.now() - start_time).total_seconds()
             results['total_execution_time'] = total_time
+            results['metrics'] = self.metrics.emit_totals()
             results['status'] = 'completed'
             
             logger.info(f"Daily calculation completed successfully in {total_time:.2f} seconds")
@@ -179,19 +316,164 @@ class DailyScoreCalculator:
             results['status'] = 'error'
             results['error'] = str(e)
             results['total_execution_time'] = (datetime.now() - start_time).total_seconds()
+            results['metrics'] = self.metrics.emit_totals()
             raise
+
+    def _run_phase(
+        self, results: Dict, name: str, run: Callable[[], Any], summarize: Callable[[Any], Dict],
+        unit: Optional[str] = None,
+    ) -> Any:
+        """Run one phase under `self.metrics` and append its summary and metrics to `results['phases']`.
+
+        A phase with a journal `unit` is skipped when a resumed run's journal has it
+        completed, and recorded there once it completes. An incomplete unit is replayed
+        whole, so its writes must be idempotent (upserts on natural keys).
+        """
+        if unit is not None and self._skip_completed(results, name, unit):
+            return None
+        with self.metrics.phase(name) as phase_metrics:
+            phase_result = run()
+        summary = summarize(phase_result)
+        results['phases'].append({
+            'phase': name,
+            **summary,
+            'execution_time_seconds': phase_metrics['wall_seconds'],
+            'metrics': {k: v for k, v in phase_metrics.items() if k != 'phase'},
+            'status': 'completed'
+        })
+        if unit is not None and self.journal is not None:
+            self.journal.record(unit, rows_written=phase_metrics['rows_written'], details=summary)
+        return phase_result
+
+    def _skip_completed(self, results: Dict, name: str, unit: str) -> bool:
+        """True (and the phase is listed as skipped) when the run journal has `unit` completed."""
+        entry = self.journal.get(unit) if self.journal is not None else None
+        if entry is None:
+            return False
+        logger.info(f"Skipping {name}: completed at {entry['completed_at']} by an earlier run")
+        results['phases'].append({
+            'phase': name,
+            **(entry.get('details') or {}),
+            'completed_at': entry['completed_at'],
+            'status': 'skipped',
+        })
+        return True
     
-    async def _get_students(self, academic_year: int) -> List[Dict]:
+    def _run_snapshot_phases(self, snapshot: DaySnapshot, results: Dict, changes_only: bool = False) -> None:
+        """Run normalization, student and company phases against `snapshot`, then flush all writes.
+
+        Derived rows are upserted on their natural keys, so a day that was already
+        scored (a rerun, or a shadow run of a stored day) is rescored in place.
+        """
+        phases = [
+            ('Normalize Subcategory Scores (snapshot)',
+             lambda: self.subcategory_aggregator.normalize_snapshot(snapshot),
+             lambda r: {'subcategories_processed': len(r.get('results', {}))}),
+            ('Calculate Student Category Scores and Holistic GPAs (snapshot)',
+             lambda: self.student_calculator.compute_student_scores_from_snapshot(snapshot, merge_existing=True),
+             lambda r: {'category_rows_staged': r.get('student_category_rows_upserted', 0),
+                        'holistic_rows_staged': r.get('student_holistic_rows_upserted', 0)}),
+            ('Update Company Scores (snapshot)',
+             lambda: self.company_calculator.compute_company_scores_from_snapshot(snapshot, merge_existing=True),
+             lambda r: {'subcategory_rows_staged': r.get('company_subcategory_rows_upserted', 0),
+                        'category_rows_staged': r.get('company_category_rows_upserted', 0),
+                        'holistic_rows_staged': r.get('company_holistic_rows_upserted', 0)}),
+            ('Flush Snapshot Writes',
+             lambda: snapshot.flush(self.writer, journal=self.journal, changes_only=changes_only),
+             lambda r: _flush_summary(r, snapshot)),
+        ]
+        for name, run, summarize in phases:
+            self._run_phase(results, name, run, summarize)
+        if self.journal is not None:
+            self.journal.record(SNAPSHOT_UNIT, details={'score_rows': snapshot.score_count})
+
+    def _run_incremental_phases(
+        self, results: Dict, academic_year: int, calculation_date: date, since: Optional[str],
+        changes_only: bool = False,
+    ) -> Optional[DaySnapshot]:
+        """Recompute only what changed since the last scored day. Returns None when there is no such day."""
+        day = calculation_date.isoformat()
+        run_started_at = datetime.now(timezone.utc).isoformat()
+        baseline_date = find_baseline_day(self.storage, day)
+        if baseline_date is not None and since is None:
+            since = default_watermark(self.storage, baseline_date)
+        if baseline_date is None or since is None:
+            logger.warning(f"No scored day on or before {day} to start from; running a full calculation")
+            return None
+        logger.info(f"Incremental run from baseline day {baseline_date}, submissions changed since {since}")
+        # A scheduler can persist 'next' and pass it back as `since` on the following run
+        results['watermark'] = {'baseline_date': baseline_date, 'since': since, 'next': run_started_at}
+
+        changes = self._run_phase(
+            results, 'Find Changed Submissions',
+            lambda: find_changed_submissions(self.storage, since),
+            lambda r: r.summary(),
+        )
+        if baseline_date != day:
+            self._run_phase(
+                results, 'Carry Forward Subcategory Scores',
+                lambda: carry_forward_scores(self.storage, self.writer, baseline_date, day),
+                lambda r: {'baseline_date': baseline_date, 'rows_carried_forward': r},
+            )
+        self._run_phase(
+            results, 'Recompute Raw Scores (changed students)',
+            lambda: self._recompute_raw_scores(changes.student_ids, academic_year, calculation_date),
+            lambda r: r,
+        )
+        snapshot = self._run_phase(
+            results, 'Load Day Snapshot',
+            lambda: DaySnapshot.load(self.storage, day),
+            lambda r: {'score_rows': r.score_count, 'snapshot_bytes': r.nbytes},
+        )
+        delta = self._run_phase(
+            results, 'Load Baseline Day',
+            lambda: IncrementalDay.load(self.storage, snapshot, changes, baseline_date),
+            lambda r: {'baseline_date': r.baseline_date, 'baseline_rows': r.baseline_row_count},
+        )
+        phases = [
+            ('Re-curve Changed Subcategories',
+             lambda: delta.apply_normalization(self.subcategory_aggregator),
+             lambda r: {'subcategories_recurved': len(r['recurved_subcategories']),
+                        'normalized_scores_carried_forward': r['carried_rows']}),
+            ('Recompute Changed Students',
+             lambda: delta.recompute_students(self.student_calculator),
+             lambda r: {'students_recomputed': r['students_recomputed'],
+                        'category_rows_staged': r.get('student_category_rows_upserted', 0),
+                        'holistic_rows_staged': r.get('student_holistic_rows_upserted', 0),
+                        'rows_carried_forward': r['student_rows_carried_forward']}),
+            ('Recompute Changed Companies',
+             lambda: delta.recompute_companies(self.company_calculator),
+             lambda r: {'companies_recomputed': r['companies_recomputed'],
+                        'rows_carried_forward': r['company_rows_carried_forward']}),
+            ('Flush Snapshot Writes',
+             lambda: snapshot.flush(self.writer, journal=self.journal, changes_only=changes_only),
+             lambda r: _flush_summary(r, snapshot)),
+        ]
+        for name, run, summarize in phases:
+            self._run_phase(results, name, run, summarize)
+        return snapshot
+
+    def _recompute_raw_scores(self, student_ids: set, academic_year: int, calculation_date: date) -> Dict:
+        """Recompute the raw subcategory scores of the changed students of `academic_year`."""
+        if not student_ids:
+            return {'students_recomputed': 0}
+        written = self.raw_score_engine.compute_and_write(academic_year, calculation_date, student_ids=student_ids)
+        return {'students_recomputed': written['students_scored'], 'rows_upserted': written['rows_upserted']}
+
+    async def _get_students(self, academic_year: int, snapshot: Optional[DaySnapshot] = None) -> List[Dict]:
         """Get all students for the specified academic year."""
         logger.info(f"Fetching students for academic year {academic_year}")
+
+        if snapshot is not None:
+            return snapshot.academic_year_students(academic_year)
         
-        response = self.supabase.table('students').select('id, company_id, academic_year_start').eq(
-            'academic_year_start', academic_year
-        ).execute()
+        students = paged_select(
+            self.storage, 'students', 'id, company_id, academic_year_start', eq={'academic_year_start': academic_year}
+        )
         
-        if response.data:
-            logger.info(f"Found {len(response.data)} students")
-            return response.data
+        if students:
+            logger.info(f"Found {len(students)} students")
+            return students
         else:
             logger.warning("No students found for academic year")
             return []
@@ -204,40 +486,22 @@ class DailyScoreCalculator:
         batch_size: int,
         dry_run: bool
     ) -> Dict:
-        """Calculate raw subcategory scores for all students."""
+        """Calculate raw subcategory scores for `students` from their approved event submissions.
+
+        All students are aggregated in one pass by `RawScoreEngine`, so `batch_size`
+        no longer applies.
+        """
         logger.info("Starting subcategory score calculations")
-        
-        students_processed = 0
-        subcategories_processed = 0
-        
-        # Process students in batches
-        for i in range(0, len(students), batch_size):
-            batch = students[i:i + batch_size]
-            logger.info(f"Processing student batch {i//batch_size + 1}, students {i+1}-{min(i+batch_size, len(students))}")
-            
-            # Process each student in the batch
-            for student in batch:
-                if not dry_run:
-                    # Use the database function to calculate subcategory scores
-                    response = self.supabase.rpc(
-                        'calculate_student_subcategory_scores',
-                        {
-                            'student_uuid': student['id'],
-                            'academic_year_start_param': academic_year,
-                            'calculation_date_param': calculation_date.isoformat()
-                        }
-                    ).execute()
-                    
-                    if response.data:
-                        subcategories_processed += response.data
-                
-                students_processed += 1
-            
-            # Log progress
-            logger.info(f"Completed batch. Total students processed: {students_processed}/{len(students)}")
+        student_ids = {s['id'] for s in students}
+        if dry_run:
+            rows = self.raw_score_engine.compute(academic_year, calculation_date, student_ids=student_ids)
+            subcategories_processed = len(rows)
+        else:
+            written = self.raw_score_engine.compute_and_write(academic_year, calculation_date, student_ids=student_ids)
+            subcategories_processed = written['rows_upserted']
         
         return {
-            'students_processed': students_processed,
+            'students_processed': len(students),
             'subcategories_processed': subcategories_processed
         }
     
@@ -250,19 +514,19 @@ class DailyScoreCalculator:
         logger.info("Starting bell curve normalization")
         
         # Use the database function to apply bell curve to all subcategories
-        response = self.supabase.rpc(
+        response = self.storage.rpc(
             'apply_bell_curve_to_all_subcategories',
             {
                 'academic_year_start_param': academic_year,
                 'calculation_date_param': calculation_date.isoformat()
             }
-        ).execute()
+        )
         
         students_processed = 0
         subcategories_processed = 0
         
-        if response.data:
-            for result in response.data:
+        if response:
+            for result in response:
                 subcategories_processed += 1
                 students_processed += result.get('students_processed', 0)
                 logger.info(f"Applied bell curve to {result['subcategory_name']}: {result['students_processed']} students")
@@ -292,14 +556,14 @@ class DailyScoreCalculator:
             
             for student in batch:
                 # Use the database function to calculate category scores
-                response = self.supabase.rpc(
+                response = self.storage.rpc(
                     'calculate_student_category_scores',
                     {
                         'student_uuid': student['id'],
                         'academic_year_start_param': academic_year,
                         'calculation_date_param': calculation_date.isoformat()
                     }
-                ).execute()
+                )
                 
                 students_processed += 1
             
@@ -325,14 +589,14 @@ class DailyScoreCalculator:
             
             for student in batch:
                 # Use the database function to calculate holistic GPA
-                response = self.supabase.rpc(
+                response = self.storage.rpc(
                     'calculate_student_holistic_gpa',
                     {
                         'student_uuid': student['id'],
                         'academic_year_start_param': academic_year,
                         'calculation_date_param': calculation_date.isoformat()
                     }
-                ).execute()
+                )
                 
                 students_processed += 1
             
@@ -359,8 +623,7 @@ class DailyScoreCalculator:
         
         try:
             # Get all active companies
-            companies_response = await self.supabase.table('companies').select('id, name').eq('is_active', True).execute()
-            companies = companies_response.data
+            companies = paged_select(self.storage, 'companies', 'id, name', eq={'is_active': True})
             
             if not companies:
                 logger.warning("No active companies found")
@@ -423,21 +686,20 @@ class DailyScoreCalculator:
         
         try:
             # Get all subcategories
-            subcategories_response = await self.supabase.table('subcategories').select('id, name').execute()
-            subcategories = subcategories_response.data
+            subcategories = paged_select(self.storage, 'subcategories', 'id, name')
             
             scores_calculated = 0
             
             for subcategory in subcategories:
                 # Get average scores for this subcategory across all students in the company
-                avg_scores_response = await self.supabase.rpc(
+                avg_scores_response = self.storage.rpc(
                     'calculate_company_subcategory_scores',
                     {
                         'p_company_id': company_id,
                         'p_academic_year_start': academic_year,
                         'p_calculation_date': calculation_date.isoformat()
                     }
-                ).execute()
+                )
                 
                 scores_calculated += 1
                 logger.debug(f"Calculated subcategory score for {subcategory['name']}")
@@ -470,21 +732,20 @@ class DailyScoreCalculator:
         
         try:
             # Get all categories
-            categories_response = await self.supabase.table('categories').select('id, name').execute()
-            categories = categories_response.data
+            categories = paged_select(self.storage, 'categories', 'id, name')
             
             scores_calculated = 0
             
             for category in categories:
                 # Calculate category score using the PostgreSQL function
-                category_score_response = await self.supabase.rpc(
+                category_score_response = self.storage.rpc(
                     'calculate_company_category_scores',
                     {
                         'p_company_id': company_id,
                         'p_academic_year_start': academic_year,
                         'p_calculation_date': calculation_date.isoformat()
                     }
-                ).execute()
+                )
                 
                 scores_calculated += 1
                 logger.debug(f"Calculated category score for {category['name']}")
@@ -517,14 +778,14 @@ class DailyScoreCalculator:
         
         try:
             # Calculate holistic GPA using the PostgreSQL function
-            holistic_gpa_response = await self.supabase.rpc(
+            holistic_gpa_response = self.storage.rpc(
                 'calculate_company_holistic_gpa',
                 {
                     'p_company_id': company_id,
                     'p_academic_year_start': academic_year,
                     'p_calculation_date': calculation_date.isoformat()
                 }
-            ).execute()
+            )
             
             logger.info(f"Completed company holistic GPA calculation for company {company_id}")
             return {'holistic_gpa_calculated': True}
@@ -536,34 +797,107 @@ class DailyScoreCalculator:
 
 async def main():
     """Main entry point for the daily score calculation script."""
+    from apex_scoring.backfill import DEFAULT_PROCESSES
+
     parser = argparse.ArgumentParser(description='ACU Blueprint Daily Score Calculation')
     parser.add_argument('--academic-year', type=int, help='Academic year to process (default: current year)')
+    parser.add_argument('--calculation-date', help='Calculation date YYYY-MM-DD (default: today)')
     parser.add_argument('--batch-size', type=int, default=50, help='Batch size for processing students (default: 50)')
+    parser.add_argument('--write-chunk-size', type=int, default=BulkWriter.DEFAULT_CHUNK_SIZE,
+                        help=f'Rows per bulk upsert request (default: {BulkWriter.DEFAULT_CHUNK_SIZE})')
+    parser.add_argument('--max-workers', type=int, default=DEFAULT_MAX_WORKERS,
+                        help=f'Subcategories processed concurrently (default: {DEFAULT_MAX_WORKERS}; 1 = sequential)')
     parser.add_argument('--dry-run', action='store_true', help='Run without updating database')
+    parser.add_argument('--set-based', action='store_true',
+                        help='Compute student category scores and holistic GPAs for the whole day in one pass')
+    parser.add_argument('--snapshot', action='store_true',
+                        help='Load the day once and run every phase in memory, flushing writes at the end')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Only recompute students, subcategories and companies changed since the last scored day')
+    parser.add_argument('--since', metavar='TIMESTAMP',
+                        help='Submission watermark for --incremental (default: when the last scored day was written)')
+    parser.add_argument('--raw-scores', action='store_true',
+                        help='First compute raw subcategory scores from approved event submissions')
+    parser.add_argument('--changes-only', action='store_true',
+                        help='Only write rows that differ from the stored or previous day (raw scores, snapshot runs)')
+    parser.add_argument('--resume', action='store_true',
+                        help='Record completed work in the run journal and skip what an earlier run of the day completed')
+    parser.add_argument('--backfill', nargs=2, metavar=('START', 'END'),
+                        help='Re-score every day from START to END (YYYY-MM-DD, inclusive) in parallel')
+    parser.add_argument('--shards', type=int, metavar='N',
+                        help='Run the day as N shards on N worker processes (map/reduce) instead of in one process')
+    parser.add_argument('--processes', type=int, default=DEFAULT_PROCESSES,
+                        help=f'Worker processes for --backfill (default: {DEFAULT_PROCESSES})')
+    parser.add_argument('--checkpoint', metavar='PATH',
+                        help='Checkpoint file of finished --backfill days (default: backfill-START-END.jsonl)')
+    parser.add_argument('--local-db', metavar='PATH',
+                        help='Run against a local SQLite database instead of Supabase (":memory:" for a throwaway one)')
+    parser.add_argument('--schema', default=DEFAULT_SCHEMA_PATH,
+                        help='Schema fixture to load into --local-db (default: apex_scoring/fixtures/schema.sql)')
+    parser.add_argument('--shadow', metavar='SINK',
+                        help='Shadow run: read production data but write only to the local SQLite database SINK, '
+                             'then diff its score tables against what production has stored')
+    parser.add_argument('--shadow-parquet', metavar='DIR',
+                        help='Also export the shadow run\'s score tables to Parquet under DIR (requires pyarrow)')
+    parser.add_argument('--shadow-report', metavar='PATH',
+                        help='Write the shadow run\'s phase timings and diff to PATH as JSON')
+    parser.add_argument('--metrics-file', metavar='PATH',
+                        help='Also write per-phase metrics to PATH in OpenMetrics text format')
+    parser.add_argument('--sketch-error', type=float, metavar='FRACTION',
+                        help='Also update the cohort score sketches, sized for this rank error (e.g. 0.01)')
     parser.add_argument('--verbose', '-v', action='store_true', help='Enable verbose logging')
     
     args = parser.parse_args()
     
     if args.verbose:
         logging.getLogger().setLevel(logging.DEBUG)
+
+    if args.backfill:
+        run_backfill(args)
+        return
+    if args.shards:
+        run_sharded(args)
+        return
+    if args.shadow:
+        await run_shadow(args)
+        return
     
-    # Get Supabase credentials from environment
-    supabase_url = os.getenv('NEXT_PUBLIC_SUPABASE_URL')
-    supabase_key = os.getenv('SUPABASE_SERVICE_ROLE_KEY')
-    
-    if not supabase_url or not supabase_key:
-        logger.error("Missing Supabase credentials. Please set NEXT_PUBLIC_SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY environment variables.")
-        sys.exit(1)
-    
-    # Initialize calculator
-    calculator = DailyScoreCalculator(supabase_url, supabase_key)
+    if args.local_db:
+        # Local SQLite stand-in; no Supabase credentials needed
+        storage = SQLiteStorage(args.local_db, schema_path=args.schema)
+        calculator = DailyScoreCalculator(
+            write_chunk_size=args.write_chunk_size, storage=storage, max_workers=args.max_workers,
+            sketch_k=_sketch_k(args.sketch_error),
+        )
+    else:
+        # Get Supabase credentials from environment
+        supabase_url = os.getenv('NEXT_PUBLIC_SUPABASE_URL')
+        supabase_key = os.getenv('SUPABASE_SERVICE_ROLE_KEY')
+        
+        if not supabase_url or not supabase_key:
+            logger.error("Missing Supabase credentials. Please set NEXT_PUBLIC_SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY environment variables.")
+            sys.exit(1)
+        
+        # Initialize calculator
+        calculator = DailyScoreCalculator(
+            supabase_url, supabase_key, write_chunk_size=args.write_chunk_size, max_workers=args.max_workers,
+            sketch_k=_sketch_k(args.sketch_error),
+        )
     
     try:
         # Run the daily calculation
         results = await calculator.run_daily_calculation(
             academic_year=args.academic_year,
+            calculation_date=date.fromisoformat(args.calculation_date) if args.calculation_date else None,
             batch_size=args.batch_size,
-            dry_run=args.dry_run
+            dry_run=args.dry_run,
+            set_based=args.set_based,
+            use_snapshot=args.snapshot,
+            incremental=args.incremental,
+            since=args.since,
+            calculate_raw_scores=args.raw_scores,
+            resume=args.resume,
+            changes_only=args.changes_only
         )
         
         # Print summary
@@ -575,27 +909,212 @@ async def main():
         print(f"Total Execution Time: {results['total_execution_time']:.2f} seconds")
         print(f"Status: {results['status'].upper()}")
         print(f"Dry Run: {results['dry_run']}")
+        if results.get('watermark'):
+            print(f"Incremental: baseline {results['watermark']['baseline_date']}, since {results['watermark']['since']} "
+                  f"(next watermark {results['watermark']['next']})")
         print("\nPhase Results:")
-        
-        for phase in results['phases']:
-            print(f"  {phase['phase']}: {phase.get('students_processed', 0)} students, {phase['execution_time_seconds']:.2f}s")
-        
+        _print_phases(results['phases'])
         print("="*50)
+
+        if args.metrics_file:
+            calculator.metrics.write_openmetrics(args.metrics_file)
+            print(f"Metrics written to {args.metrics_file}")
         
     except Exception as e:
         logger.error(f"Daily calculation failed: {str(e)}")
         sys.exit(1)
 
 
+def _print_phases(phases: List[Dict]) -> None:
+    """Print each phase's timing and storage metrics."""
+    for phase in phases:
+        if phase['status'] == 'skipped':
+            print(f"  {phase['phase']}: skipped, completed at {phase['completed_at']}")
+            continue
+        m = phase['metrics']
+        print(f"  {phase['phase']}: {m['wall_seconds']:.2f}s (db {m['db_seconds']:.2f}s, cpu {m['cpu_seconds']:.2f}s), "
+              f"{m['queries']} queries, {m['rows_read']} rows read, {m['rows_written']} rows written, "
+              f"~{(m['bytes_read'] + m['bytes_written']) / 1e6:.1f} MB, peak RSS {m['peak_rss_bytes'] / 1e6:.0f} MB")
+        if phase.get('rows_skipped') or phase.get('rows_carried_forward'):
+            print(f"    {phase['rows_skipped']} unchanged rows not sent, "
+                  f"{phase['rows_carried_forward']} copied forward on the server")
+
+
+def _sketch_k(sketch_error: Optional[float]) -> Optional[int]:
+    return k_for_error(sketch_error) if sketch_error else None
+
+
+def _storage_factory(args, mode: str) -> Callable[[], StorageBackend]:
+    """Picklable storage opener for worker processes, from `--local-db` or the Supabase environment."""
+    if args.local_db:
+        if args.local_db == ':memory:':
+            logger.error(f"{mode} needs a database file; worker processes cannot share an in-memory one")
+            sys.exit(1)
+        # Create the tables once; workers wait on each other's write locks instead of failing
+        SQLiteStorage(args.local_db, schema_path=args.schema).close()
+        return functools.partial(SQLiteStorage, args.local_db, timeout=60.0)
+    supabase_url = os.getenv('NEXT_PUBLIC_SUPABASE_URL')
+    supabase_key = os.getenv('SUPABASE_SERVICE_ROLE_KEY')
+    if not supabase_url or not supabase_key:
+        logger.error("Missing Supabase credentials. Please set NEXT_PUBLIC_SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY environment variables.")
+        sys.exit(1)
+    return functools.partial(SupabaseStorage.connect, supabase_url, supabase_key)
+
+
+def run_backfill(args) -> None:
+    """`--backfill START END`: re-score a date range on a process pool, checkpointing each day."""
+    from apex_scoring.backfill import Backfill
+
+    start, end = (date.fromisoformat(d) for d in args.backfill)
+    backfill = Backfill(
+        _storage_factory(args, '--backfill'),
+        args.checkpoint or f'backfill-{start}-{end}.jsonl',
+        processes=args.processes,
+        write_chunk_size=args.write_chunk_size,
+        calculate_raw_scores=args.raw_scores,
+    )
+    results = backfill.run(start, end)
+
+    print("\n" + "="*50)
+    print("BACKFILL SUMMARY")
+    print("="*50)
+    print(f"Date Range: {results['start']} to {results['end']}")
+    print(f"Total Execution Time: {results['total_execution_time']:.2f} seconds")
+    print(f"Days Scored: {len(results['days_scored'])}, already checkpointed: {len(results['days_skipped'])}, "
+          f"failed: {len(results['days_failed'])}")
+    for day, error in sorted(results['days_failed'].items()):
+        print(f"  {day}: {error}")
+    print("="*50)
+    if results['days_failed']:
+        sys.exit(1)
+
+
+def run_sharded(args) -> None:
+    """`--shards N`: run one day as N map shards on worker processes and reduce in this process."""
+    from apex_scoring.raw_scores import academic_year_of
+    from apex_scoring.sharding import LocalShardExecutor, ShardedDailyRun
+
+    calculation_date = date.fromisoformat(args.calculation_date) if args.calculation_date else date.today()
+    academic_year = args.academic_year or academic_year_of(calculation_date)
+    if args.dry_run:
+        logger.error("--shards writes as it goes and has no dry-run mode")
+        sys.exit(1)
+    open_storage = _storage_factory(args, '--shards')
+    with LocalShardExecutor(open_storage, processes=args.shards) as executor:
+        results = ShardedDailyRun(
+            open_storage(), executor, shards=args.shards, write_chunk_size=args.write_chunk_size,
+            sketch_k=_sketch_k(args.sketch_error),
+        ).run(academic_year, calculation_date, calculate_raw_scores=args.raw_scores, resume=args.resume)
+
+    print("\n" + "="*50)
+    print("SHARDED SCORE CALCULATION SUMMARY")
+    print("="*50)
+    print(f"Academic Year: {results['academic_year']}")
+    print(f"Calculation Date: {results['calculation_date']}")
+    print(f"Shards: {results['shards']}")
+    print(f"Total Execution Time: {results['total_execution_time']:.2f} seconds")
+    print("\nPhase Results:")
+    for phase in results['phases']:
+        details = ', '.join(f"{k}={v}" for k, v in phase.items() if k not in ('phase', 'seconds', 'status'))
+        if phase.get('status') == 'skipped':
+            details = f"skipped, {details}"
+        print(f"  {phase['phase']}: {phase['seconds']:.2f}s ({details})")
+    print("="*50)
+
+
+async def run_shadow(args) -> None:
+    """`--shadow SINK`: run the day on production data with every write going to a local sink, then diff."""
+    from apex_scoring.raw_scores import academic_year_of
+    from apex_scoring.shadow import SCORE_TABLES, ShadowStorage, diff_day, export_parquet
+
+    if args.dry_run or args.resume:
+        logger.error("--shadow cannot be combined with --dry-run or --resume")
+        sys.exit(1)
+    calculation_date = date.fromisoformat(args.calculation_date) if args.calculation_date else date.today()
+    day = calculation_date.isoformat()
+    source = _storage_factory(args, '--shadow')()
+    sink = SQLiteStorage(args.shadow, schema_path=args.schema)
+    shadow = ShadowStorage(source, sink)
+    calculator = DailyScoreCalculator(write_chunk_size=args.write_chunk_size, storage=shadow, max_workers=args.max_workers)
+    # Phase-at-a-time runs find "the latest day" with unfiltered reads, which the sink cannot answer,
+    # so a shadow run always works from a snapshot of the day (or incrementally on top of one)
+    results = await calculator.run_daily_calculation(
+        academic_year=args.academic_year or academic_year_of(calculation_date),
+        calculation_date=calculation_date,
+        batch_size=args.batch_size,
+        use_snapshot=True,
+        incremental=args.incremental,
+        since=args.since,
+        calculate_raw_scores=args.raw_scores,
+        changes_only=args.changes_only,
+    )
+    written = [t for t in SCORE_TABLES if (t, day) in shadow.shadowed]
+    results['shadow'] = {
+        'sink': args.shadow,
+        'tables_written': written,
+        'diff': diff_day(source, sink, day, tables=written),
+    }
+    if args.shadow_parquet:
+        results['shadow']['parquet_rows'] = export_parquet(sink, args.shadow_parquet, day, tables=written)
+
+    print("\n" + "="*50)
+    print("SHADOW SCORE CALCULATION SUMMARY")
+    print("="*50)
+    print(f"Academic Year: {results['academic_year']}")
+    print(f"Calculation Date: {results['calculation_date']}")
+    print(f"Total Execution Time: {results['total_execution_time']:.2f} seconds")
+    print(f"Sink: {args.shadow}")
+    print("\nPhase Results:")
+    _print_phases(results['phases'])
+    print("\nDiff against stored scores:")
+    for table in SCORE_TABLES:
+        diff = results['shadow']['diff'].get(table)
+        if diff is None:
+            print(f"  {table}: not written")
+            continue
+        print(f"  {table}: {diff['changed_rows']} changed, {diff['missing_rows']} missing, "
+              f"{diff['extra_rows']} new of {diff['expected_rows']} stored rows")
+        for column, stats in sorted(diff['changed_columns'].items()):
+            delta = f", max |delta| {stats['max_abs_delta']:.6g}" if 'max_abs_delta' in stats else ''
+            print(f"    {column}: {stats['rows']} rows{delta}")
+    for table, rows in results['shadow'].get('parquet_rows', {}).items():
+        print(f"  Parquet {table}: {rows} rows under {args.shadow_parquet}")
+    print("="*50)
+
+    if args.shadow_report:
+        with open(args.shadow_report, 'w') as f:
+            json.dump(results, f, indent=2, default=str)
+        print(f"Shadow report written to {args.shadow_report}")
+    if args.metrics_file:
+        calculator.metrics.write_openmetrics(args.metrics_file)
+        print(f"Metrics written to {args.metrics_file}")
+
+
 if __name__ == "__main__":
     asyncio.run(main())
 
+# Supabase storage shared by warm invocations of the same Lambda container
+_lambda_storage: Optional[SupabaseStorage] = None
+
+
+def _get_lambda_storage(supabase_url: str, supabase_key: str, max_workers: int) -> SupabaseStorage:
+    """Create the Supabase client (and its HTTP connection pool) on the first invocation only.
+
+    The pool is sized for the first invocation's `max_workers`.
+    """
+    global _lambda_storage
+    if _lambda_storage is None:
+        _lambda_storage = SupabaseStorage.connect(supabase_url, supabase_key, max_connections=max(max_workers, 1) + 2)
+    return _lambda_storage
+
+
 # AWS Lambda handler reusing the same orchestrator
 def lambda_handler(event, context):
     """Lambda handler that runs the daily calculation.
 
     Expected optional event fields: academic_year, calculation_date (YYYY-MM-DD),
-    batch_size, dry_run.
+    batch_size, write_chunk_size, max_workers, dry_run, set_based, use_snapshot,
+    incremental, since, calculate_raw_scores, resume, changes_only, sketch_error.
     """
     supabase_url = os.getenv('SUPABASE_URL') or os.getenv('NEXT_PUBLIC_SUPABASE_URL')
     supabase_key = os.getenv('SUPABASE_SERVICE_ROLE_KEY')
@@ -611,15 +1130,37 @@ def lambda_handler(event, context):
     date_str = evt.get('calculation_date')
     calc_date = date.fromisoformat(date_str) if date_str else date.today()
     batch_size = int(evt.get('batch_size') or 50)
+    write_chunk_size = int(evt.get('write_chunk_size') or BulkWriter.DEFAULT_CHUNK_SIZE)
+    max_workers = int(evt.get('max_workers') or DEFAULT_MAX_WORKERS)
     dry_run = bool(evt.get('dry_run') or False)
+    set_based = bool(evt.get('set_based') or False)
+    use_snapshot = bool(evt.get('use_snapshot') or False)
+    incremental = bool(evt.get('incremental') or False)
+    since = evt.get('since')
+    calculate_raw_scores = bool(evt.get('calculate_raw_scores') or False)
+    resume = bool(evt.get('resume') or False)
+    changes_only = bool(evt.get('changes_only') or False)
+    sketch_error = float(evt['sketch_error']) if evt.get('sketch_error') else None
 
-    calculator = DailyScoreCalculator(supabase_url, supabase_key)
+    calculator = DailyScoreCalculator(
+        write_chunk_size=write_chunk_size,
+        max_workers=max_workers,
+        sketch_k=_sketch_k(sketch_error),
+        storage=_get_lambda_storage(supabase_url, supabase_key, max_workers),
+    )
     result = asyncio.run(
         calculator.run_daily_calculation(
             academic_year=academic_year,
             calculation_date=calc_date,
             batch_size=batch_size,
             dry_run=dry_run,
+            set_based=set_based,
+            use_snapshot=use_snapshot,
+            incremental=incremental,
+            since=since,
+            calculate_raw_scores=calculate_raw_scores,
+            resume=resume,
+            changes_only=changes_only,
         )
     )
     return {"statusCode": 200, "body": result}
@@ -8,23 +8,35 @@ to validate the scoring pipeline and bell curve calculations.
 
 Test Student ID: 02be2f65-cef3-4b22-823a-4d8e6b8b910b
 
+With --students N it instead generates a whole synthetic population (see
+apex_scoring.synthetic) and bulk-loads it into Supabase, a local SQLite
+database (--local-db) or CSV/Parquet files (--csv/--parquet).
+
 Author: ACU Blueprint Development Team
 Date: 2024
 """
 
+import argparse
 import asyncio
 import json
 import logging
 import os
 import sys
 from datetime import datetime, date, timedelta
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple
 import uuid
 import random
 
 from supabase import create_client, Client
 from dotenv import load_dotenv
 
+# Add the scripts directory to the Python path for imports
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from apex_scoring.db import BulkWriter
+from apex_scoring.storage import DEFAULT_SCHEMA_PATH, SQLiteStorage, SupabaseStorage
+from apex_scoring.synthetic import PopulationGenerator
+
 # Load environment variables
 load_dotenv()
 
@@ -606,8 +618,81 @@ class DummyDataGenerator:
         }
 
 
+def _parse_distribution(value: str) -> Tuple[str, Tuple[float, float]]:
+    """Parse NAME=A,B into a Beta(A, B) override for one subcategory."""
+    try:
+        name, params = value.split('=', 1)
+        a, b = (float(x) for x in params.split(','))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected NAME=A,B, got {value!r}")
+    return name, (a, b)
+
+
+def generate_population(args: argparse.Namespace) -> None:
+    """Generate a whole synthetic population and write it to the selected sink."""
+    generator = PopulationGenerator(
+        n_students=args.students,
+        n_companies=args.companies,
+        seed=args.seed,
+        academic_year=args.academic_year,
+        calculation_date=date.fromisoformat(args.calculation_date) if args.calculation_date else None,
+        distributions=dict(args.distribution or []),
+    )
+    start = datetime.now()
+    if args.csv:
+        output = generator.write_csv(args.csv)
+    elif args.parquet:
+        output = generator.write_parquet(args.parquet)
+    else:
+        if args.local_db:
+            storage = SQLiteStorage(args.local_db, schema_path=args.schema)
+        else:
+            supabase_url = os.getenv('NEXT_PUBLIC_SUPABASE_URL')
+            supabase_key = os.getenv('SUPABASE_SERVICE_ROLE_KEY')
+            if not supabase_url or not supabase_key:
+                logger.error("Missing Supabase credentials. Please set NEXT_PUBLIC_SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY environment variables.")
+                sys.exit(1)
+            storage = SupabaseStorage(create_client(supabase_url, supabase_key))
+        output = generator.write_to_storage(storage, chunk_size=args.write_chunk_size)
+
+    print("\n" + "="*60)
+    print("SYNTHETIC POPULATION SUMMARY")
+    print("="*60)
+    print(f"Students: {args.students}, Companies: {args.companies}, Seed: {args.seed}")
+    print(f"Calculation Date: {generator.calculation_date.isoformat()}")
+    print(f"Generation Time: {(datetime.now() - start).total_seconds():.2f} seconds")
+    for table, result in output.items():
+        print(f"  {table}: {result}")
+    print("="*60)
+
+
 async def main():
     """Main entry point for the dummy data generation script."""
+    parser = argparse.ArgumentParser(description='ACU Blueprint Dummy Data Generator')
+    parser.add_argument('--students', type=int,
+                        help='Generate a synthetic population of this many students instead of the single test student')
+    parser.add_argument('--companies', type=int, default=6, help='Number of companies (default: 6)')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed (default: 0)')
+    parser.add_argument('--academic-year', type=int, default=datetime.now().year, help='Academic year (default: current year)')
+    parser.add_argument('--calculation-date', help='Score calculation date YYYY-MM-DD (default: today)')
+    parser.add_argument('--distribution', action='append', type=_parse_distribution, metavar='NAME=A,B',
+                        help='Beta(A, B) score distribution for a subcategory, e.g. chapel_attendance=8,2 (repeatable)')
+    parser.add_argument('--local-db', metavar='PATH', help='Write to a local SQLite database instead of Supabase')
+    parser.add_argument('--schema', default=DEFAULT_SCHEMA_PATH, help='Schema fixture to load into --local-db')
+    parser.add_argument('--csv', metavar='DIR', help='Write one CSV file per table to DIR instead of a database')
+    parser.add_argument('--parquet', metavar='DIR', help='Write one Parquet file per table to DIR (requires pyarrow)')
+    parser.add_argument('--write-chunk-size', type=int, default=BulkWriter.DEFAULT_CHUNK_SIZE,
+                        help=f'Rows per bulk insert request (default: {BulkWriter.DEFAULT_CHUNK_SIZE})')
+    args = parser.parse_args()
+
+    if args.students:
+        try:
+            generate_population(args)
+        except Exception as e:
+            logger.error(f"Synthetic population generation failed: {str(e)}")
+            sys.exit(1)
+        return
+
     # Get Supabase credentials from environment
     supabase_url = os.getenv('NEXT_PUBLIC_SUPABASE_URL')
     supabase_key = os.getenv('SUPABASE_SERVICE_ROLE_KEY')
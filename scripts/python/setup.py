@@ -6,10 +6,9 @@ setup(
     description="ACU Blueprint Holistic GPA scoring system",
     author="ACU Blueprint Team",
     packages=find_packages(),
+    package_data={"apex_scoring": ["fixtures/*.sql"]},
     install_requires=[
         "numpy>=1.26.0",
-        "scipy>=1.12.0",
-        "pandas>=2.2.0",
         "supabase>=2.0.0",
         "python-dotenv>=1.0.0",
         "pydantic>=2.4.0",
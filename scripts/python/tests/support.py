@@ -0,0 +1,83 @@
+"""Shared helpers for the pipeline tests: synthetic populations, runs and table comparisons."""
+
+import asyncio
+import math
+from datetime import date
+from typing import Any, Dict, Optional, Tuple
+
+from apex_scoring.db import NATURAL_KEYS
+from apex_scoring.leaderboards import RANK_KEYS
+from apex_scoring.storage import DEFAULT_SCHEMA_PATH, SQLiteStorage
+from apex_scoring.synthetic import PopulationGenerator
+
+ACADEMIC_YEAR = 2025
+SEED_DAY = date(2025, 9, 30)
+DAY = date(2025, 10, 1)
+
+# Columns stamped by the database rather than computed
+GENERATED_COLUMNS = frozenset({'id', 'created_at', 'updated_at'})
+
+SCORE_TABLES = tuple(NATURAL_KEYS)
+
+# Natural key of every table `day_rows` reads
+TABLE_KEYS = {**NATURAL_KEYS, **RANK_KEYS}
+
+
+def population(n_students: int = 120, seed: int = 3, calculation_date: date = SEED_DAY) -> SQLiteStorage:
+    """In-memory database with a synthetic population and its submissions."""
+    storage = SQLiteStorage(':memory:', schema_path=DEFAULT_SCHEMA_PATH)
+    PopulationGenerator(n_students, seed=seed, calculation_date=calculation_date).write_to_storage(storage)
+    return storage
+
+
+def drop_tables(storage: SQLiteStorage, *tables: str) -> None:
+    """Drop `tables`, as on a database where their migration is not applied yet."""
+    for table in tables:
+        storage._conn.execute(f'DROP TABLE {table}')
+    storage._conn.commit()
+
+
+def run_day(storage, calculation_date: date = DAY, sketch_k: Optional[int] = None, **options) -> Dict[str, Any]:
+    """Run the daily pipeline for one day against `storage` (with score sketches given a `sketch_k`)."""
+    import daily_score_calculation as dsc
+
+    calculator = dsc.DailyScoreCalculator(storage=storage, max_workers=1, sketch_k=sketch_k)
+    return asyncio.run(
+        calculator.run_daily_calculation(academic_year=ACADEMIC_YEAR, calculation_date=calculation_date, **options)
+    )
+
+
+def day_rows(storage, table: str, calculation_date: date = DAY) -> Dict[Tuple, Dict[str, Any]]:
+    """A day's rows of a score or rank table, keyed by natural key, without generated columns."""
+    key = [c for c in TABLE_KEYS[table].split(',') if c != 'calculation_date']
+    return {
+        tuple(r[c] for c in key): {c: v for c, v in r.items() if c not in GENERATED_COLUMNS}
+        for r in storage.select(table, eq={'calculation_date': calculation_date.isoformat()})
+    }
+
+
+def _close(a: Any, b: Any, tolerance: float) -> bool:
+    if isinstance(a, dict) and isinstance(b, dict):
+        return a.keys() == b.keys() and all(_close(a[k], b[k], tolerance) for k in a)
+    if isinstance(a, float) or isinstance(b, float):
+        if a is None or b is None:
+            return a is b
+        return math.isclose(float(a), float(b), rel_tol=0, abs_tol=tolerance)
+    return a == b
+
+
+def row_differences(rows_a: Dict[Tuple, Dict], rows_b: Dict[Tuple, Dict], tolerance: float = 1e-9) -> list:
+    """Keys present on one side only, and (key, column) pairs whose values differ, of two `day_rows` results."""
+    diff = sorted(set(rows_a) ^ set(rows_b))
+    for key in set(rows_a) & set(rows_b):
+        diff.extend((key, c) for c in rows_a[key] if not _close(rows_a[key][c], rows_b[key].get(c), tolerance))
+    return diff
+
+
+def table_differences(a, b, calculation_date: date = DAY, tolerance: float = 1e-9) -> Dict[str, list]:
+    """Per score table: the `row_differences` between two databases' rows of the day (empty tables omitted)."""
+    differences = {
+        table: row_differences(day_rows(a, table, calculation_date), day_rows(b, table, calculation_date), tolerance)
+        for table in SCORE_TABLES
+    }
+    return {table: diff for table, diff in differences.items() if diff}
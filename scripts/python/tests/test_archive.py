@@ -0,0 +1,70 @@
+from datetime import date
+
+import pytest
+
+from apex_scoring.archive import SCORE_TABLES, ScoreArchive, read_archive
+from tests.support import DAY, SEED_DAY, population, run_day
+
+pytest.importorskip('pyarrow')
+
+# Tuesday and Wednesday of one ISO week, then the Monday after
+NEXT_WEEK = date(2025, 10, 6)
+DAYS = [SEED_DAY, DAY, NEXT_WEEK]
+END = date(2025, 10, 7)
+
+
+@pytest.fixture(scope='module')
+def scored():
+    storage = population()
+    run_day(storage, calculation_date=SEED_DAY, use_snapshot=True)
+    for day in DAYS[1:]:
+        run_day(storage, calculation_date=day, calculate_raw_scores=True, use_snapshot=True)
+    return storage
+
+
+def stored(storage, table, day):
+    return {r['id']: r for r in storage.select(table, eq={'calculation_date': day.isoformat()})}
+
+
+def test_export_reads_back(scored, tmp_path):
+    root = str(tmp_path)
+    summary = ScoreArchive(scored, root, page_size=500).archive(END)
+    for table in SCORE_TABLES:
+        rows = {day: stored(scored, table, day) for day in DAYS}
+        assert summary[table]['days_archived'] == 3
+        assert summary[table]['rows_archived'] == sum(len(r) for r in rows.values())
+
+        archived = read_archive(root, table, start=DAY, end=END).to_pylist()
+        assert sorted(r['id'] for r in archived) == sorted(list(rows[DAY]) + list(rows[NEXT_WEEK]))
+        if table == 'student_subcategory_scores':
+            by_id = {**rows[DAY], **rows[NEXT_WEEK]}
+            assert all(r['score'] == pytest.approx(by_id[r['id']]['score']) for r in archived)
+
+
+def test_prune_keeps_the_weekly_days(scored, tmp_path):
+    storage = scored.clone()
+    summary = ScoreArchive(storage, str(tmp_path)).archive(END, prune=True, keep_weekly=True)
+    for table in SCORE_TABLES:
+        assert summary[table]['days_pruned'] == 1 and summary[table]['weekly_days_kept'] == 2
+        assert stored(storage, table, SEED_DAY) == {}
+        assert stored(storage, table, DAY) == stored(scored, table, DAY)
+        assert stored(storage, table, NEXT_WEEK) == stored(scored, table, NEXT_WEEK)
+        pruned = read_archive(str(tmp_path), table, end=DAY)
+        assert pruned.num_rows == len(stored(scored, table, SEED_DAY))
+
+
+def test_prune_stops_when_storage_changed(scored, tmp_path):
+    """Rows of the day changed after its export: the file no longer matches, so nothing is deleted."""
+    storage = scored.clone()
+    table = 'student_holistic_gpa'
+
+    class Changing(ScoreArchive):
+        def export_day(self, table, calculation_date):
+            rows = super().export_day(table, calculation_date)
+            first = next(iter(stored(self.storage, table, date.fromisoformat(calculation_date))))
+            self.storage.delete(table, {'id': first})
+            return rows
+
+    with pytest.raises(RuntimeError, match='not pruning'):
+        Changing(storage, str(tmp_path)).archive(END, tables=[table], prune=True)
+    assert len(stored(storage, table, SEED_DAY)) == len(stored(scored, table, SEED_DAY)) - 1
@@ -0,0 +1,77 @@
+import functools
+from datetime import date
+
+import pytest
+
+from apex_scoring.backfill import Backfill
+from apex_scoring.leaderboards import STUDENT_RANK_TABLE, RankIndexBuilder
+from apex_scoring.storage import DEFAULT_SCHEMA_PATH, SQLiteStorage
+from apex_scoring.synthetic import PopulationGenerator
+from tests.support import SEED_DAY, day_rows, row_differences, run_day, table_differences
+
+START, END = date(2025, 10, 1), date(2025, 10, 3)
+DAYS = [date(2025, 10, d) for d in range(1, 4)]
+
+
+@pytest.fixture
+def seeded(tmp_path):
+    """A seeded database file, and a copy with every day scored by the daily run."""
+    path = str(tmp_path / 'scores.db')
+    storage = SQLiteStorage(path, schema_path=DEFAULT_SCHEMA_PATH)
+    PopulationGenerator(120, seed=3, calculation_date=SEED_DAY).write_to_storage(storage)
+    reference = storage.clone()
+    storage.close()
+    for day in DAYS:
+        run_day(reference, calculation_date=day, calculate_raw_scores=True, use_snapshot=True)
+    return path, reference
+
+
+def assert_matches(reference, path):
+    backfilled = SQLiteStorage(path)
+    for day in DAYS:
+        assert table_differences(reference, backfilled, day) == {}
+        ranks = day_rows(reference, STUDENT_RANK_TABLE, day)
+        assert ranks and row_differences(ranks, day_rows(backfilled, STUDENT_RANK_TABLE, day)) == []
+
+
+def test_backfill_matches_daily_runs(seeded, tmp_path):
+    path, reference = seeded
+    backfill = Backfill(
+        functools.partial(SQLiteStorage, path), str(tmp_path / 'checkpoint.jsonl'), processes=2,
+        calculate_raw_scores=True,
+    )
+    result = backfill.run(START, END)
+    assert result['days_failed'] == {}
+    assert [r['calculation_date'] for r in result['days_scored']] == [d.isoformat() for d in DAYS]
+    assert_matches(reference, path)
+
+    # A rerun with the same checkpoint skips every finished day
+    rerun = backfill.run(START, END)
+    assert rerun['days_scored'] == [] and rerun['days_skipped'] == [d.isoformat() for d in DAYS]
+
+
+def test_days_are_checkpointed_once_ranked(seeded, tmp_path, monkeypatch):
+    path, reference = seeded
+    backfill = Backfill(
+        functools.partial(SQLiteStorage, path), str(tmp_path / 'checkpoint.jsonl'), processes=1,
+        calculate_raw_scores=True,
+    )
+    build = RankIndexBuilder.build
+    broken = DAYS[1].isoformat()
+
+    def build_all_but_one(self, calculation_date, *args, **kwargs):
+        if calculation_date == broken:
+            raise RuntimeError('rank build failed')
+        return build(self, calculation_date, *args, **kwargs)
+
+    monkeypatch.setattr(RankIndexBuilder, 'build', build_all_but_one)
+    result = backfill.run(START, END)
+    assert list(result['days_failed']) == [broken]
+    assert backfill.checkpoint.finished_days() == {DAYS[0].isoformat(), DAYS[2].isoformat()}
+
+    # The rerun scores the unranked day and re-ranks every day after it
+    monkeypatch.setattr(RankIndexBuilder, 'build', build)
+    rerun = backfill.run(START, END)
+    assert rerun['days_failed'] == {}
+    assert [r['calculation_date'] for r in rerun['days_scored']] == [broken]
+    assert_matches(reference, path)
@@ -0,0 +1,58 @@
+import math
+
+import numpy as np
+import pytest
+
+from apex_scoring.bell_curve import BellCurveCalculator, norm_ppf
+
+# Standard normal quantiles, to 16 significant digits
+KNOWN_QUANTILES = [
+    (1e-20, -9.262340089798408),
+    (1e-10, -6.361340902404056),
+    (0.5, 0.0),
+    (0.75, 0.6744897501960817),
+    (0.9, 1.2815515655446004),
+    (0.95, 1.6448536269514722),
+    (0.975, 1.959963984540054),
+    (0.99, 2.3263478740408408),
+    (0.999, 3.090232306167813),
+]
+
+
+@pytest.mark.parametrize('p, expected', KNOWN_QUANTILES)
+def test_norm_ppf_known_quantiles(p, expected):
+    # The documented relative error is about 1e-16; allow a few ulps
+    assert float(norm_ppf(p)) == pytest.approx(expected, rel=1e-15, abs=1e-300)
+
+
+def test_norm_ppf_inverts_the_cdf():
+    p = np.logspace(-15, math.log10(0.5), 200)
+    x = norm_ppf(p)
+    cdf = np.array([0.5 * math.erfc(-v / math.sqrt(2)) for v in x])
+    np.testing.assert_allclose(cdf, p, rtol=1e-12)
+    np.testing.assert_allclose(norm_ppf(0.5 + (0.5 - p[p > 1e-3])), -x[p > 1e-3], rtol=1e-12)
+
+
+def test_norm_ppf_edges():
+    assert norm_ppf([0.0, 1.0]).tolist() == [-math.inf, math.inf]
+    assert np.isnan(norm_ppf([-0.1, 1.1, np.nan])).all()
+
+
+def test_array_curve_matches_scalar_curve():
+    # Rounded, beta-skewed raw scores: many ties, and a long upper tail
+    scores = np.round(np.random.default_rng(4).beta(2.0, 5.0, size=2000) * 100, 0).tolist()
+    curve = BellCurveCalculator()
+    normalized, _ = curve.apply_bell_curve_to_array(scores)
+    expected = [curve.transform_percentile_to_gpa(curve.calculate_percentile_rank(s, scores)) for s in scores]
+    assert normalized.tolist() == expected
+
+
+# Percentile ranks whose GPA falls a hair off a half cent (1.505, 3.055 unrounded), where np.round
+# and round disagree
+HALF_CENT_PERCENTILES = [0.006357264954792811, 0.5456123046190733]
+
+
+def test_array_transform_rounds_like_scalar():
+    curve = BellCurveCalculator()
+    expected = [curve.transform_percentile_to_gpa(p) for p in HALF_CENT_PERCENTILES]
+    assert curve.transform_percentiles_to_gpa(HALF_CENT_PERCENTILES).tolist() == expected
@@ -0,0 +1,48 @@
+from apex_scoring.changes import ChangeOnlyWriter
+from apex_scoring.db import BulkWriter, NATURAL_KEYS
+from apex_scoring.storage import DEFAULT_SCHEMA_PATH, SQLiteStorage
+
+TABLE = 'student_holistic_gpa'
+
+
+class CountingStorage(SQLiteStorage):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.deletes = 0
+
+    def delete(self, table, eq=None, in_=None):
+        self.deletes += 1
+        super().delete(table, eq, in_=in_)
+
+
+def _rows(n_students, day, gpa=3.0):
+    return [
+        {'student_id': f'student-{i:04d}', 'holistic_gpa': gpa, 'calculation_date': day}
+        for i in range(n_students)
+    ]
+
+
+def test_new_day_carries_forward_and_batches_deletes():
+    storage = CountingStorage(':memory:', schema_path=DEFAULT_SCHEMA_PATH)
+    storage.upsert(TABLE, _rows(350, '2025-10-01'))
+    changes = ChangeOnlyWriter(BulkWriter(storage))
+
+    rows = _rows(100, '2025-10-02')
+    rows[0]['holistic_gpa'] = 3.5
+    counts = changes.upsert_day(TABLE, rows, '2025-10-02', NATURAL_KEYS[TABLE])
+
+    assert counts == {'rows_written': 1, 'rows_skipped': 99, 'rows_carried_forward': 350, 'rows_deleted': 250}
+    assert storage.deletes == 3  # 250 ids, 100 per request
+    stored = {r['student_id']: r['holistic_gpa'] for r in storage.select(TABLE, eq={'calculation_date': '2025-10-02'})}
+    assert stored == {r['student_id']: r['holistic_gpa'] for r in rows}
+    assert len(storage.select(TABLE, eq={'calculation_date': '2025-10-01'})) == 350
+
+
+def test_rerun_of_a_day_skips_unchanged_rows():
+    storage = CountingStorage(':memory:', schema_path=DEFAULT_SCHEMA_PATH)
+    changes = ChangeOnlyWriter(BulkWriter(storage))
+    rows = _rows(20, '2025-10-01')
+    changes.upsert_day(TABLE, rows, '2025-10-01', NATURAL_KEYS[TABLE])
+    counts = changes.upsert_day(TABLE, rows, '2025-10-01', NATURAL_KEYS[TABLE])
+    assert counts['rows_written'] == 0 and counts['rows_skipped'] == 20
+    assert storage.deletes == 0
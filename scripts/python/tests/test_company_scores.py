@@ -0,0 +1,36 @@
+import pytest
+
+from apex_scoring.company_scores import CompanyScoreCalculator
+from tests.support import DAY, day_rows, population, row_differences, run_day
+
+COMPANY_TABLES = ('company_subcategory_scores', 'company_category_scores', 'company_holistic_gpa')
+
+
+@pytest.fixture(scope='module')
+def scored_day():
+    storage = population()
+    run_day(storage, calculate_raw_scores=True, use_snapshot=True)
+    return storage
+
+
+def _single_pass(calculator):
+    calculator.compute_company_scores_for_day(DAY.isoformat())
+
+
+def _per_level(calculator):
+    calculator.compute_company_subcategory_scores_for_day(DAY.isoformat())
+    calculator.compute_company_category_scores_for_day(DAY.isoformat())
+    calculator.compute_company_holistic_gpa_for_day(DAY.isoformat())
+
+
+@pytest.mark.parametrize('compute', [_single_pass, _per_level], ids=['single_pass', 'per_level'])
+def test_rerun_replaces_existing_rows(scored_day, compute):
+    storage = scored_day.clone()
+    expected = {table: day_rows(storage, table) for table in COMPANY_TABLES}
+    assert all(expected.values())
+    calculator = CompanyScoreCalculator(storage)
+    compute(calculator)
+    compute(calculator)
+    for table in COMPANY_TABLES:
+        assert len(storage.select(table, 'id', eq={'calculation_date': DAY.isoformat()})) == len(expected[table])
+        assert not row_differences(expected[table], day_rows(storage, table))
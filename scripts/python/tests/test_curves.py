@@ -0,0 +1,35 @@
+import pytest
+
+from apex_scoring.curves import WhatIfScorer
+from tests.support import DAY, day_rows, population, run_day
+
+
+@pytest.fixture(scope='module')
+def scored():
+    storage = population()
+    run_day(storage, calculate_raw_scores=True, use_snapshot=True)
+    return storage
+
+
+def test_projection_without_changes_reproduces_stored_scores(scored):
+    subcategory_rows = day_rows(scored, 'student_subcategory_scores')
+    category_rows = day_rows(scored, 'student_category_scores')
+    holistic_rows = day_rows(scored, 'student_holistic_gpa')
+    scorer = WhatIfScorer(scored)
+    students = sorted({student_id for student_id, _ in subcategory_rows})[::20]
+    assert len(students) >= 5
+
+    for student_id in students:
+        projected = scorer.project_student(student_id, {})
+        assert projected['calculation_date'] == DAY.isoformat()
+        stored = {sub: r for (sid, sub), r in subcategory_rows.items() if sid == student_id and r['score'] is not None}
+        assert projected['subcategory_scores'].keys() == stored.keys()
+        for sub, scores in projected['subcategory_scores'].items():
+            assert scores['normalized_score'] == pytest.approx(stored[sub]['normalized_score'], abs=1e-9)
+
+        categories = {cat: r for (sid, cat), r in category_rows.items() if sid == student_id}
+        assert projected['category_scores'].keys() == categories.keys()
+        for category_id, scores in projected['category_scores'].items():
+            for column in ('raw_score', 'normalized_score', 'subcategory_count'):
+                assert scores[column] == pytest.approx(categories[category_id][column], abs=1e-9)
+        assert projected['holistic_gpa'] == pytest.approx(holistic_rows[(student_id,)]['holistic_gpa'], abs=1e-9)
@@ -0,0 +1,43 @@
+import time
+from datetime import date, datetime, timezone
+
+import pytest
+
+from tests.support import DAY, SCORE_TABLES, day_rows, population, run_day, table_differences
+
+NEXT_DAY = date(2025, 10, 2)
+
+
+@pytest.fixture(scope='module')
+def changed():
+    """A fully scored day, then one submission changed after it was scored."""
+    storage = population()
+    run_day(storage, calculate_raw_scores=True, use_snapshot=True)
+    time.sleep(0.01)
+    since = datetime.now(timezone.utc).isoformat()
+
+    subcategory_id = storage.select('subcategories', 'id', eq={'name': 'credentials_certifications'})[0]['id']
+    submission = storage.select(
+        'event_submissions', 'id, submission_data', eq={'subcategory_id': subcategory_id}, order='id', limit=1
+    )[0]
+    storage.bulk_update('event_submissions', [
+        {'id': submission['id'], 'submission_data': dict(submission['submission_data'], assigned_points=500)},
+    ])
+    return storage, since
+
+
+@pytest.mark.parametrize('calculation_date', [DAY, NEXT_DAY], ids=['same_day', 'new_day'])
+def test_incremental_matches_full_run(changed, calculation_date):
+    storage, since = changed
+    full = storage.clone()
+    run_day(full, calculation_date=calculation_date, calculate_raw_scores=True, use_snapshot=True)
+    incremental = storage.clone()
+    result = run_day(incremental, calculation_date=calculation_date, incremental=True, since=since)
+
+    assert result['incremental'] is True
+    phases = {p['phase']: p for p in result['phases']}
+    assert phases['Find Changed Submissions']['changed_students'] == 1
+    # The changed student, and those whose normalized score moved with the re-curve
+    assert 1 <= phases['Recompute Changed Students']['students_recomputed'] < 120
+    assert all(day_rows(full, table, calculation_date) for table in SCORE_TABLES)
+    assert table_differences(full, incremental, calculation_date) == {}
@@ -0,0 +1,65 @@
+import pytest
+
+from apex_scoring.db import BulkWriter
+from apex_scoring.journal import JOURNAL_MIGRATION, JOURNAL_TABLE
+from tests.support import drop_tables, population, run_day, table_differences
+
+MODES = {
+    'legacy': {},
+    'set_based': {'set_based': True},
+    'snapshot': {'use_snapshot': True},
+}
+
+
+class InjectedFailure(Exception):
+    pass
+
+
+@pytest.fixture(scope='module')
+def seeded():
+    return population()
+
+
+@pytest.fixture
+def fail_writes_to(monkeypatch):
+    """Make every bulk upsert into `table` fail, until the returned callable is called."""
+    def install(table):
+        upsert = BulkWriter.upsert
+
+        def failing(self, target, rows, on_conflict=None):
+            if target == table:
+                raise InjectedFailure(target)
+            return upsert(self, target, rows, on_conflict=on_conflict)
+
+        monkeypatch.setattr(BulkWriter, 'upsert', failing)
+        return lambda: monkeypatch.setattr(BulkWriter, 'upsert', upsert)
+    return install
+
+
+@pytest.mark.parametrize('mode', list(MODES))
+def test_resume_after_partial_failure_matches_clean_run(seeded, fail_writes_to, mode):
+    reference = seeded.clone()
+    run_day(reference, calculate_raw_scores=True, **MODES[mode])
+
+    storage = seeded.clone()
+    restore = fail_writes_to('company_holistic_gpa')
+    with pytest.raises(InjectedFailure):
+        run_day(storage, calculate_raw_scores=True, resume=True, **MODES[mode])
+    restore()
+    # The failed unit had already written the company subcategory and category rows
+    assert storage.select('company_category_scores', 'id', limit=1)
+
+    result = run_day(storage, calculate_raw_scores=True, resume=True, **MODES[mode])
+    assert result['status'] == 'completed'
+    assert any(p['status'] == 'skipped' for p in result['phases'])
+    assert table_differences(reference, storage) == {}
+    assert storage.select(JOURNAL_TABLE, 'id')
+
+
+def test_resume_needs_the_journal_table(seeded):
+    storage = seeded.clone()
+    drop_tables(storage, JOURNAL_TABLE)
+    with pytest.raises(RuntimeError, match=JOURNAL_MIGRATION):
+        run_day(storage, calculate_raw_scores=True, resume=True)
+    # Nothing was written before the run stopped
+    assert not storage.select('student_holistic_gpa', 'id', limit=1)
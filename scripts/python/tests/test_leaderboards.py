@@ -0,0 +1,67 @@
+import numpy as np
+
+from apex_scoring.leaderboards import COMPANY_RANK_TABLE, STUDENT_RANK_TABLE, RankIndexBuilder, competition_ranks
+from apex_scoring.storage import DEFAULT_SCHEMA_PATH, SQLiteStorage
+
+FIRST_DAY, SECOND_DAY = '2025-10-01', '2025-10-02'
+
+
+def test_ties_share_the_best_rank():
+    # The last GPA differs from 3.0 only by summation noise, so it ties with it
+    ranks, percentiles = competition_ranks(np.array([3.0, 3.5, 3.5, 2.0, 3.0 + 1e-12]))
+    assert ranks.tolist() == [3, 1, 1, 5, 3]
+    # Percentiles count the scores strictly below
+    assert percentiles.tolist() == [0.2, 0.6, 0.6, 0.0, 0.2]
+
+
+def test_empty_population():
+    ranks, percentiles = competition_ranks(np.array([]))
+    assert ranks.size == percentiles.size == 0
+
+
+def write_day(storage, day, students, student_gpas, company_gpas):
+    storage.upsert('students', [{'id': s, 'company_id': c} for s, c in students.items()], on_conflict='id')
+    storage.upsert('student_holistic_gpa', [
+        {'student_id': s, 'holistic_gpa': gpa, 'calculation_date': day} for s, gpa in student_gpas.items()
+    ], on_conflict='student_id,calculation_date')
+    storage.upsert('company_holistic_gpa', [
+        {'company_id': c, 'holistic_gpa': gpa, 'calculation_date': day} for c, gpa in company_gpas.items()
+    ], on_conflict='company_id,calculation_date')
+
+
+def ranked(storage, table, key, day):
+    return {r[key]: r for r in storage.select(table, eq={'calculation_date': day})}
+
+
+def test_rank_changes_across_days():
+    storage = SQLiteStorage(':memory:', schema_path=DEFAULT_SCHEMA_PATH)
+    storage.upsert('companies', [{'id': 'a', 'name': 'Alpha'}, {'id': 'b', 'name': 'Bravo'}])
+    builder = RankIndexBuilder(storage)
+
+    write_day(
+        storage, FIRST_DAY, {'s1': 'a', 's2': 'a', 's3': 'b', 's4': 'b'},
+        {'s1': 3.5, 's2': 3.0, 's3': 3.5, 's4': 2.0}, {'a': 3.2, 'b': 3.2},
+    )
+    builder.build(FIRST_DAY)
+    first = ranked(storage, STUDENT_RANK_TABLE, 'student_id', FIRST_DAY)
+    assert {s: r['overall_rank'] for s, r in first.items()} == {'s1': 1, 's2': 3, 's3': 1, 's4': 4}
+    assert {s: r['overall_percentile'] for s, r in first.items()} == {'s1': 0.5, 's2': 0.25, 's3': 0.5, 's4': 0.0}
+    assert {s: r['company_rank'] for s, r in first.items()} == {'s1': 1, 's2': 2, 's3': 1, 's4': 2}
+    assert all(r['overall_rank_change'] is None and r['company_rank_change'] is None for r in first.values())
+
+    # s2 moves to company b and overtakes everyone
+    write_day(
+        storage, SECOND_DAY, {'s1': 'a', 's2': 'b', 's3': 'b', 's4': 'b'},
+        {'s1': 3.5, 's2': 3.8, 's3': 3.0, 's4': 2.0}, {'a': 3.5, 'b': 3.0},
+    )
+    builder.build(SECOND_DAY)
+    second = ranked(storage, STUDENT_RANK_TABLE, 'student_id', SECOND_DAY)
+    assert {s: r['overall_rank'] for s, r in second.items()} == {'s1': 2, 's2': 1, 's3': 3, 's4': 4}
+    assert {s: r['overall_rank_change'] for s, r in second.items()} == {'s1': -1, 's2': 2, 's3': -2, 's4': 0}
+    assert {s: r['company_rank'] for s, r in second.items()} == {'s1': 1, 's2': 1, 's3': 2, 's4': 3}
+    # A student who changed company has no earlier rank in the new one
+    assert {s: r['company_rank_change'] for s, r in second.items()} == {'s1': 0, 's2': None, 's3': -1, 's4': -1}
+    assert {s: r['company_student_count'] for s, r in second.items()} == {'s1': 1, 's2': 3, 's3': 3, 's4': 3}
+
+    companies = ranked(storage, COMPANY_RANK_TABLE, 'company_id', SECOND_DAY)
+    assert {c: (r['rank'], r['rank_change']) for c, r in companies.items()} == {'a': (1, 0), 'b': (2, -1)}
@@ -0,0 +1,60 @@
+import pytest
+
+from apex_scoring.raw_scores import RawScoreEngine
+from apex_scoring.sharding import LocalShardExecutor, ShardedDailyRun
+from tests.support import ACADEMIC_YEAR, DAY, SCORE_TABLES, day_rows, population, run_day, table_differences
+
+MODES = {
+    'legacy': {},
+    'set_based': {'set_based': True},
+    'snapshot': {'use_snapshot': True},
+}
+
+
+@pytest.fixture(scope='module')
+def raw_day():
+    """Raw subcategory scores of the day and nothing derived from them yet."""
+    storage = population()
+    RawScoreEngine(storage).compute_and_write(ACADEMIC_YEAR, DAY)
+    return storage
+
+
+@pytest.fixture(scope='module')
+def runs(raw_day):
+    outputs = {}
+    for mode, options in MODES.items():
+        storage = raw_day.clone()
+        run_day(storage, **options)
+        outputs[mode] = storage
+    return outputs
+
+
+@pytest.mark.parametrize('mode', ['set_based', 'snapshot'])
+def test_modes_match_legacy(raw_day, runs, mode):
+    assert not day_rows(raw_day, 'student_holistic_gpa')
+    assert all(day_rows(runs['legacy'], table) for table in SCORE_TABLES)
+    assert table_differences(runs['legacy'], runs[mode]) == {}
+
+
+@pytest.mark.parametrize('mode', list(MODES))
+def test_rerun_is_idempotent(runs, mode):
+    storage = runs[mode].clone()
+    run_day(storage, **MODES[mode])
+    assert table_differences(runs[mode], storage) == {}
+
+
+@pytest.mark.parametrize('calculate_raw_scores', [False, True], ids=['stored_raw', 'raw_scores'])
+def test_sharded_run_matches_snapshot(raw_day, runs, calculate_raw_scores):
+    if calculate_raw_scores:
+        reference = population()
+        run_day(reference, calculate_raw_scores=True, use_snapshot=True)
+        storage = population()
+    else:
+        reference, storage = runs['snapshot'], raw_day.clone()
+    with LocalShardExecutor(lambda: storage, processes=1) as executor:
+        result = ShardedDailyRun(storage, executor, shards=3).run(
+            ACADEMIC_YEAR, DAY, calculate_raw_scores=calculate_raw_scores
+        )
+    assert result['shards'] == 3
+    assert all(day_rows(storage, table) for table in SCORE_TABLES)
+    assert table_differences(reference, storage) == {}
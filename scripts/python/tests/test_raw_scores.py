@@ -0,0 +1,120 @@
+from datetime import date
+
+import numpy as np
+import pytest
+
+from apex_scoring.raw_scores import AGGREGATION_KINDS, RawScoreEngine
+from apex_scoring.storage import SQLiteStorage
+from tests.support import ACADEMIC_YEAR, DAY, SEED_DAY, day_rows, population
+
+STUDENTS = ['s1', 's2']
+SUBCATEGORIES = ['attendance', 'hours', 'points', 'rating', 'gbe']
+
+
+def submission(student, subcategory, day, event_id=None, points_granted=None, **data):
+    return {
+        'student_id': student,
+        'subcategory_id': subcategory,
+        'event_id': event_id,
+        'submission_data': data,
+        'submitted_at': f'{day}T12:00:00+00:00',
+        'points_granted': points_granted,
+    }
+
+
+def scores(submissions, calculation_date=date(2025, 10, 1)):
+    engine = RawScoreEngine(SQLiteStorage(':memory:'))
+    score, data_points = engine._aggregate(
+        submissions, STUDENTS, SUBCATEGORIES, np.array(SUBCATEGORIES), ACADEMIC_YEAR, calculation_date
+    )
+    return {sub: score[:, c].tolist() for c, sub in enumerate(SUBCATEGORIES)}, data_points
+
+
+def test_hours_are_capped_per_day_then_per_year():
+    result, data_points = scores([
+        # Two submissions on one day count as 8, not 5 + 5
+        submission('s1', 'hours', '2025-09-01', hours=5),
+        submission('s1', 'hours', '2025-09-01', hours=5),
+        submission('s1', 'hours', '2025-09-02', hours=2),
+        # A single 10-hour day counts as 8, and the year stops at 12
+        submission('s2', 'hours', '2025-09-01', hours=10),
+        submission('s2', 'hours', '2025-09-03', hours=6),
+    ])
+    assert result['hours'] == [10.0, 12.0]
+    assert data_points[:, 1].tolist() == [3, 2]
+
+
+def test_submission_rules():
+    result, _ = scores([
+        submission('s1', 'attendance', '2025-09-01', status='present'),
+        submission('s1', 'attendance', '2025-09-08', status='absent'),
+        submission('s1', 'attendance', '2025-09-15', status='present'),
+        submission('s1', 'attendance', '2025-09-22', status='absent'),
+        submission('s1', 'points', '2025-09-01', assigned_points=10),
+        submission('s1', 'points', '2025-09-02', points_granted=15),
+        submission('s1', 'rating', '2025-09-01', rating=4),
+        submission('s1', 'rating', '2025-09-02', rating=5),
+        # GBE: attended events / events held x 100 plus bonus points, at most 100
+        submission('s1', 'gbe', '2025-09-01', event_id='e1', bonus_points=3),
+        submission('s2', 'gbe', '2025-09-01', event_id='e1', bonus_points=0),
+        submission('s2', 'gbe', '2025-09-02', event_id='e2', bonus_points=4),
+        # Submitted after the calculation date: left out
+        submission('s2', 'points', '2025-10-02', assigned_points=50),
+    ])
+    assert result['attendance'] == [50.0, 0.0]
+    assert result['points'] == [25.0, 0.0]
+    assert result['rating'] == [90.0, 0.0]
+    assert result['gbe'] == [53.0, 100.0]
+
+
+@pytest.fixture(scope='module')
+def seeded():
+    return population()
+
+
+def test_matches_seeded_day(seeded):
+    """The generator's seed-day scores follow the same rules as the engine."""
+    stored = day_rows(seeded, 'student_subcategory_scores', SEED_DAY)
+    rows = RawScoreEngine(seeded).compute(ACADEMIC_YEAR, SEED_DAY)
+    assert rows
+    for row in rows:
+        expected = stored[(row['student_id'], row['subcategory_id'])]
+        assert row['score'] == pytest.approx(expected['score'])
+        assert row['data_points_count'] == expected['data_points_count']
+
+
+def test_new_day_carries_grades_forward(seeded):
+    storage = seeded.clone()
+    RawScoreEngine(storage).compute_and_write(ACADEMIC_YEAR, DAY)
+    seed_rows = day_rows(storage, 'student_subcategory_scores', SEED_DAY)
+    day = day_rows(storage, 'student_subcategory_scores', DAY)
+    assert day.keys() == seed_rows.keys()
+
+    grade_ids = {
+        r['id'] for r in storage.select('subcategories', 'id, name') if AGGREGATION_KINDS[r['name']] == 'grade'
+    }
+    grades = {key: row for key, row in day.items() if key[1] in grade_ids}
+    assert grades
+    for key, row in grades.items():
+        assert (row['score'], row['data_points_count']) == (seed_rows[key]['score'], seed_rows[key]['data_points_count'])
+
+    # A rerun of the day leaves the carried rows as they are
+    assert RawScoreEngine(storage).grade_rows(ACADEMIC_YEAR, DAY, [key[0] for key in grades]) == []
+
+
+def test_some_students_match_the_full_run(seeded):
+    """A subset reads only its own submissions but keeps the population's GBE denominator."""
+    loaded = []
+
+    class Recording(RawScoreEngine):
+        def load_submissions(self, *args, **kwargs):
+            submissions = super().load_submissions(*args, **kwargs)
+            loaded.extend(submissions)
+            return submissions
+
+    full = RawScoreEngine(seeded).compute(ACADEMIC_YEAR, DAY)
+    some = sorted({r['student_id'] for r in full})[:5]
+    rows = Recording(seeded).compute(ACADEMIC_YEAR, DAY, student_ids=some)
+    key = lambda r: (r['student_id'], r['subcategory_id'])  # noqa: E731
+    assert sorted(rows, key=key) == sorted((r for r in full if r['student_id'] in some), key=key)
+    assert loaded and {r['student_id'] for r in loaded} <= set(some)
@@ -0,0 +1,44 @@
+import pytest
+
+from apex_scoring.changes import DEFAULT_ATOL
+from apex_scoring.shadow import ShadowStorage, diff_day
+from apex_scoring.storage import DEFAULT_SCHEMA_PATH, SQLiteStorage
+from tests.support import DAY, SCORE_TABLES, day_rows, population, run_day, table_differences
+
+RUN = {'calculate_raw_scores': True, 'use_snapshot': True}
+
+
+@pytest.fixture(scope='module')
+def production():
+    """A scored day, then one submission changed so that a rerun of the day differs."""
+    storage = population()
+    run_day(storage, **RUN)
+    subcategory_id = storage.select('subcategories', 'id', eq={'name': 'credentials_certifications'})[0]['id']
+    submission = storage.select(
+        'event_submissions', 'id, submission_data', eq={'subcategory_id': subcategory_id}, order='id', limit=1
+    )[0]
+    storage.bulk_update('event_submissions', [
+        {'id': submission['id'], 'submission_data': dict(submission['submission_data'], assigned_points=500)},
+    ])
+    return storage
+
+
+def test_shadow_run_writes_only_to_the_sink(production):
+    source = production.clone()
+    before = {table: source.select(table, order='id') for table in SCORE_TABLES}
+    sink = SQLiteStorage(':memory:', schema_path=DEFAULT_SCHEMA_PATH)
+    run_day(ShadowStorage(source, sink), **RUN)
+
+    assert {table: source.select(table, order='id') for table in SCORE_TABLES} == before
+    reference = production.clone()
+    run_day(reference, **RUN)
+    assert all(day_rows(sink, table) for table in SCORE_TABLES)
+    assert table_differences(reference, sink) == {}
+
+    # The diff reports the rows the rerun changed, and nothing missing or extra
+    expected = table_differences(source, reference, tolerance=DEFAULT_ATOL)
+    assert expected.get('student_subcategory_scores')
+    diff = diff_day(source, sink, DAY.isoformat())
+    for table in SCORE_TABLES:
+        assert diff[table]['missing_rows'] == diff[table]['extra_rows'] == 0
+        assert diff[table]['changed_rows'] == len({key for key, _ in expected.get(table, [])})
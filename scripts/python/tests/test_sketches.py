@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from apex_scoring.sketches import KLLSketch, k_for_error, rank_error
+
+QUERIES = np.linspace(0.0, 100.0, 401)
+
+
+def exact_percentile_ranks(population, values):
+    ordered = np.sort(population)
+    return np.searchsorted(ordered, values, side='left') / ordered.size
+
+
+def scores(n, seed):
+    # Raw scores are rounded to 2 decimals, so ties are common
+    return np.round(np.random.default_rng(seed).beta(2.0, 5.0, size=n) * 100, 2)
+
+
+def test_small_population_is_exact():
+    population = scores(100, seed=1)
+    sketch = KLLSketch(k=200).update(population)
+    np.testing.assert_array_equal(sketch.percentile_ranks(QUERIES), exact_percentile_ranks(population, QUERIES))
+
+
+@pytest.mark.parametrize('k', [50, 200])
+def test_rank_error_within_bound(k):
+    population = scores(200_000, seed=2)
+    sketch = KLLSketch(k=k)
+    for chunk in np.array_split(population, 37):
+        sketch.update(chunk)
+    error = np.abs(sketch.percentile_ranks(QUERIES) - exact_percentile_ranks(population, QUERIES)).max()
+    assert error <= rank_error(k)
+    assert sketch.size < 4 * k
+
+
+def test_merged_shards_within_bound():
+    k = 100
+    shards = [scores(20_000 + 1_000 * i, seed=10 + i) for i in range(8)]
+    merged = KLLSketch(k=k, seed=0)
+    for i, shard in enumerate(shards):
+        merged.merge(KLLSketch(k=k, seed=i + 1).update(shard))
+    population = np.concatenate(shards)
+    assert merged.n == population.size
+    error = np.abs(merged.percentile_ranks(QUERIES) - exact_percentile_ranks(population, QUERIES)).max()
+    assert error <= rank_error(k)
+
+
+def test_round_trip_keeps_ranks():
+    sketch = KLLSketch(k=64).update(scores(10_000, seed=3))
+    restored = KLLSketch.from_dict(sketch.to_dict())
+    np.testing.assert_array_equal(restored.percentile_ranks(QUERIES), sketch.percentile_ranks(QUERIES))
+
+
+@pytest.mark.parametrize('error', [0.05, 0.02, 0.01])
+def test_k_for_error_is_smallest_k(error):
+    k = k_for_error(error)
+    assert rank_error(k) <= error < rank_error(k - 1)
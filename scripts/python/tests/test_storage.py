@@ -0,0 +1,78 @@
+import pytest
+
+from apex_scoring.concurrency import TaskPool
+from apex_scoring.db import BulkWriter
+from apex_scoring.storage import DEFAULT_SCHEMA_PATH, SQLiteStorage, StorageBackend, SupabaseStorage
+
+
+class SelectOnly(StorageBackend):
+    def select(self, table, columns='*', eq=None, in_=None, gt=None, after=None, order=None, desc=False,
+               limit=None, offset=None):
+        return []
+
+
+def test_incomplete_backend_fails_on_creation():
+    with pytest.raises(TypeError, match='abstract'):
+        SelectOnly()
+
+
+def test_sqlite_upsert_merges_on_natural_key():
+    storage = SQLiteStorage(':memory:', schema_path=DEFAULT_SCHEMA_PATH)
+    row = {'student_id': 's1', 'calculation_date': '2025-10-01', 'holistic_gpa': 3.0}
+    storage.upsert('student_holistic_gpa', [row], on_conflict='student_id,calculation_date')
+    storage.upsert('student_holistic_gpa', [dict(row, holistic_gpa=3.5)], on_conflict='student_id,calculation_date')
+    rows = storage.select('student_holistic_gpa')
+    assert [r['holistic_gpa'] for r in rows] == [3.5]
+
+
+class RpcError(Exception):
+    def __init__(self, code):
+        super().__init__(code)
+        self.code = code
+
+
+class FailingRpcClient:
+    """A Supabase client stand-in whose database function calls fail with `code`."""
+
+    def __init__(self, code):
+        self.code = code
+        self.calls = 0
+
+    def rpc(self, function, params):
+        self.calls += 1
+        raise RpcError(self.code)
+
+
+def test_copy_day_falls_back_without_the_database_function(monkeypatch):
+    copies = []
+    monkeypatch.setattr(StorageBackend, 'copy_day', lambda self, *args: copies.append(args) or 7)
+    client = FailingRpcClient('PGRST202')
+    storage = SupabaseStorage(client)
+    assert storage.copy_day('student_holistic_gpa', ['student_id'], '2025-10-01', '2025-10-02') == 7
+    assert storage.copy_day('student_holistic_gpa', ['student_id'], '2025-10-02', '2025-10-03') == 7
+    # The missing function is only asked for once
+    assert client.calls == 1 and len(copies) == 2
+
+
+def test_copy_day_raises_other_errors():
+    with pytest.raises(RpcError):
+        SupabaseStorage(FailingRpcClient('42501')).copy_day('student_holistic_gpa', ['student_id'], '2025-10-01', '2025-10-02')
+
+
+class FailingUpserts(SQLiteStorage):
+    def __init__(self):
+        super().__init__(':memory:', schema_path=DEFAULT_SCHEMA_PATH)
+        self.upserts = 0
+
+    def upsert(self, table, rows, on_conflict=None):
+        self.upserts += 1
+        raise ConnectionError('connection reset')
+
+
+def test_pool_tasks_retry_writes_at_one_layer():
+    storage = FailingUpserts()
+    writer = BulkWriter(storage, max_retries=3, retry_backoff_seconds=0)
+    row = {'student_id': 's1', 'calculation_date': '2025-10-01', 'holistic_gpa': 3.0}
+    with pytest.raises(ConnectionError):
+        TaskPool(max_workers=1).map(lambda r: writer.upsert('student_holistic_gpa', [r]), [row])
+    assert storage.upserts == 4
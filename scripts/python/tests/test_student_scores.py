@@ -0,0 +1,39 @@
+import pytest
+
+from apex_scoring.company_scores import StudentCategoryHolisticCalculator
+from tests.support import DAY, day_rows, population, row_differences, run_day
+
+STUDENT_TABLES = ('student_category_scores', 'student_holistic_gpa')
+
+
+@pytest.fixture(scope='module')
+def scored_day():
+    storage = population()
+    run_day(storage, calculate_raw_scores=True, use_snapshot=True)
+    return storage
+
+
+def _student_rows(storage):
+    return {table: day_rows(storage, table) for table in STUDENT_TABLES}
+
+
+def _legacy(calculator):
+    calculator.compute_student_category_scores_for_day(DAY.isoformat())
+    calculator.compute_student_holistic_gpa_for_day(DAY.isoformat())
+
+
+def _set_based(calculator):
+    calculator.compute_student_scores_for_day_bulk(DAY.isoformat())
+
+
+@pytest.mark.parametrize('compute', [_legacy, _set_based], ids=['legacy', 'set_based'])
+def test_rerun_replaces_existing_rows(scored_day, compute):
+    storage = scored_day.clone()
+    expected = _student_rows(storage)
+    calculator = StudentCategoryHolisticCalculator(storage)
+    compute(calculator)
+    compute(calculator)
+    rows = _student_rows(storage)
+    for table in STUDENT_TABLES:
+        assert len(storage.select(table, 'id', eq={'calculation_date': DAY.isoformat()})) == len(expected[table])
+        assert not row_differences(expected[table], rows[table])
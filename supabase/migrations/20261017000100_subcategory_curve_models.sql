@@ -0,0 +1,19 @@
+-- Raw score population of each subcategory per day, for what-if scoring
+-- (scripts/python/apex_scoring/curves.py). Until this is applied, daily runs
+-- skip writing curve models.
+
+CREATE TABLE IF NOT EXISTS subcategory_curve_models (
+  id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+  subcategory_id UUID NOT NULL REFERENCES subcategories(id),
+  calculation_date DATE NOT NULL,
+  method TEXT NOT NULL DEFAULT 'bell_curve',
+  score_count INTEGER,
+  scores JSONB,
+  counts JSONB,
+  stats JSONB,
+  created_at TIMESTAMPTZ DEFAULT now(),
+  updated_at TIMESTAMPTZ DEFAULT now(),
+  UNIQUE (subcategory_id, calculation_date)
+);
+
+CREATE INDEX IF NOT EXISTS subcategory_curve_models_day_idx ON subcategory_curve_models (calculation_date, id);
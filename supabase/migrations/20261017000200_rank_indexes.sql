@@ -0,0 +1,40 @@
+-- Precomputed standings of each day (scripts/python/apex_scoring/leaderboards.py).
+-- Until this is applied, daily runs skip the "Build Rank Indexes" phase.
+
+CREATE TABLE IF NOT EXISTS student_rank_index (
+  id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+  student_id UUID NOT NULL REFERENCES students(id),
+  company_id UUID REFERENCES companies(id),
+  calculation_date DATE NOT NULL,
+  holistic_gpa NUMERIC,
+  overall_rank INTEGER,
+  overall_percentile NUMERIC,
+  overall_rank_change INTEGER,
+  student_count INTEGER,
+  company_rank INTEGER,
+  company_percentile NUMERIC,
+  company_rank_change INTEGER,
+  company_student_count INTEGER,
+  created_at TIMESTAMPTZ DEFAULT now(),
+  updated_at TIMESTAMPTZ DEFAULT now(),
+  UNIQUE (student_id, calculation_date)
+);
+
+CREATE INDEX IF NOT EXISTS student_rank_index_day_idx ON student_rank_index (calculation_date, id);
+CREATE INDEX IF NOT EXISTS student_rank_index_rank_idx ON student_rank_index (calculation_date, overall_rank);
+
+CREATE TABLE IF NOT EXISTS company_rank_index (
+  id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+  company_id UUID NOT NULL REFERENCES companies(id),
+  calculation_date DATE NOT NULL,
+  holistic_gpa NUMERIC,
+  rank INTEGER,
+  percentile NUMERIC,
+  rank_change INTEGER,
+  company_count INTEGER,
+  created_at TIMESTAMPTZ DEFAULT now(),
+  updated_at TIMESTAMPTZ DEFAULT now(),
+  UNIQUE (company_id, calculation_date)
+);
+
+CREATE INDEX IF NOT EXISTS company_rank_index_rank_idx ON company_rank_index (calculation_date, rank);
@@ -0,0 +1,12 @@
+-- Versioned scoring settings; the highest version applies
+-- (scripts/python/apex_scoring/scoring_config.py). Until this is applied, or
+-- while it has no rows, runs use the built-in defaults.
+
+CREATE TABLE IF NOT EXISTS scoring_configs (
+  id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+  version INTEGER NOT NULL UNIQUE,
+  excluded_subcategory_ids JSONB,
+  gpa_subcategory_ids JSONB,
+  notes TEXT,
+  created_at TIMESTAMPTZ DEFAULT now()
+);
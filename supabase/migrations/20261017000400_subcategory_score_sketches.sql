@@ -0,0 +1,16 @@
+-- Mergeable raw score sketch of each (subcategory, academic year) cohort
+-- (scripts/python/apex_scoring/sketches.py). Until this is applied, runs with
+-- --sketch-error skip writing sketches.
+
+CREATE TABLE IF NOT EXISTS subcategory_score_sketches (
+  id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+  subcategory_id UUID NOT NULL REFERENCES subcategories(id),
+  academic_year_start INTEGER NOT NULL,
+  calculation_date DATE NOT NULL,
+  k INTEGER,
+  n INTEGER,
+  sketch JSONB,
+  created_at TIMESTAMPTZ DEFAULT now(),
+  updated_at TIMESTAMPTZ DEFAULT now(),
+  UNIQUE (subcategory_id, academic_year_start)
+);
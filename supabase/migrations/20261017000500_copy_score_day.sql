@@ -0,0 +1,17 @@
+-- Copies a day's rows of a score table to another day on the server, for
+-- --changes-only runs (scripts/python/apex_scoring/changes.py). Until this is
+-- applied, the rows are read and upserted back by the client instead.
+
+CREATE OR REPLACE FUNCTION copy_score_day(p_table TEXT, p_columns TEXT[], p_from DATE, p_to DATE)
+RETURNS INTEGER LANGUAGE plpgsql AS $$
+DECLARE
+  cols TEXT := (SELECT string_agg(quote_ident(c), ', ') FROM unnest(p_columns) AS c);
+  copied INTEGER;
+BEGIN
+  EXECUTE format(
+    'INSERT INTO %I (%s, calculation_date) SELECT %s, $2 FROM %I WHERE calculation_date = $1',
+    p_table, cols, cols, p_table
+  ) USING p_from, p_to;
+  GET DIAGNOSTICS copied = ROW_COUNT;
+  RETURN copied;
+END $$;
@@ -0,0 +1,14 @@
+-- Completed units of work of each daily run, for --resume
+-- (scripts/python/apex_scoring/journal.py). Resumable runs refuse to start
+-- until this is applied.
+
+CREATE TABLE IF NOT EXISTS score_run_journal (
+  id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+  calculation_date DATE NOT NULL,
+  phase TEXT NOT NULL,
+  shard TEXT NOT NULL DEFAULT '',
+  rows_written INTEGER,
+  details JSONB,
+  completed_at TIMESTAMPTZ,
+  UNIQUE (calculation_date, phase, shard)
+);